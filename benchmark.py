@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+benchmark.py - fouroff_ver_8.py cold start / 검증 / solve 벤치마크
+
+Usage:
+    python3 benchmark.py                 # import profile + check-only + in-process 검증
+    python3 benchmark.py --solve         # + 전체 solve (cold process)
+    python3 benchmark.py --sizes 20,150  # 간호사 수
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOLVER = os.path.join(HERE, 'fouroff_ver_8.py')
+
+
+# ========================================
+# Synthetic roster
+# ========================================
+
+def make_input(num_nurses, year=2025, month=3, min_N=None):
+    """테스트용 입력 생성 (NK 1명, DK 1명, 나머지 All, 신규/퇴사 각 1명)"""
+    nurses = []
+    for i in range(num_nurses):
+        keep_type = 'NightFixed' if i == 0 else 'DayFixed' if i == 1 else 'All'
+        nurses.append({
+            'name': f'nurse{i:03d}',
+            'keep_type': keep_type,
+            'past_3days': ['N', 'N', 'X'] if keep_type == 'NightFixed' else ['X', 'X', 'X'],
+            'de_preference': ['D', 'E', '='][i % 3],
+            'is_low_grade': i in (num_nurses - 4, num_nurses - 3),
+            'special_days': 1 if i == 5 else 0
+        })
+
+    def split(x_ratio):
+        work = num_nurses - round(num_nurses * x_ratio)
+        n = max(work // 4, 2)
+        d = (work - n) // 2
+        e = work - n - d
+        return {'D': d, 'E': e, 'N': n, 'X': num_nurses - d - e - n}
+
+    data = {
+        'year': year,
+        'month': month,
+        'nurses': nurses,
+        'daily_wallet_config': {'weekday': split(0.3), 'weekend': split(0.4)},
+        'max_consecutive_work': 6,
+        'new': [{'name': nurses[-2]['name'], 'start_day': 10, 'n_count': 3}],
+        'quit': [{'name': nurses[-1]['name'], 'last_day': 20, 'n_count': 3}],
+        'preferences': [
+            {'name': nurses[3]['name'], 'schedule': {'5': 'X', '6': 'X'}},
+            {'name': nurses[7]['name'], 'schedule': {'12': 'D'}}
+        ]
+    }
+
+    if min_N is None:
+        # 유효한 min_N 탐색 (parse_input 범위 검사 이용)
+        sys.path.insert(0, HERE)
+        import fouroff_ver_8
+        for candidate in range(0, 32):
+            data['nurse_wallet_min'] = {'N': candidate}
+            try:
+                fouroff_ver_8.parse_input(json.dumps(data))
+                break
+            except ValueError:
+                continue
+    else:
+        data['nurse_wallet_min'] = {'N': min_N}
+
+    return data
+
+
+# ========================================
+# Measurements
+# ========================================
+
+def import_profile(top=8):
+    """python -X importtime 결과 중 누적 시간 상위 모듈"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import fouroff_ver_8'],
+        cwd=HERE, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def startup_baseline(repeat):
+    """빈 interpreter / numpy import 만 하는 새 프로세스 wall time (ms) - check-only 의 고정 비용"""
+    baseline = {}
+    for label, code in (('python', 'pass'), ('python + numpy', 'import numpy')):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True)
+            times.append((time.perf_counter() - start) * 1000)
+        baseline[label] = times
+    return baseline
+
+
+def cold_run(input_json, extra_args, repeat):
+    """새 프로세스로 fouroff_ver_8.py 실행 - wall time (ms) 목록"""
+    times = []
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, SOLVER] + extra_args,
+            input=input_json, cwd=HERE, capture_output=True, text=True
+        )
+        times.append((time.perf_counter() - start) * 1000)
+        output = json.loads(result.stdout)
+    return times, output
+
+
+def in_process(input_json, repeat):
+    """parse_input(+validate_input) in-process 시간 (ms)"""
+    import fouroff_ver_8
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fouroff_ver_8.parse_input(input_json)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def summary(times):
+    return f"median {statistics.median(times):8.2f} ms  min {min(times):8.2f} ms  (n={len(times)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='fouroff_ver_8.py benchmark')
+    parser.add_argument('--sizes', default='20,50,150', help='간호사 수 (comma separated)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--solve', action='store_true', help='전체 solve도 측정 (느림)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, HERE)
+
+    print("=== import profile (fouroff_ver_8, cumulative us) ===")
+    for cumulative_us, self_us, name in import_profile():
+        print(f"  {cumulative_us:>8}  {self_us:>8}  {name}")
+
+    print("\n=== startup baseline (cold) ===")
+    for label, times in startup_baseline(args.repeat).items():
+        print(f"  {label:<18}  {summary(times)}")
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        input_json = json.dumps(make_input(size), ensure_ascii=False)
+        print(f"\n=== {size} nurses ===")
+
+        times, output = cold_run(input_json, ['--check-only'], args.repeat)
+        print(f"  check-only (cold)   {summary(times)}  -> {output['status']}")
+
+        times = in_process(input_json, args.repeat * 10)
+        print(f"  parse+validate      {summary(times)}")
+
+        if args.solve:
+            times, output = cold_run(input_json, [], 1)
+            print(f"  solve (cold)        {summary(times)}  -> {output['status']}")
+
+
+if __name__ == '__main__':
+    main()
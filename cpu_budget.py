@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+cpu_budget.py - 컨테이너 CPU 예산 기반 CP-SAT worker 수 결정
+
+CPU 예산 = min(cgroup CPU quota, CPU affinity)
+solve 1개의 몫 = CPU 예산 / 동시 solve 수
+    worker 수 = 몫 (최소 2, 최대 8)
+    worker 4개 이하: subsolver 는 우선순위 상위 worker 수만큼만 (LP 탐색 + fixed 탐색 우선)
+    그 이상: 기본 subsolver 구성
+
+worker 1개(단일 탐색)는 이 모델에서 최적해 증명이 10배 이상 느려서 CPU 가 부족해도 2개 유지
+(1 CPU 에서 20명 입력: worker 1개 77초, 2~4개 4~6초)
+
+환경변수 SOLVER_NUM_WORKERS 로 강제 지정 가능
+"""
+
+import os
+import math
+
+# worker 가 적을 때 사용할 subsolver (앞에서부터 worker 수만큼)
+PRIORITY_SUBSOLVERS = ('default_lp', 'fixed', 'no_lp', 'max_lp')
+
+MIN_WORKERS = 2
+MAX_WORKERS = 8
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit():
+    """cgroup CPU quota (CPU 개수, 제한 없으면 None) - cgroup v2 / v1"""
+    cpu_max = _read('/sys/fs/cgroup/cpu.max')
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+
+    for base in ('/sys/fs/cgroup/cpu', '/sys/fs/cgroup/cpu,cpuacct'):
+        quota = _read(os.path.join(base, 'cpu.cfs_quota_us'))
+        period = _read(os.path.join(base, 'cpu.cfs_period_us'))
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def affinity_cpus():
+    """이 프로세스가 사용할 수 있는 CPU 수"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_budget():
+    """(CPU 수, 출처)"""
+    cpus = affinity_cpus()
+    limit = cgroup_cpu_limit()
+    if limit is not None and limit < cpus:
+        return limit, 'cgroup'
+    return float(cpus), 'affinity'
+
+
+def default_solve_slots(cpus_per_solve=4):
+    """동시 solve 수 기본값 (solve 1개당 cpus_per_solve CPU, 최소 1)"""
+    cpus, _ = cpu_budget()
+    return max(1, int(cpus // cpus_per_solve))
+
+
+def solver_plan(concurrent_solves=1):
+    """CP-SAT worker 구성
+
+    Returns:
+        dict: num_workers, subsolvers (None = 기본), cpus, cpu_source, concurrent_solves, cpu_share
+    """
+    cpus, source = cpu_budget()
+    concurrent_solves = max(1, concurrent_solves)
+    share = cpus / concurrent_solves
+
+    forced = os.environ.get('SOLVER_NUM_WORKERS')
+    if forced:
+        num_workers = max(1, int(forced))
+    else:
+        num_workers = max(MIN_WORKERS, min(MAX_WORKERS, math.floor(share)))
+
+    subsolvers = None
+    if 1 < num_workers <= len(PRIORITY_SUBSOLVERS):
+        subsolvers = list(PRIORITY_SUBSOLVERS[:num_workers])
+
+    return {
+        'num_workers': num_workers,
+        'subsolvers': subsolvers,
+        'cpus': round(cpus, 2),
+        'cpu_source': source,
+        'concurrent_solves': concurrent_solves,
+        'cpu_share': round(share, 2)
+    }
+
+
+def apply_solver_plan(parameters, plan):
+    """CP-SAT SatParameters 에 적용"""
+    parameters.num_workers = plan['num_workers']
+    if plan['subsolvers']:
+        parameters.subsolvers.extend(plan['subsolvers'])
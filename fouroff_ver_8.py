@@ -2,16 +2,103 @@
 """
 fouroff_ver_8.py - Nurse Schedule Generator with CP-SAT Solver
 WALLET REDESIGN: nurse_wallet = {N, X} only, D/E auto-distributed by daily_wallet
+
+Usage:
+    python3 fouroff_ver_8.py [--check-only] [input_json]   (input_json 생략 시 stdin)
+
+ortools는 solve_cpsat 안에서만 import (검증/--check-only 경로는 ortools 없이 동작)
+    numpy 는 validate_input 에서도 쓰므로 --check-only 에도 포함
+    (cold --check-only 약 240ms = interpreter 약 40ms + numpy 약 65-80ms + holidays 약 20ms + site 등, benchmark.py 로 측정)
+CP-SAT worker 수는 CPU 예산 / 동시 solve 수 (FOUROFF_CONCURRENT_SOLVES) 로 결정 (cpu_budget.py)
+FOUROFF_DEADLINE (epoch seconds) 지정 시 남은 시간 안에서 solver 시간 제한 (결과 출력 여유 포함)
+mode "soft": zRule / nurse wallet / Low Grade / 연속 근무 / daily wallet 을 벌점(soft_weights)으로 완화,
+    min_N 범위 / daily wallet 합계 / 희망 근무 초과도 오류 대신 위반으로 처리 (입력 형식 오류, keep type / 근무 기간과
+    맞지 않는 희망 근무는 strict 와 같이 오류)
+    최적 증명 대신 SOFT_MAX_SOLVE_SECONDS 안의 최선의 해 (SOFT_STALL_SECONDS 동안 개선이 없으면 더 일찍) 를
+    반환하고 포함된 위반을 violations 로 출력
+구조 제약 모델은 FOUROFF_MODEL_CACHE_DIR 에 캐시 (같은 구조의 다음 solve 는 희망 근무 / wallet / 목표만 추가),
+    FOUROFF_MODEL_CACHE=0 이면 매번 새로 생성
+nurses[].past_work_streak (optional): 이전 달 말까지 이어진 연속 근무일 수
+    past_3days 에 X 가 없으면 3일 대신 이 값으로 1일부터의 연속 근무 제한 (방 단위 solve 는 자동 계산)
+SIGTERM: 탐색 중단 후 그때까지 찾은 최선의 해 출력 ("cancelled": true), 해가 없으면 status "cancelled"
 """
 
+import os
 import json
 import sys
 import math
-import calendar
-import holidays
+import time
+import signal
 import random
-from collections import defaultdict
-from ortools.sat.python import cp_model
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from kr_calendar import month_calendar
+from cpu_budget import solver_plan as make_solver_plan, apply_solver_plan
+from model_cache import ModelCache, structure_key
+from schedule_format import (
+    COMPACT_FORMAT, VERBOSE_FORMAT, SCHEDULE_FORMATS, DUTY_CHARS, EMPTY_CELL,
+    encode_schedule, decode_schedule, format_schedule
+)
+
+
+# solver 기본 시간 제한 / deadline 이 있을 때 결과 출력용 여유 (초)
+MAX_SOLVE_SECONDS = 120.0
+OUTPUT_MARGIN_SECONDS = 1.0
+
+# 제약 모드: strict (모든 제약 hard, 불가능하면 INFEASIBLE) / soft (위반 허용 + 벌점)
+SOLVE_MODES = ('strict', 'soft')
+SOFT_MAX_SOLVE_SECONDS = 10.0
+# soft 모드: 해를 찾은 뒤 이 시간 동안 더 나은 해가 없으면 중단 (위반이 불가피한 달은 최적 증명이 오래 걸림)
+SOFT_STALL_SECONDS = 2.0
+
+# soft 모드 위반 1개당 기본 벌점 (DE 선호도 목표보다 충분히 크게)
+DEFAULT_SOFT_WEIGHTS = {
+    'daily_wallet': 1000,
+    'z_rule': 100,
+    'consecutive_work': 100,
+    'nurse_wallet': 50,
+    'low_grade': 50
+}
+
+# SIGTERM (solve 취소) 수신 여부
+STOP_REQUESTED = threading.Event()
+
+
+class SolveCancelled(Exception):
+    """취소 시점까지 찾은 해가 없음"""
+
+
+def solve_until_stopped(solver, model, poll_interval=0.2, stall_seconds=None):
+    """solver.Solve 를 별도 스레드에서 실행, STOP_REQUESTED 가 set 되면 StopSearch
+    
+    CP-SAT 탐색 중에는 main 스레드가 Python signal handler 를 실행할 수 없어서
+    main 스레드는 대기하면서 취소 여부만 확인
+    stall_seconds: 마지막으로 더 나은 해를 찾은 뒤 이 시간이 지나면 StopSearch (취소와 달리 정상 결과)
+    """
+    from ortools.sat.python import cp_model
+    
+    class ProgressCallback(cp_model.CpSolverSolutionCallback):
+        def __init__(self):
+            super().__init__()
+            self.improved_at = None
+        
+        def on_solution_callback(self):
+            self.improved_at = time.monotonic()
+    
+    callback = ProgressCallback() if stall_seconds else None
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('status', solver.Solve(model, callback)),
+                              daemon=True)
+    thread.start()
+    while thread.is_alive():
+        if STOP_REQUESTED.is_set():
+            solver.StopSearch()
+        elif callback and callback.improved_at and time.monotonic() - callback.improved_at > stall_seconds:
+            solver.StopSearch()
+        thread.join(poll_interval)
+    return result['status']
 
 
 # ========================================
@@ -115,6 +202,38 @@ def calculate_auto_x(work_days, num_days, total_weekends_holidays, forced_x):
 NIGHT_KEEP_N_COUNT = 15
 
 
+# ========================================
+# Duty Matrix (nurses x days, int8)
+# D=0, E=1, N=2, X=3, 빈 칸=-1
+# ========================================
+
+DUTY_LUT = np.full(256, -1, dtype=np.int8)
+for _duty, _code in WEIGHT.items():
+    DUTY_LUT[ord(_duty)] = _code
+
+# Z_ALLOWED[z, duty] = z 패턴 다음 날 duty 허용 여부 (Z_RULES에 없는 z는 전부 False)
+Z_ALLOWED = np.zeros((64, 4), dtype=bool)
+for _z, _allowed in Z_RULES.items():
+    for _duty in _allowed:
+        Z_ALLOWED[_z, WEIGHT[_duty]] = True
+
+
+def duty_matrix(rows):
+    """DENX 문자열 리스트 -> int8 행렬 (길이가 다르면 -1로 채움)"""
+    if not rows:
+        return np.zeros((0, 0), dtype=np.int8)
+    width = max(len(row) for row in rows)
+    buf = ''.join(row.ljust(width, EMPTY_CELL) for row in rows).encode('ascii', 'replace')
+    return DUTY_LUT[np.frombuffer(buf, dtype=np.uint8)].reshape(len(rows), width)
+
+
+def run_lengths(work):
+    """각 칸에서 끝나는 연속 True 길이 (행 단위)"""
+    cols = np.arange(work.shape[1])
+    last_break = np.maximum.accumulate(np.where(work, -1, cols), axis=1)
+    return np.where(work, cols - last_break, 0)
+
+
 # ========================================
 # Validation Functions
 # ========================================
@@ -123,16 +242,13 @@ def validate_input(data, parsed_data):
     """Validate input data"""
     errors = []
     
-    year = data['year']
-    month = data['month']
     num_days = parsed_data['num_days']
-    nurses_data = data['nurses']
-    nurse_count = len(nurses_data)
+    roster = parsed_data['roster']
+    nurse_count = len(roster)
     
     # Validate past_3days
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        past = nurse_data.get('past_3days', [])
+    for name, rec in roster.items():
+        past = rec['past_3days']
         
         if len(past) != 3:
             errors.append(f"{name}: past_3days must have exactly 3 elements")
@@ -150,12 +266,18 @@ def validate_input(data, parsed_data):
                     f"{name}: past_3days pattern {pattern} (z={z}) is not allowed by Z_RULES. "
                     f"This pattern is forbidden and cannot occur."
                 )
+        
+        # 이전 달까지 이어진 연속 근무일 수 (optional, 이전 달 근무표에서 계산)
+        streak = rec['past_work_streak']
+        if not isinstance(streak, int) or isinstance(streak, bool) or streak < 0:
+            errors.append(f"{name}: past_work_streak must be a non-negative integer, got {streak!r}")
 
-    # Validate daily_wallet sum
+    # Validate daily_wallet sum (soft 모드는 daily_wallet 위반으로 보고)
+    soft = parsed_data.get('mode') == 'soft'
     daily_wallet = parsed_data['daily_wallet']
     for day, wallet in daily_wallet.items():
         total = sum(wallet.values())
-        if total != nurse_count:
+        if total != nurse_count and not soft:
             errors.append(f"Day {day}: daily_wallet sum ({total}) != nurse count ({nurse_count})")
     
     # Validate date range for new nurses
@@ -175,79 +297,138 @@ def validate_input(data, parsed_data):
     # Validate preference conflicts
     preferences = parsed_data['preferences']
     
-    # Check daily_wallet overflow
-    daily_pref_count = defaultdict(lambda: defaultdict(int))
-    for pref in preferences:
+    # 희망 근무 행렬 (preferences x days)
+    pref_names = []
+    pref_matrix = np.full((len(preferences), num_days), -1, dtype=np.int8)
+    for row, pref in enumerate(preferences):
         name = pref['name']
-        schedule = pref.get('schedule', {})
+        pref_names.append(name)
         
-        for day_str, duty in schedule.items():
+        for day_str, duty in pref.get('schedule', {}).items():
             day = int(day_str)
-            daily_pref_count[day][duty] += 1
+            if not (1 <= day <= num_days):
+                errors.append(f"{name}: preference day {day} out of range (1~{num_days})")
+            elif duty not in WEIGHT:
+                errors.append(f"{name}: preference day {day} invalid duty '{duty}'")
+            else:
+                pref_matrix[row, day - 1] = WEIGHT[duty]
+    
+    # Check daily_wallet overflow (soft 모드는 daily_wallet 위반으로 보고)
+    daily_pref_count = np.stack([(pref_matrix == code).sum(axis=0) for code in range(4)])
+    available = np.array(
+        [[daily_wallet[day][duty] for day in range(1, num_days + 1)] for duty in WEIGHT],
+        dtype=np.int64
+    ).reshape(4, num_days)
+    overflow = (daily_pref_count > available) & (not soft)
+    for code, day_idx in zip(*np.nonzero(overflow)):
+        duty = DUTY_CHARS[code]
+        errors.append(
+            f"Day {day_idx + 1} {duty}: {daily_pref_count[code, day_idx]} nurses want it "
+            f"but only {available[code, day_idx]} available"
+        )
     
-    for day, duty_counts in daily_pref_count.items():
-        for duty, count in duty_counts.items():
-            available = daily_wallet.get(day, {}).get(duty, 0)
-            if count > available:
+    # Check keep_type / 근무 기간 conflicts
+    days = np.arange(1, num_days + 1)
+    for row, name in enumerate(pref_names):
+        rec = roster.get(name)
+        keep_type = rec['keep_type'] if rec else 'All'
+        wanted = pref_matrix[row]
+        
+        if keep_type == 'DayFixed':
+            forbidden = (wanted == WEIGHT['E']) | (wanted == WEIGHT['N'])
+        elif keep_type == 'NightFixed':
+            forbidden = (wanted == WEIGHT['D']) | (wanted == WEIGHT['E'])
+        else:
+            forbidden = np.zeros(num_days, dtype=bool)
+        for day in days[forbidden]:
+            errors.append(f"{name}: preference day {day} {DUTY_CHARS[wanted[day - 1]]} not allowed for {keep_type}")
+        
+        outside = np.zeros(num_days, dtype=bool)
+        if rec:
+            outside |= (days < rec['start_day']) | (days > rec['last_day'])
+        for day in days[outside & (wanted >= 0) & (wanted != WEIGHT['X'])]:
+            errors.append(f"{name}: preference day {day} {DUTY_CHARS[wanted[day - 1]]} outside work period (must be X)")
+    
+    # Check Low Grade overlap (soft 모드는 벌점으로 처리)
+    low_grade_nurses = set(parsed_data.get('low_grade_nurses', []))
+    if len(low_grade_nurses) >= 2 and parsed_data.get('mode') != 'soft':
+        low_rows = [row for row, name in enumerate(pref_names) if name in low_grade_nurses]
+        low_prefs = pref_matrix[low_rows]
+        for code in (WEIGHT['D'], WEIGHT['E'], WEIGHT['N']):
+            counts = (low_prefs == code).sum(axis=0)
+            for day in days[counts > 1]:
                 errors.append(
-                    f"Day {day} {duty}: {count} nurses want it but only {available} available"
+                    f"Day {day} {DUTY_CHARS[code]}: {counts[day - 1]} Low Grade nurses want it (max 1)"
                 )
     
     return errors
 
 
 def validate_result(result, parsed_data):
-    """Validate generated schedule result"""
+    """Validate generated schedule result (compact/verbose 모두 허용)"""
     num_days = parsed_data['num_days']
     nurse_wallets = parsed_data['nurse_wallets']
     daily_wallet = parsed_data['daily_wallet']
     low_grade_nurses = parsed_data.get('low_grade_nurses', [])
+    roster = parsed_data['roster']
+    max_consecutive_work = parsed_data.get('max_consecutive_work', 6)
     
     validation = {
         'daily_wallet_satisfied': True,
         'nurse_wallet_satisfied': True,
         'low_grade_satisfied': True,
+        'z_rule_satisfied': True,
+        'consecutive_work_satisfied': True,
+        'keep_type_satisfied': True,
+        'work_period_satisfied': True,
+        'preference_satisfied': True,
         'daily_violations': [],
         'nurse_violations': [],
         'low_grade_violations': [],
+        'z_rule_violations': [],
+        'consecutive_work_violations': [],
+        'keep_type_violations': [],
+        'work_period_violations': [],
+        'preference_violations': [],
         'nurse_duty_counts': {}
     }
     
-    # Check daily duty counts
-    for day in range(1, num_days + 1):
-        day_count = defaultdict(int)
-        
-        for nurse, schedule in result.items():
-            duty = schedule.get(str(day))
-            if duty:
-                day_count[duty] += 1
-        
-        for duty in ['D', 'E', 'N', 'X']:
-            expected = daily_wallet[day][duty]
-            actual = day_count[duty]
-            
-            if actual != expected:
-                validation['daily_wallet_satisfied'] = False
-                validation['daily_violations'].append(
-                    f"Day {day} {duty}: expected {expected}, got {actual}"
-                )
+    # 행렬 열: past_3days(-3,-2,-1) + 1..num_days
+    compact = format_schedule(result, COMPACT_FORMAT)
+    if compact['offset'] != -3:
+        compact = encode_schedule(decode_schedule(compact), offset=-3)
+    nurses = list(compact['nurses'].keys())
+    full = duty_matrix([compact['nurses'][nurse][:num_days + 3] for nurse in nurses])
+    if full.shape[1] < num_days + 3:
+        full = np.pad(full, ((0, 0), (0, num_days + 3 - full.shape[1])), constant_values=-1)
+    matrix = full[:, 3:]
+    days = np.arange(1, num_days + 1)
+    
+    # Check daily duty counts (열 합계)
+    daily_count = np.stack([(matrix == code).sum(axis=0) for code in range(4)])
+    expected_daily = np.array(
+        [[daily_wallet[day][duty] for day in days] for duty in WEIGHT], dtype=np.int64
+    ).reshape(4, num_days)
+    for day_idx in range(num_days):
+        for code in np.nonzero(daily_count[:, day_idx] != expected_daily[:, day_idx])[0]:
+            validation['daily_wallet_satisfied'] = False
+            validation['daily_violations'].append(
+                f"Day {day_idx + 1} {DUTY_CHARS[code]}: expected {expected_daily[code, day_idx]}, "
+                f"got {daily_count[code, day_idx]}"
+            )
     
-    # Check nurse duty counts (N, X only for new wallet structure)
-    for nurse, schedule in result.items():
-        duty_count = defaultdict(int)
-        
-        for day in range(1, num_days + 1):
-            duty = schedule.get(str(day))
-            if duty:
-                duty_count[duty] += 1
-        
-        validation['nurse_duty_counts'][nurse] = dict(duty_count)
+    # Check nurse duty counts (행 합계, N, X only for new wallet structure)
+    nurse_count = np.stack([(matrix == code).sum(axis=1) for code in range(4)], axis=1)
+    for row, nurse in enumerate(nurses):
+        duty_count = {duty: int(nurse_count[row, code]) for duty, code in WEIGHT.items()
+                      if nurse_count[row, code] > 0}
+        validation['nurse_duty_counts'][nurse] = duty_count
         
         # Check nurse_wallet satisfaction (N, X only, allow +/-1)
         if nurse in nurse_wallets:
             for duty in ['N', 'X']:
                 expected = nurse_wallets[nurse].get(duty, 0)
-                actual = duty_count[duty]
+                actual = duty_count.get(duty, 0)
                 
                 if not (expected - 1 <= actual <= expected + 1):
                     validation['nurse_wallet_satisfied'] = False
@@ -267,47 +448,225 @@ def validate_result(result, parsed_data):
                         f"{nurse}: N shortage (remaining N: {remaining_N}, target: <=1)"
                     )
     
-    # Check Low Grade Rule
+    # Check Low Grade Rule (low grade 행만 마스킹)
     if len(low_grade_nurses) >= 2:
-        for day in range(1, num_days + 1):
-            for duty in ['D', 'E', 'N']:
-                count = sum(1 for nurse in low_grade_nurses 
-                           if result.get(nurse, {}).get(str(day)) == duty)
-                if count > 1:
-                    validation['low_grade_satisfied'] = False
-                    validation['low_grade_violations'].append(
-                        f"Day {day} {duty}: Low Grade {count} assigned (max 1)"
-                    )
+        low_mask = np.isin(nurses, low_grade_nurses)
+        for code in (WEIGHT['D'], WEIGHT['E'], WEIGHT['N']):
+            counts = (matrix[low_mask] == code).sum(axis=0)
+            for day in days[counts > 1]:
+                validation['low_grade_satisfied'] = False
+                validation['low_grade_violations'].append(
+                    f"Day {day} {DUTY_CHARS[code]}: Low Grade {counts[day - 1]} assigned (max 1)"
+                )
+    
+    # 근무 기간 (신규 start_day 이전 / 퇴사 last_day 이후는 강제 X)
+    work_start = np.array([roster[nurse]['start_day'] for nurse in nurses], dtype=np.int64)
+    work_end = np.array([roster[nurse]['last_day'] for nurse in nurses], dtype=np.int64)
+    in_period = (days >= work_start[:, None]) & (days <= work_end[:, None])
+    
+    for row, day_idx in zip(*np.nonzero(~in_period & (matrix != WEIGHT['X']))):
+        validation['work_period_satisfied'] = False
+        validation['work_period_violations'].append(
+            f"{nurses[row]} Day {day_idx + 1}: outside work period but assigned "
+            f"{DUTY_CHARS[matrix[row, day_idx]] if matrix[row, day_idx] >= 0 else 'nothing'}"
+        )
+    
+    # Keep type restrictions
+    for row, nurse in enumerate(nurses):
+        keep_type = roster[nurse]['keep_type']
+        if keep_type == 'DayFixed':
+            banned = ('E', 'N')
+        elif keep_type == 'NightFixed':
+            banned = ('D', 'E')
+        else:
+            continue
+        for day in days[np.isin(matrix[row], [WEIGHT[d] for d in banned])]:
+            validation['keep_type_satisfied'] = False
+            validation['keep_type_violations'].append(
+                f"{nurse} Day {day}: {DUTY_CHARS[matrix[row, day - 1]]} not allowed for {keep_type}"
+            )
+    
+    # Preferences (희망 근무 고정)
+    row_of = {nurse: row for row, nurse in enumerate(nurses)}
+    for pref in parsed_data.get('preferences', []):
+        row = row_of.get(pref['name'])
+        if row is None:
+            continue
+        for day_str, duty in pref.get('schedule', {}).items():
+            day = int(day_str)
+            if 1 <= day <= num_days and matrix[row, day - 1] != WEIGHT.get(duty, -2):
+                validation['preference_satisfied'] = False
+                validation['preference_violations'].append(
+                    f"{pref['name']} Day {day}: wanted {duty}"
+                )
+    
+    # zRule: 3일 패턴 z -> 다음 날 duty (past_3days 포함)
+    # 신규/퇴사는 근무 기간 밖의 날짜가 포함된 window 제외 (solver와 동일)
+    if full.shape[1] >= 4:
+        d1, d2, d3, nxt = full[:, :-3], full[:, 1:-2], full[:, 2:-1], full[:, 3:]
+        known = (d1 >= 0) & (d2 >= 0) & (d3 >= 0) & (nxt >= 0)
+        z = np.where(known, 16 * d1 + 4 * d2 + d3, 0)
+        ok = Z_ALLOWED[z, np.where(known, nxt, 0)]
+        # window j의 양수 날짜 범위: max(j-2, 1) ~ j+1
+        first_day = np.maximum(np.arange(full.shape[1] - 3) - 2, 1)
+        last_day = np.arange(full.shape[1] - 3) + 1
+        in_window = (first_day >= work_start[:, None]) & (last_day <= work_end[:, None])
+        # past_3days만으로 된 금지 패턴은 validate_input에서 처리
+        ok[:, 0] |= ~np.isin(z[:, 0], list(Z_RULES))
+        for row, j in zip(*np.nonzero(known & in_window & ~ok)):
+            pattern = '-'.join(DUTY_CHARS[c] for c in full[row, j:j + 3])
+            validation['z_rule_satisfied'] = False
+            validation['z_rule_violations'].append(
+                f"{nurses[row]} Day {j + 1}: {pattern} -> {DUTY_CHARS[full[row, j + 3]]} not allowed"
+            )
+    
+    # Max consecutive work (past_3days에 X가 없는 기존 간호사는 past 포함)
+    work = (full >= 0) & (full != WEIGHT['X'])
+    carry_past = np.array([
+        max_consecutive_work > 2 and not roster[nurse]['is_new']
+        and not (full[row, :3] == WEIGHT['X']).any()
+        for row, nurse in enumerate(nurses)
+    ], dtype=bool)
+    work[~carry_past, :3] = False
+    # past_work_streak 가 past_3days 보다 길면 1일부터 이어진 근무에 차이만큼 더함
+    extra = np.array([max(roster[nurse]['past_work_streak'] - 3, 0) for nurse in nurses]) * carry_past
+    streak = run_lengths(work) + np.logical_and.accumulate(work, axis=1) * extra[:, None]
+    streak = streak[:, 3:]
+    for row in np.nonzero(streak.max(axis=1, initial=0) > max_consecutive_work)[0]:
+        validation['consecutive_work_satisfied'] = False
+        validation['consecutive_work_violations'].append(
+            f"{nurses[row]}: {streak[row].max()} consecutive work days "
+            f"(max {max_consecutive_work}, ending Day {streak[row].argmax() + 1})"
+        )
     
     return validation
 
 
 # ========================================
-# Parse Input
+# Roster Compiler
 # ========================================
 
-def parse_input(input_json):
-    """Parse JSON input and calculate wallets (N, X only)"""
-    data = json.loads(input_json)
+def period_wallet(keep_type, first_day, last_day, n_count, cal):
+    """근무 기간 first_day ~ last_day 인 신규/퇴사 간호사 wallet (N, X)"""
+    num_days = cal.num_days
+    forced_x = (first_day - 1) + (num_days - last_day)
+    
+    if keep_type == 'DayFixed':
+        # DK 신규/퇴사: N=0, X = 기간 밖 + 기간 내 주말/공휴일
+        return {
+            'N': 0,
+            'X': forced_x + cal.off_days_between(first_day, last_day)
+        }
     
-    year = data['year']
-    month = data['month']
-    num_days = calendar.monthrange(year, month)[1]
+    # NK/All 신규/퇴사: N manual, X auto
+    work_days = last_day - first_day + 1
+    return {
+        'N': n_count,
+        'X': calculate_auto_x(work_days, num_days, cal.off_days, forced_x)
+    }
+
+
+def compile_roster(data, cal):
+    """간호사별 record를 1회 순회로 생성 (이름 -> record, nurses 순서 유지)
+    
+    record:
+        keep_type, past_3days, de_preference, special_days, is_low_grade,
+        is_new, is_quit, start_day, last_day (근무 기간),
+        wallet: 기존 DK/NK, 신규/퇴사는 여기서 계산 (All 기존은 parse_input에서)
+        pool: All 공용 N, X 에서 차감할 양
+    """
+    num_days = cal.num_days
+    roster = {}
     
-    # Korean holidays
-    kr_holidays = holidays.KR(years=year)
+    for index, nurse_data in enumerate(data['nurses']):
+        name = nurse_data['name']
+        if name in roster:
+            raise ValueError(f"Duplicate nurse name: {name}")
+        
+        roster[name] = {
+            'index': index,
+            'name': name,
+            'keep_type': nurse_data.get('keep_type', 'All'),
+            'past_3days': nurse_data.get('past_3days', []),
+            'past_work_streak': nurse_data.get('past_work_streak', 0),
+            'de_preference': nurse_data.get('de_preference', '='),
+            'special_days': nurse_data.get('special_days', 0),
+            'is_low_grade': nurse_data.get('is_low_grade', False),
+            'is_new': False,
+            'is_quit': False,
+            'start_day': 1,
+            'last_day': num_days,
+            'wallet': None,
+            'pool': {'N': 0, 'X': 0}
+        }
     
-    # Generate daily_wallet
+    # 신규: start_day 이전은 강제 X
+    for new_data in data.get('new', []):
+        rec = roster.get(new_data['name'])
+        if rec is None:
+            raise ValueError(f"New nurse {new_data['name']} is not in nurses")
+        
+        rec['is_new'] = True
+        start_day = new_data.get('start_day')
+        if start_day is None:
+            print(f"[WARNING] New nurse {rec['name']} has no start_day, skipping", file=sys.stderr)
+            continue
+        
+        wallet = period_wallet(rec['keep_type'], start_day, num_days, new_data.get('n_count', 0), cal)
+        rec['pool']['N'] += wallet['N']
+        rec['pool']['X'] += wallet['X']
+        rec['start_day'] = start_day
+        rec['wallet'] = wallet
+    
+    # 퇴사: last_day 이후는 강제 X
+    for quit_data in data.get('quit', []):
+        rec = roster.get(quit_data['name'])
+        if rec is None:
+            raise ValueError(f"Quit nurse {quit_data['name']} is not in nurses")
+        
+        rec['is_quit'] = True
+        last_day = quit_data.get('last_day')
+        if last_day is None:
+            print(f"[WARNING] Quit nurse {rec['name']} has no last_day, skipping", file=sys.stderr)
+            continue
+        
+        wallet = period_wallet(rec['keep_type'], 1, last_day, quit_data.get('n_count', 0), cal)
+        rec['pool']['N'] += wallet['N']
+        rec['pool']['X'] += wallet['X']
+        rec['last_day'] = last_day
+        rec['wallet'] = wallet
+    
+    # 기존 DK/NK (All 기존은 공용 N, X 분배 후 결정)
+    for rec in roster.values():
+        if rec['is_new'] or rec['is_quit']:
+            continue
+        
+        if rec['keep_type'] == 'DayFixed':
+            rec['wallet'] = {'N': 0, 'X': cal.off_days}
+        elif rec['keep_type'] == 'NightFixed':
+            rec['wallet'] = {'N': NIGHT_KEEP_N_COUNT, 'X': num_days - NIGHT_KEEP_N_COUNT}
+        else:
+            continue
+        
+        rec['pool']['N'] += rec['wallet']['N']
+        rec['pool']['X'] += rec['wallet']['X']
+    
+    return roster
+
+
+def build_daily_wallet(data, cal):
+    """daily_wallet_config -> 날짜별 wallet (주말/공휴일은 weekend)
+    
+    Returns:
+        (daily_wallet, weekday_wallet, weekend_wallet)
+    """
     daily_wallet_config = data.get('daily_wallet_config', {})
     weekday_wallet = daily_wallet_config.get('weekday', {})
     weekend_wallet = daily_wallet_config.get('weekend', {})
     
     daily_wallet = {}
-    for day in range(1, num_days + 1):
-        date = f"{year}-{month:02d}-{day:02d}"
-        is_weekend = calendar.weekday(year, month, day) >= 5 or date in kr_holidays
-        
-        if is_weekend:
+    for day in range(1, cal.num_days + 1):
+        if cal.is_off_day(day):
             daily_wallet[day] = dict(weekend_wallet)
         else:
             daily_wallet[day] = dict(weekday_wallet)
@@ -329,159 +688,149 @@ def parse_input(input_json):
             f"  Full config: {daily_wallet_config}"
         )
     
-    # Calculate nurse_wallet (N, X only)
-    nurses_data = data['nurses']
-    nurse_count = len(nurses_data)
-    
-    # Get new/quit nurse lists
-    new_nurses_list = data.get('new', [])
-    quit_nurses_list = data.get('quit', [])
-    new_nurse_names = set(n['name'] for n in new_nurses_list)
-    quit_nurse_names = set(q['name'] for q in quit_nurses_list)
-    
-    # Extract max_consecutive_work early
-    max_consecutive_work = data.get('max_consecutive_work', 6)
-    if not (1 <= max_consecutive_work <= 10):
-        raise ValueError(f"max_consecutive_work must be 1~10, got {max_consecutive_work}")
-    
-    # Calculate weekday/weekend counts
-    weekdays = 0
-    weekends = 0
+    return daily_wallet, weekday_wallet, weekend_wallet
+
+
+def wallet_budget(data, daily_wallet, roster):
+    """All 기존 간호사가 나눠 가질 N, X 와 min_N 가능 범위
     
-    for day in range(1, num_days + 1):
-        date = f"{year}-{month:02d}-{day:02d}"
-        is_weekend = calendar.weekday(year, month, day) >= 5
-        is_holiday = date in kr_holidays
-        
-        if is_weekend or is_holiday:
-            weekends += 1
-        else:
-            weekdays += 1
+    월 전체 N, X 에서 Special 휴가, DK/NK 기존, 신규/퇴사 몫을 뺀 나머지를 All 기존이 분배
     
+    Returns:
+        dict: all_nurses, day_keep_nurses, night_keep_nurses, available_N, available_X,
+              min_N (입력값), min_min_N, max_min_N (All 기존이 없으면 None)
+    """
     # Classify nurses by keep_type (excluding new/quit for All count)
     all_nurses_existing = []  # All 기존
     day_keep_nurses = []      # DK 기존
     night_keep_nurses = []    # NK 기존
     
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        keep_type = nurse_data.get('keep_type', 'All')
-        
+    for name, rec in roster.items():
         # Skip new/quit nurses from type classification
-        if name in new_nurse_names or name in quit_nurse_names:
+        if rec['is_new'] or rec['is_quit']:
             continue
         
-        if keep_type == 'DayFixed':
+        if rec['keep_type'] == 'DayFixed':
             day_keep_nurses.append(name)
-        elif keep_type == 'NightFixed':
+        elif rec['keep_type'] == 'NightFixed':
             night_keep_nurses.append(name)
         else:
             all_nurses_existing.append(name)
     
-    num_day_keep = len(day_keep_nurses)
-    num_night_keep = len(night_keep_nurses)
-    num_all_existing = len(all_nurses_existing)
-    num_new = len(new_nurse_names)
-    num_quit = len(quit_nurse_names)
-    
     # Calculate monthly totals
-    total_D = sum(daily_wallet[day]['D'] for day in range(1, num_days + 1))
-    total_E = sum(daily_wallet[day]['E'] for day in range(1, num_days + 1))
-    total_N = sum(daily_wallet[day]['N'] for day in range(1, num_days + 1))
-    total_X = sum(daily_wallet[day]['X'] for day in range(1, num_days + 1))
+    total_N = sum(wallet['N'] for wallet in daily_wallet.values())
+    total_X = sum(wallet['X'] for wallet in daily_wallet.values())
     
     # ========================================
     # (A-1-1) Special 휴가 차감
-    # ========================================
-    for nurse_data in nurses_data:
-        special_days = nurse_data.get('special_days', 0)
-        if special_days > 0:
-            total_X -= special_days
-    
-    # ========================================
     # (A-2) NK/DK/All 신규퇴사 N, X 차감
     # ========================================
+    for rec in roster.values():
+        total_X -= rec['special_days']
+        total_N -= rec['pool']['N']
+        total_X -= rec['pool']['X']
     
-    # NK 기존
-    total_N -= num_night_keep * NIGHT_KEEP_N_COUNT
-    total_X -= num_night_keep * (num_days - NIGHT_KEEP_N_COUNT)
+    num_all_existing = len(all_nurses_existing)
+    min_min_N = max_min_N = None
+    if num_all_existing > 0:
+        # 상한: floor division / 하한: 모두 소화하려면 최소 ceil - 1
+        max_min_N = total_N // num_all_existing
+        min_min_N = math.ceil(total_N / num_all_existing) - 1
+    
+    return {
+        'all_nurses': all_nurses_existing,
+        'day_keep_nurses': day_keep_nurses,
+        'night_keep_nurses': night_keep_nurses,
+        'available_N': total_N,
+        'available_X': total_X,
+        'min_N': data.get('nurse_wallet_min', {}).get('N', 6),
+        'min_min_N': min_min_N,
+        'max_min_N': max_min_N
+    }
+
+
+def all_nurse_wallets(budget):
+    """All 기존 wallet: N = min_N, X = 남은 X 균등 분배 (나머지는 앞 순서부터 +1)"""
+    all_nurses = budget['all_nurses']
+    if not all_nurses:
+        return {}
+    per_nurse_X, remainder_X = divmod(budget['available_X'], len(all_nurses))
+    return {
+        name: {'N': budget['min_N'], 'X': per_nurse_X + (1 if i < remainder_X else 0)}
+        for i, name in enumerate(all_nurses)
+    }
+
+
+def low_grade_limit(weekday_wallet, weekend_wallet):
+    """Low Grade 최대 인원 (하루 D/E/N 중 가장 적은 인원 - 근무마다 1명까지)"""
+    return min(
+        weekday_wallet['D'],
+        weekday_wallet['E'],
+        weekday_wallet['N'],
+        weekend_wallet['D'],
+        weekend_wallet['E'],
+        weekend_wallet['N'],
+    )
+
+
+# ========================================
+# Parse Input
+# ========================================
+
+def parse_input(input_json):
+    """Parse JSON input and calculate wallets (N, X only)"""
+    data = json.loads(input_json)
     
-    # DK 기존 (N=0이므로 X만)
-    total_X -= num_day_keep * weekends
+    year = data['year']
+    month = data['month']
     
-    # NK 신규/퇴사
-    for n in new_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == n['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'NightFixed':
-            total_N -= n.get('n_count', 0)
-            # auto_x calculation (unified)
-            start_day = n.get('start_day', 1)
-            work_days = num_days - start_day + 1
-            forced_x = start_day - 1
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            total_X -= auto_x
-    
-    for q in quit_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == q['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'NightFixed':
-            total_N -= q.get('n_count', 0)
-            # auto_x calculation (unified)
-            last_day = q.get('last_day', num_days)
-            work_days = last_day
-            forced_x = num_days - last_day
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            total_X -= auto_x
-    
-    # DK 신규/퇴사
-    for n in new_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == n['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'DayFixed':
-            start_day = n.get('start_day', 1)
-            work_weekends = sum(1 for day in range(start_day, num_days + 1)
-                               if calendar.weekday(year, month, day) >= 5 or 
-                               f"{year}-{month:02d}-{day:02d}" in kr_holidays)
-            total_X -= (start_day - 1) + work_weekends
-    
-    for q in quit_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == q['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'DayFixed':
-            last_day = q.get('last_day', num_days)
-            work_weekends = sum(1 for day in range(1, last_day + 1)
-                               if calendar.weekday(year, month, day) >= 5 or 
-                               f"{year}-{month:02d}-{day:02d}" in kr_holidays)
-            total_X -= work_weekends + (num_days - last_day)
-    
-    # All 신규/퇴사 (X, N만)
-    for n in new_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == n['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'All':
-            total_N -= n.get('n_count', 0)
-            # auto_x calculation (unified)
-            start_day = n.get('start_day', 1)
-            work_days = num_days - start_day + 1
-            forced_x = start_day - 1
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            total_X -= auto_x
-    for q in quit_nurses_list:
-        nurse_data = next((nd for nd in nurses_data if nd['name'] == q['name']), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        if keep_type == 'All':
-            total_N -= q.get('n_count', 0)
-            # auto_x calculation (unified)
-            last_day = q.get('last_day', num_days)
-            work_days = last_day
-            forced_x = num_days - last_day
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            total_X -= auto_x
-    
-    # 결과: all_available_N, all_available_X
-    all_available_N = total_N
-    all_available_X = total_X
+    # Korean calendar (주말/공휴일 bitmap, 캐시)
+    cal = month_calendar(year, month)
+    num_days = cal.num_days
+    
+    daily_wallet, weekday_wallet, weekend_wallet = build_daily_wallet(data, cal)
+    
+    # Output schedule format (compact / verbose)
+    schedule_format = data.get('schedule_format', VERBOSE_FORMAT)
+    if schedule_format not in SCHEDULE_FORMATS:
+        raise ValueError(f"schedule_format must be one of {SCHEDULE_FORMATS}, got {schedule_format}")
+    
+    # 제약 모드 + soft 벌점 가중치
+    solve_mode = data.get('mode', 'strict')
+    if solve_mode not in SOLVE_MODES:
+        raise ValueError(f"mode must be one of {SOLVE_MODES}, got {solve_mode}")
+    
+    soft_weights = dict(DEFAULT_SOFT_WEIGHTS)
+    for key, weight in (data.get('soft_weights') or {}).items():
+        if key not in DEFAULT_SOFT_WEIGHTS:
+            raise ValueError(f"soft_weights: unknown key '{key}' (allowed: {list(DEFAULT_SOFT_WEIGHTS)})")
+        if not isinstance(weight, int) or isinstance(weight, bool) or weight < 0:
+            raise ValueError(f"soft_weights.{key} must be a non-negative integer, got {weight}")
+        soft_weights[key] = weight
+    
+    # Extract max_consecutive_work early
+    max_consecutive_work = data.get('max_consecutive_work', 6)
+    if not (1 <= max_consecutive_work <= 10):
+        raise ValueError(f"max_consecutive_work must be 1~10, got {max_consecutive_work}")
+    
+    # Calculate weekday/weekend counts
+    weekdays = cal.work_days
+    weekends = cal.off_days
+    
+    # Calculate nurse_wallet (N, X only)
+    nurses_data = data['nurses']
+    nurse_count = len(nurses_data)
+    
+    # Roster (간호사별 keep_type, 신규/퇴사 기간, wallet 등 - 1회 순회)
+    roster = compile_roster(data, cal)
+    
+    # (A-1) ~ (A-2) All 기존이 나눠 가질 N, X
+    budget = wallet_budget(data, daily_wallet, roster)
+    all_nurses_existing = budget['all_nurses']
+    day_keep_nurses = budget['day_keep_nurses']
+    night_keep_nurses = budget['night_keep_nurses']
+    num_all_existing = len(all_nurses_existing)
+    all_available_N = budget['available_N']
     
     # ========================================
     # (A-3) All 기존 N, X 계산
@@ -489,18 +838,13 @@ def parse_input(input_json):
     nurse_wallets = {}
     
     if num_all_existing > 0:
-        # Get user input min_N
-        nurse_wallet_min = data.get('nurse_wallet_min', {})
-        user_min_N = nurse_wallet_min.get('N', 6)
-        
-        # Calculate max_min_N (floor division)
-        max_min_N = all_available_N // num_all_existing
-        
-        # Calculate min_min_N (lower bound)
-        min_min_N = math.ceil(all_available_N / num_all_existing) - 1
+        user_min_N = budget['min_N']
+        max_min_N = budget['max_min_N']
+        min_min_N = budget['min_min_N']
         
+        # min_N 범위 검사 (soft 모드는 nurse_wallet / daily_wallet 위반으로 보고)
         # Validate user_min_N - Lower bound check
-        if user_min_N < min_min_N:
+        if user_min_N < min_min_N and solve_mode == 'strict':
             raise ValueError(
                 f"min_N={user_min_N}은(는) 너무 낮습니다.\n"
                 f"  이유: All 타입 간호사 {num_all_existing}명이 N {all_available_N}개를 소화하려면\n"
@@ -513,7 +857,7 @@ def parse_input(input_json):
             )
         
         # Validate user_min_N - Upper bound check
-        if user_min_N > max_min_N:
+        if user_min_N > max_min_N and solve_mode == 'strict':
             raise ValueError(
                 f"min_N={user_min_N}은(는) 불가능합니다.\n"
                 f"  이유: All 타입 간호사 {num_all_existing}명이 사용할 수 있는 N은 총 {all_available_N}개입니다.\n"
@@ -524,161 +868,53 @@ def parse_input(input_json):
                 f"    3. Night샤 인원 줄이기"
             )
         
-        per_nurse_N = user_min_N
-        per_nurse_X = all_available_X // num_all_existing
-        remainder_X = all_available_X % num_all_existing
-        
-        # (B-1) + (B-2) All 기존 wallet 생성 (버퍼 포함)
-        for i, name in enumerate(all_nurses_existing):
-            x_count = per_nurse_X + (1 if i < remainder_X else 0)
-            
-            nurse_wallets[name] = {
-                ###'N': per_nurse_N + 1,  ### N+1 버퍼
-                ###'X': x_count + 1       ### X+1 버퍼
-                'N': per_nurse_N,  ### N+1 버퍼 제거
-                'X': x_count       ### X+1 버퍼 제거           
-            }
-    
-    # ========================================
-    # (B-1) DK 기존 wallet
-    # ========================================
-    for name in day_keep_nurses:
-        nurse_wallets[name] = {
-            'N': 0,
-            'X': weekends
-        }
+        # (B-1) + (B-2) All 기존 wallet 생성 (N+1, X+1 버퍼 없음)
+        for name, wallet in all_nurse_wallets(budget).items():
+            roster[name]['wallet'] = wallet
     
     # ========================================
-    # (B-1) NK 기존 wallet
+    # (B-1) nurse_wallets 순서: All 기존, DK 기존, NK 기존, 신규, 퇴사
     # ========================================
-    for name in night_keep_nurses:
-        nurse_wallets[name] = {
-            'N': NIGHT_KEEP_N_COUNT,
-            'X': num_days - NIGHT_KEEP_N_COUNT
-        }
+    for name in all_nurses_existing + day_keep_nurses + night_keep_nurses:
+        nurse_wallets[name] = roster[name]['wallet']
     
-    # ========================================
-    # (B-1) 신규/퇴사 wallet
-    # ========================================
     new_nurses = {}
-    for new_data in new_nurses_list:
-        name = new_data['name']
-        start_day = new_data.get('start_day')
-        n_count = new_data.get('n_count', 0)
-        x_count = new_data.get('x_count', 0)
-        
-        if start_day is None:
-            print(f"[WARNING] New nurse {name} has no start_day, skipping", file=sys.stderr)
+    for new_data in data.get('new', []):
+        rec = roster[new_data['name']]
+        if rec['wallet'] is None:
             continue
-        
-        nurse_data = next((n for n in nurses_data if n['name'] == name), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        de_preference = nurse_data.get('de_preference', '=') if nurse_data else '='
-        
-        if keep_type == 'DayFixed':
-            work_weekends = sum(1 for day in range(start_day, num_days + 1)
-                               if calendar.weekday(year, month, day) >= 5 or 
-                               f"{year}-{month:02d}-{day:02d}" in kr_holidays)
-            nurse_wallets[name] = {
-                'N': 0,
-                'X': (start_day - 1) + work_weekends
-            }
-        elif keep_type == 'NightFixed':
-            # NK 신규: N manual, X auto
-            work_days = num_days - start_day + 1
-            forced_x = start_day - 1
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            
-            nurse_wallets[name] = {
-                'N': n_count,
-                'X': auto_x
-            }
-        else:
-            # All 신규: N manual, X auto
-            work_days = num_days - start_day + 1
-            forced_x = start_day - 1
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            
-            nurse_wallets[name] = {
-                'N': n_count,
-                'X': auto_x
-            }
-        
-        new_nurses[name] = {
-            'start_day': start_day, 
-            'n_count': n_count, 
-            'keep_type': keep_type,
-            'de_preference': de_preference
+        nurse_wallets[rec['name']] = rec['wallet']
+        new_nurses[rec['name']] = {
+            'start_day': rec['start_day'], 
+            'n_count': new_data.get('n_count', 0), 
+            'keep_type': rec['keep_type'],
+            'de_preference': rec['de_preference']
         }
     
     quit_nurses = {}
-    for quit_data in quit_nurses_list:
-        name = quit_data['name']
-        last_day = quit_data.get('last_day')
-        n_count = quit_data.get('n_count', 0)
-        x_count = quit_data.get('x_count', 0)
-        
-        if last_day is None:
-            print(f"[WARNING] Quit nurse {name} has no last_day, skipping", file=sys.stderr)
+    for quit_data in data.get('quit', []):
+        rec = roster[quit_data['name']]
+        if rec['wallet'] is None:
             continue
-        
-        nurse_data = next((n for n in nurses_data if n['name'] == name), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        de_preference = nurse_data.get('de_preference', '=') if nurse_data else '='
-        
-        if keep_type == 'DayFixed':
-            work_weekends = sum(1 for day in range(1, last_day + 1)
-                               if calendar.weekday(year, month, day) >= 5 or 
-                               f"{year}-{month:02d}-{day:02d}" in kr_holidays)
-            nurse_wallets[name] = {
-                'N': 0,
-                'X': work_weekends + (num_days - last_day)
-            }
-        elif keep_type == 'NightFixed':
-            # NK 퇴사: N manual, X auto
-            work_days = last_day
-            forced_x = num_days - last_day
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            
-            nurse_wallets[name] = {
-                'N': n_count,
-                'X': auto_x
-            }
-        else:
-            # All 퇴사: N manual, X auto
-            work_days = last_day
-            forced_x = num_days - last_day
-            auto_x = calculate_auto_x(work_days, num_days, weekends, forced_x)
-            
-            nurse_wallets[name] = {
-                'N': n_count,
-                'X': auto_x
-            }
-        
-        quit_nurses[name] = {
-            'last_day': last_day, 
-            'n_count': n_count, 
-            'keep_type': keep_type,
-            'de_preference': de_preference
+        nurse_wallets[rec['name']] = rec['wallet']
+        quit_nurses[rec['name']] = {
+            'last_day': rec['last_day'], 
+            'n_count': quit_data.get('n_count', 0), 
+            'keep_type': rec['keep_type'],
+            'de_preference': rec['de_preference']
         }
     
     # ========================================
     # (B-3) DE 선호도 저장 (All 타입만)
     # ========================================
-    de_preferences = {}
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        keep_type = nurse_data.get('keep_type', 'All')
-        de_pref = nurse_data.get('de_preference', '=')
-        
-        if keep_type == 'All':
-            de_preferences[name] = de_pref
+    de_preferences = {
+        name: rec['de_preference'] for name, rec in roster.items() if rec['keep_type'] == 'All'
+    }
     
     # Special days 저장
     special_days_dict = {}
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        special_days = nurse_data.get('special_days', 0)
+    for name, rec in roster.items():
+        special_days = rec['special_days']
         if special_days > 0:
             special_days_dict[name] = special_days
             # Special days를 해당 간호사 X에 추가
@@ -694,20 +930,13 @@ def parse_input(input_json):
         schedule = pref.get('schedule', {})
         
         if name in nurse_wallets:
+            rec = roster[name]
             for day_str, duty in schedule.items():
                 day = int(day_str)
                 
-                # 퇴사자: last_day 이후는 이미 강제 X이므로 차감 제외
-                if name in quit_nurses:
-                    last_day = quit_nurses[name]['last_day']
-                    if day > last_day:
-                        continue
-                
-                # 신규: start_day 이전은 이미 강제 X이므로 차감 제외
-                if name in new_nurses:
-                    start_day = new_nurses[name]['start_day']
-                    if day < start_day:
-                        continue
+                # 퇴사자 last_day 이후 / 신규 start_day 이전은 이미 강제 X이므로 차감 제외
+                if day > rec['last_day'] or day < rec['start_day']:
+                    continue
                 
                 # if duty in nurse_wallets[name]:
                 #     nurse_wallets[name][duty] -= 1
@@ -721,25 +950,13 @@ def parse_input(input_json):
                 ###     
     
     # Extract Low Grade nurses
-    low_grade_nurses = []
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        is_low_grade = nurse_data.get('is_low_grade', False)
-        if is_low_grade:
-            low_grade_nurses.append(name)
+    low_grade_nurses = [name for name, rec in roster.items() if rec['is_low_grade']]
     
     # Calculate max_low_grade
-    max_low_grade = min(
-        weekday_wallet['D'],
-        weekday_wallet['E'],
-        weekday_wallet['N'],
-        weekend_wallet['D'],
-        weekend_wallet['E'],
-        weekend_wallet['N'],
-    )
+    max_low_grade = low_grade_limit(weekday_wallet, weekend_wallet)
     
-    # Validate Low Grade count
-    if len(low_grade_nurses) > max_low_grade:
+    # Validate Low Grade count (soft 모드는 벌점으로 처리)
+    if len(low_grade_nurses) > max_low_grade and solve_mode == 'strict':
         raise ValueError(
             f"Low Grade exceeds limit: {len(low_grade_nurses)} > max {max_low_grade}\n"
             f"  Low Grade nurses: {low_grade_nurses}\n"
@@ -766,7 +983,11 @@ def parse_input(input_json):
         'max_consecutive_work': max_consecutive_work,
         'min_N': min_N_value,
         'de_preferences': de_preferences,
-        'special_days': special_days_dict
+        'special_days': special_days_dict,
+        'schedule_format': schedule_format,
+        'mode': solve_mode,
+        'soft_weights': soft_weights,
+        'roster': roster
     }
     
     errors = validate_input(data, parsed_data)
@@ -777,104 +998,279 @@ def parse_input(input_json):
 
 
 # ========================================
-# CP-SAT Solver
+# Bounds (설정 가능 범위, model 생성 없음)
 # ========================================
 
-def solve_cpsat(parsed_data):
-    """Generate schedule using CP-SAT solver"""
-    year = parsed_data['year']
-    month = parsed_data['month']
+def compute_bounds(input_json):
+    """근무 설정에서 계산되는 한계값 - parse_input 과 같은 계산, 범위 밖이어도 예외 없이 반환
+    
+    min_N: All 기존 간호사 min_N 가능 범위 (min_min_N ~ max_min_N)
+    low_grade: Low Grade 최대 인원
+    x_budget: 간호사별 N, X wallet (희망 근무 차감 전) + 희망 X 개수
+    daily: 날짜/근무별 필요 인원, 배정 가능한 간호사 수, 여유 (음수면 불가능)
+        배정 가능 = 근무 기간 안 + keep_type 허용 + 그날 희망 근무가 없거나 같은 근무
+        (근무 기간 밖은 X 만 가능)
+    problems: 범위를 벗어난 항목 (비어 있으면 status 'ok')
+    """
+    data = json.loads(input_json)
+    cal = month_calendar(data['year'], data['month'])
+    num_days = cal.num_days
+    
+    daily_wallet, weekday_wallet, weekend_wallet = build_daily_wallet(data, cal)
+    roster = compile_roster(data, cal)
+    budget = wallet_budget(data, daily_wallet, roster)
+    problems = []
+    
+    # min_N
+    min_N = {
+        'value': budget['min_N'],
+        'min': budget['min_min_N'],
+        'max': budget['max_min_N'],
+        'all_nurses': len(budget['all_nurses']),
+        'available_N': budget['available_N']
+    }
+    if budget['all_nurses']:
+        if budget['min_N'] < budget['min_min_N']:
+            problems.append(f"min_N={budget['min_N']} below minimum {budget['min_min_N']}")
+        elif budget['min_N'] > budget['max_min_N']:
+            problems.append(f"min_N={budget['min_N']} above maximum {budget['max_min_N']}")
+    
+    # Low Grade
+    low_grade_count = sum(1 for rec in roster.values() if rec['is_low_grade'])
+    max_low_grade = low_grade_limit(weekday_wallet, weekend_wallet)
+    if low_grade_count > max_low_grade:
+        problems.append(f"Low Grade {low_grade_count} nurses exceeds max {max_low_grade}")
+    
+    # 희망 근무 (근무 기간 안만)
+    pref_by_nurse = {}
+    for pref in data.get('preferences', []):
+        rec = roster.get(pref['name'])
+        if rec is None:
+            continue
+        pref_by_nurse[rec['name']] = {
+            int(day): duty for day, duty in pref.get('schedule', {}).items()
+            if rec['start_day'] <= int(day) <= rec['last_day']
+        }
+    
+    # X budget (All 기존은 min_N / 남은 X 분배, 나머지는 compile_roster wallet)
+    wallets = all_nurse_wallets(budget)
+    nurses = {}
+    for name, rec in roster.items():
+        wallet = wallets.get(name) or rec['wallet'] or {'N': 0, 'X': 0}
+        nurses[name] = {
+            'keep_type': rec['keep_type'],
+            'N': wallet['N'],
+            'X': wallet['X'] + rec['special_days'],
+            'X_preferred': sum(1 for duty in pref_by_nurse.get(name, {}).values() if duty == 'X')
+        }
+    per_nurse_X, remainder_X = divmod(budget['available_X'], len(budget['all_nurses']) or 1)
+    if budget['available_X'] < 0:
+        problems.append(f"X budget for All nurses is negative ({budget['available_X']})")
+    
+    # 날짜별 여유
+    banned = {'DayFixed': ('E', 'N'), 'NightFixed': ('D', 'E')}
+    daily = []
+    for day in range(1, num_days + 1):
+        eligible = {duty: 0 for duty in WEIGHT}
+        for name, rec in roster.items():
+            wanted = pref_by_nurse.get(name, {}).get(day)
+            in_period = rec['start_day'] <= day <= rec['last_day']
+            for duty in WEIGHT:
+                if not in_period and duty != 'X':
+                    continue
+                if duty in banned.get(rec['keep_type'], ()):
+                    continue
+                if wanted is not None and wanted != duty:
+                    continue
+                eligible[duty] += 1
+        
+        required = daily_wallet[day]
+        slack = {duty: eligible[duty] - required[duty] for duty in WEIGHT}
+        total_diff = sum(required.values()) - len(roster)
+        daily.append({
+            'day': day,
+            'off_day': cal.is_off_day(day),
+            'required': required,
+            'eligible': eligible,
+            'slack': slack,
+            'total_diff': total_diff
+        })
+        if total_diff:
+            problems.append(f"Day {day}: daily_wallet sum {sum(required.values())} != nurse count {len(roster)}")
+        for duty in WEIGHT:
+            if slack[duty] < 0:
+                problems.append(f"Day {day} {duty}: needs {required[duty]}, only {eligible[duty]} nurses available")
+    
+    return {
+        'status': 'infeasible' if problems else 'ok',
+        'num_days': num_days,
+        'nurse_count': len(roster),
+        'min_N': min_N,
+        'low_grade': {'count': low_grade_count, 'max': max_low_grade},
+        'x_budget': {
+            'available_X': budget['available_X'],
+            'per_all_nurse': per_nurse_X,
+            'remainder': remainder_X,
+            'nurses': nurses
+        },
+        'daily': daily,
+        'problems': problems
+    }
+
+
+# ========================================
+# CP-SAT Model
+# ========================================
+
+# 구조 제약 template 캐시 위치 (FOUROFF_MODEL_CACHE=0 이면 캐시 사용 안 함)
+MODEL_CACHE_DIR = os.environ.get('FOUROFF_MODEL_CACHE_DIR',
+                                 os.path.join(tempfile.gettempdir(), 'fouroff-models'))
+DUTIES = ['D', 'E', 'N', 'X']
+
+
+class ScheduleModel:
+    """CP-SAT 모델 + 근무 변수 x[nurse][day][duty]
+    
+    soft 모드 위반 항목 / 벌점 변수는 cell 목록과 변수 index 로 보관 (template 과 같이 직렬화)
+    """
+    
+    def __init__(self, model, nurses, num_days, soft=False, soft_weights=None):
+        self.model = model
+        self.nurses = nurses
+        self.days = list(range(1, num_days + 1))
+        self.soft = soft
+        self.soft_weights = soft_weights or DEFAULT_SOFT_WEIGHTS
+        self.soft_checks = []
+        self.penalties = []
+        self.slack_max = max(len(nurses), num_days)
+        self.x = {}
+    
+    def create_variables(self):
+        """x 를 nurse / day / duty 순서로 가장 먼저 생성 (proto index = 생성 순서)"""
+        for nurse in self.nurses:
+            self.x[nurse] = {}
+            for day in self.days:
+                self.x[nurse][day] = {}
+                for duty in DUTIES:
+                    self.x[nurse][day][duty] = self.model.NewBoolVar(f'{nurse}_d{day}_{duty}')
+    
+    def load_variables(self):
+        """template 에서 읽은 모델의 x 복원 (create_variables 와 같은 순서)"""
+        index = 0
+        for nurse in self.nurses:
+            self.x[nurse] = {}
+            for day in self.days:
+                self.x[nurse][day] = {}
+                for duty in DUTIES:
+                    self.x[nurse][day][duty] = self.model.GetBoolVarFromProtoIndex(index)
+                    index += 1
+    
+    def count(self, cells):
+        """cells [(nurse, day, duty)] 중 배정된 수"""
+        return sum(self.x[nurse][day][duty] for nurse, day, duty in cells)
+    
+    def bounded(self, cells, lower, upper, kind, nurse=None, day=None, label=''):
+        """lower <= count(cells) <= upper (None = 제한 없음), soft 모드는 벗어난 만큼 벌점"""
+        expr = self.count(cells)
+        if not self.soft:
+            if lower is not None and lower == upper:
+                self.model.Add(expr == lower)
+                return
+            if lower is not None:
+                self.model.Add(expr >= lower)
+            if upper is not None:
+                self.model.Add(expr <= upper)
+            return
+        self.soft_checks.append({'type': kind, 'nurse': nurse, 'day': day, 'label': label,
+                                 'cells': cells, 'lower': lower, 'upper': upper})
+        weight = self.soft_weights[kind]
+        if not weight:
+            return
+        if lower is not None:
+            short = self.model.NewIntVar(0, self.slack_max, f'short_{len(self.soft_checks)}')
+            self.model.Add(expr + short >= lower)
+            self.penalties.append((weight, short.Index()))
+        if upper is not None:
+            excess = self.model.NewIntVar(0, self.slack_max, f'excess_{len(self.soft_checks)}')
+            self.model.Add(expr - excess <= upper)
+            self.penalties.append((weight, excess.Index()))
+    
+    def penalty(self):
+        """soft 모드 벌점 합 (목표에서 차감)"""
+        return sum(weight * self.model.GetIntVarFromProtoIndex(index) for weight, index in self.penalties)
+    
+    def add_hint(self, rows):
+        """이전 근무표 {nurse: compact row} 를 hint 로 (없는 간호사 / 길이가 다른 행은 무시)"""
+        for nurse in self.nurses:
+            row = rows.get(nurse)
+            if not row or len(row) != len(self.days) + 3:
+                continue
+            for day in self.days:
+                for duty in DUTIES:
+                    self.model.AddHint(self.x[nurse][day][duty], row[day + 2] == duty)
+
+
+def model_structure(parsed_data):
+    """구조 제약을 결정하는 입력 (template 캐시 key)
+    
+    희망 근무 / nurse wallet / min_N / DE 선호도는 solve 별 제약 (add_overlay) 이므로 제외
+    """
+    roster = parsed_data['roster']
+    new_nurses = parsed_data['new_nurses']
+    quit_nurses = parsed_data['quit_nurses']
+    num_days = parsed_data['num_days']
+    
+    with open(os.path.abspath(__file__), 'rb') as f:
+        source = hashlib.sha1(f.read()).hexdigest()
+    
+    structure = {
+        'source': source,
+        'year': parsed_data['year'],
+        'month': parsed_data['month'],
+        'daily_wallet': [[parsed_data['daily_wallet'][day][duty] for duty in DUTIES]
+                         for day in range(1, num_days + 1)],
+        'nurses': [[nurse, roster[nurse]['keep_type'], roster[nurse]['past_3days'],
+                    roster[nurse]['past_work_streak'],
+                    roster[nurse]['start_day'], roster[nurse]['last_day'],
+                    new_nurses[nurse]['start_day'] if nurse in new_nurses else None,
+                    quit_nurses[nurse]['last_day'] if nurse in quit_nurses else None]
+                   for nurse in parsed_data['nurse_wallets']],
+        'low_grade_nurses': [nurse for nurse in parsed_data.get('low_grade_nurses', [])
+                             if nurse in parsed_data['nurse_wallets']],
+        'max_consecutive_work': parsed_data.get('max_consecutive_work', 6),
+        'mode': parsed_data.get('mode', 'strict')
+    }
+    if structure['mode'] == 'soft':
+        structure['soft_weights'] = parsed_data.get('soft_weights', DEFAULT_SOFT_WEIGHTS)
+    return structure
+
+
+def build_structure(sm, parsed_data):
+    """구조 제약: 하루 1근무 / daily wallet / 신규·퇴사 / keep type / zRule / Low Grade / 연속 근무"""
+    model = sm.model
+    x = sm.x
+    nurses = sm.nurses
+    days = sm.days
     num_days = parsed_data['num_days']
     daily_wallet = parsed_data['daily_wallet']
     nurse_wallets = parsed_data['nurse_wallets']
     new_nurses = parsed_data['new_nurses']
     quit_nurses = parsed_data['quit_nurses']
-    preferences = parsed_data['preferences']
-    nurses_data = parsed_data['nurses_data']
-    de_preferences = parsed_data.get('de_preferences', {})
-    special_days_dict = parsed_data.get('special_days', {}) ###
-    
-    nurses = list(nurse_wallets.keys())
-    days = list(range(1, num_days + 1))
-    duties = ['D', 'E', 'N', 'X']
-    
-    model = cp_model.CpModel()
-    
-    # Create variables
-    x = {}
-    for nurse in nurses:
-        x[nurse] = {}
-        for day in days:
-            x[nurse][day] = {}
-            for duty in duties:
-                x[nurse][day][duty] = model.NewBoolVar(f'{nurse}_d{day}_{duty}')
+    roster = parsed_data['roster']
+    soft = sm.soft
+    soft_weights = sm.soft_weights
     
     # Constraint 1: One duty per day per nurse
     for nurse in nurses:
         for day in days:
-            model.Add(sum(x[nurse][day][duty] for duty in duties) == 1)
+            model.Add(sum(x[nurse][day][duty] for duty in DUTIES) == 1)
     
     # Constraint 2: Satisfy daily_wallet (DENX 모두)
     for day in days:
-        for duty in duties:
-            model.Add(sum(x[nurse][day][duty] for nurse in nurses) == daily_wallet[day][duty])
-    
-    # Constraint 3: Satisfy nurse_wallet (N, X만 검증)
-    min_N = parsed_data.get('min_N', 6)
-    
-    for nurse in nurses:
-        nurse_data = next(n for n in nurses_data if n['name'] == nurse)
-        keep_type = nurse_data.get('keep_type', 'All')
-        
-        is_new = nurse in new_nurses
-        is_quit = nurse in quit_nurses
-        
-        # N 제약
-        target_N = nurse_wallets[nurse].get('N', 0)
-        actual_N = sum(x[nurse][day]['N'] for day in days)
-        
-        if keep_type == 'NightFixed':
-            if is_new or is_quit:
-                # NK 신규/퇴사: 입력값 기준 ±1
-                model.Add(actual_N >= target_N - 1)
-                model.Add(actual_N <= target_N + 1)
-            else:
-                # NK 기존: 정확히 15
-                model.Add(actual_N == NIGHT_KEEP_N_COUNT)
-        elif keep_type == 'DayFixed':
-            # DK: N=0
-            model.Add(actual_N == 0)
-        else:
-            # All 타입
-            if is_new or is_quit:
-                # All 신규/퇴사: 입력값 기준 ±1
-                model.Add(actual_N >= target_N - 1)
-                model.Add(actual_N <= target_N + 1)
-            else:
-                # All 기존: min_N 이상, target+1 이하
-                model.Add(actual_N >= min_N)
-                model.Add(actual_N <= target_N + 1)
-        
-        # X 제약 (상한만)
-        target_X = nurse_wallets[nurse].get('X', 0)
-        actual_X = sum(x[nurse][day]['X'] for day in days)
-        model.Add(actual_X <= target_X + 1)
-        ### if nurse in special_days_dict:
-        model.Add(actual_X >= target_X - 1) ###
-    
-    # Constraint 4: Fix preference duties
-    pref_dict = {}
-    for pref in preferences:
-        name = pref['name']
-        schedule = pref.get('schedule', {})
-        pref_dict[name] = schedule
-    
-    for nurse in nurses:
-        if nurse in pref_dict:
-            for day_str, duty in pref_dict[nurse].items():
-                day = int(day_str)
-                if day in days:
-                    model.Add(x[nurse][day][duty] == 1)
+        for duty in DUTIES:
+            sm.bounded([(nurse, day, duty) for nurse in nurses],
+                       daily_wallet[day][duty], daily_wallet[day][duty],
+                       'daily_wallet', day=day, label=f"Day {day} {duty} count")
     
     # Constraint 5: New nurses - X before start_day
     for name, data in new_nurses.items():
@@ -891,12 +1287,8 @@ def solve_cpsat(parsed_data):
                 model.Add(x[name][day]['X'] == 1)
     
     # Constraint 7: Keep type restrictions
-    for nurse_data in nurses_data:
-        name = nurse_data['name']
-        keep_type = nurse_data.get('keep_type', 'All')
-        
-        if name not in nurse_wallets:
-            continue
+    for name in nurses:
+        keep_type = roster[name]['keep_type']
         
         if keep_type == 'DayFixed':
             # DK: E=0, N=0
@@ -912,8 +1304,7 @@ def solve_cpsat(parsed_data):
     
     # Constraint 8: zRule
     for nurse in nurses:
-        nurse_data = next(n for n in nurses_data if n['name'] == nurse)
-        past_3days = nurse_data['past_3days']
+        past_3days = roster[nurse]['past_3days']
         
         all_windows = []
         all_windows.append((-3, -2, -1))
@@ -947,6 +1338,15 @@ def solve_cpsat(parsed_data):
                 if any(d > last_day for d in window_days):
                     continue
             
+            # soft 모드: window 당 위반 변수 1개 (일치하는 z 패턴은 1개뿐)
+            if soft:
+                sm.soft_checks.append({'type': 'z_rule', 'nurse': nurse, 'day': next_day,
+                                       'window': (d1, d2, d3, next_day)})
+                if not soft_weights['z_rule']:
+                    continue
+                violated = model.NewBoolVar(f'z_violation_{nurse}_{next_day}')
+                sm.penalties.append((soft_weights['z_rule'], violated.Index()))
+            
             duty_srcs = []
             for d in [d1, d2, d3]:
                 if d < 0:
@@ -979,6 +1379,18 @@ def solve_cpsat(parsed_data):
                 if not fixed_ok:
                     continue
                 
+                if soft:
+                    # 패턴 일치 -> (금지 패턴이거나 허용되지 않은 다음 근무면) violated
+                    not_match = [var.Not() for var in match_vars]
+                    if z_val not in Z_RULES:
+                        if match_vars:
+                            model.AddBoolOr(not_match + [violated])
+                        continue
+                    for duty in DUTIES:
+                        if duty not in Z_RULES[z_val]:
+                            model.AddBoolOr(not_match + [x[nurse][next_day][duty].Not(), violated])
+                    continue
+                
                 if z_val not in Z_RULES:
                     if len(match_vars) > 0:
                         match_all = model.NewBoolVar(f'forbidden_z_{nurse}_{d1}_{d2}_{d3}_{z_val}')
@@ -990,7 +1402,7 @@ def solve_cpsat(parsed_data):
                 allowed = Z_RULES[z_val]
                 
                 if len(match_vars) == 0:
-                    for duty in duties:
+                    for duty in DUTIES:
                         if duty not in allowed:
                             model.Add(x[nurse][next_day][duty] == 0)
                 else:
@@ -998,7 +1410,7 @@ def solve_cpsat(parsed_data):
                     model.Add(sum(match_vars) == len(match_vars)).OnlyEnforceIf(match_all)
                     model.Add(sum(match_vars) < len(match_vars)).OnlyEnforceIf(match_all.Not())
                     
-                    for duty in duties:
+                    for duty in DUTIES:
                         if duty not in allowed:
                             model.Add(x[nurse][next_day][duty] == 0).OnlyEnforceIf(match_all)
 
@@ -1008,23 +1420,18 @@ def solve_cpsat(parsed_data):
     if len(low_grade_nurses) >= 2:
         for day in days:
             for duty in ['D', 'E', 'N']:
-                model.Add(sum(x[nurse][day][duty] for nurse in low_grade_nurses if nurse in nurse_wallets) <= 1)
+                sm.bounded([(nurse, day, duty) for nurse in low_grade_nurses if nurse in nurse_wallets],
+                           None, 1, 'low_grade', day=day, label=f"Day {day} {duty} Low Grade count")
 
     # Constraint 10: Maximum Consecutive Work Days
     max_consecutive_work = parsed_data.get('max_consecutive_work', 6)
     window_size = max_consecutive_work + 1
     
     for nurse in nurses:
-        nurse_data = next(n for n in nurses_data if n['name'] == nurse)
-        past_3days = nurse_data['past_3days']
+        past_3days = roster[nurse]['past_3days']
         
-        work_start = 1
-        work_end = num_days
-        
-        if nurse in new_nurses:
-            work_start = new_nurses[nurse]['start_day']
-        if nurse in quit_nurses:
-            work_end = quit_nurses[nurse]['last_day']
+        work_start = roster[nurse]['start_day']
+        work_end = roster[nurse]['last_day']
         
         for win_start in range(work_start, work_end - window_size + 2):
             win_end = win_start + window_size - 1
@@ -1032,20 +1439,91 @@ def solve_cpsat(parsed_data):
             if win_end > work_end:
                 break
             
-            model.Add(
-                sum(x[nurse][day]['X'] for day in range(win_start, win_end + 1)) >= 1
-            )
+            sm.bounded([(nurse, day, 'X') for day in range(win_start, win_end + 1)], 1, None,
+                       'consecutive_work', nurse, win_end, label=f"{nurse} Day {win_start}-{win_end} X count")
         
         if nurse not in new_nurses:
             past_x_count = sum(1 for d in past_3days if d == 'X')
             
             if past_x_count == 0:
-                remaining_window = window_size - 3
+                # 이전 달 이력이 있으면 past_3days 이전부터 이어진 연속 근무일 수 기준
+                past_streak = max(3, roster[nurse]['past_work_streak'])
+                remaining_window = window_size - past_streak
+                if past_streak > 3:
+                    # 이미 최대 연속 근무일 수에 도달: 1일에 X
+                    remaining_window = max(remaining_window, 1)
                 if remaining_window > 0 and remaining_window <= num_days:
-                    model.Add(
-                        sum(x[nurse][day]['X'] for day in range(1, remaining_window + 1)) >= 1
-                    )
+                    sm.bounded([(nurse, day, 'X') for day in range(1, remaining_window + 1)], 1, None,
+                               'consecutive_work', nurse, remaining_window,
+                               label=f"{nurse} Day 1-{remaining_window} X count "
+                                     f"(after {past_streak} work days)")
+
 
+def add_overlay(sm, parsed_data):
+    """solve 별 제약: nurse wallet / 희망 근무 / 목표 (DE 선호도 - soft 모드 벌점)"""
+    model = sm.model
+    x = sm.x
+    nurses = sm.nurses
+    days = sm.days
+    nurse_wallets = parsed_data['nurse_wallets']
+    new_nurses = parsed_data['new_nurses']
+    quit_nurses = parsed_data['quit_nurses']
+    preferences = parsed_data['preferences']
+    roster = parsed_data['roster']
+    de_preferences = parsed_data.get('de_preferences', {})
+    
+    # Constraint 3: Satisfy nurse_wallet (N, X만 검증)
+    min_N = parsed_data.get('min_N', 6)
+    
+    for nurse in nurses:
+        keep_type = roster[nurse]['keep_type']
+        
+        is_new = nurse in new_nurses
+        is_quit = nurse in quit_nurses
+        
+        # N 제약
+        target_N = nurse_wallets[nurse].get('N', 0)
+        cells_N = [(nurse, day, 'N') for day in days]
+        
+        if keep_type == 'NightFixed':
+            if is_new or is_quit:
+                # NK 신규/퇴사: 입력값 기준 ±1
+                sm.bounded(cells_N, target_N - 1, target_N + 1, 'nurse_wallet', nurse, label=f"{nurse} N")
+            else:
+                # NK 기존: 정확히 15
+                sm.bounded(cells_N, NIGHT_KEEP_N_COUNT, NIGHT_KEEP_N_COUNT, 'nurse_wallet', nurse,
+                           label=f"{nurse} N")
+        elif keep_type == 'DayFixed':
+            # DK: N=0
+            model.Add(sm.count(cells_N) == 0)
+        else:
+            # All 타입
+            if is_new or is_quit:
+                # All 신규/퇴사: 입력값 기준 ±1
+                sm.bounded(cells_N, target_N - 1, target_N + 1, 'nurse_wallet', nurse, label=f"{nurse} N")
+            else:
+                # All 기존: min_N 이상, target+1 이하
+                sm.bounded(cells_N, min_N, target_N + 1, 'nurse_wallet', nurse, label=f"{nurse} N")
+        
+        # X 제약 (±1)
+        target_X = nurse_wallets[nurse].get('X', 0)
+        sm.bounded([(nurse, day, 'X') for day in days], target_X - 1, target_X + 1, 'nurse_wallet', nurse,
+                   label=f"{nurse} X")
+    
+    # Constraint 4: Fix preference duties
+    pref_dict = {}
+    for pref in preferences:
+        name = pref['name']
+        schedule = pref.get('schedule', {})
+        pref_dict[name] = schedule
+    
+    for nurse in nurses:
+        if nurse in pref_dict:
+            for day_str, duty in pref_dict[nurse].items():
+                day = int(day_str)
+                if day in days:
+                    model.Add(x[nurse][day][duty] == 1)
+    
     # ========================================
     # Objective: DE 선호도 (Soft)
     # ========================================
@@ -1055,21 +1533,14 @@ def solve_cpsat(parsed_data):
         if nurse not in de_preferences:
             continue
         
-        nurse_data = next((n for n in nurses_data if n['name'] == nurse), None)
-        keep_type = nurse_data.get('keep_type', 'All') if nurse_data else 'All'
-        
-        if keep_type != 'All':
+        if roster[nurse]['keep_type'] != 'All':
             continue
         
         pref = de_preferences[nurse]
         
         # 근무 기간 결정
-        work_start = 1
-        work_end = num_days
-        if nurse in new_nurses:
-            work_start = new_nurses[nurse]['start_day']
-        if nurse in quit_nurses:
-            work_end = quit_nurses[nurse]['last_day']
+        work_start = roster[nurse]['start_day']
+        work_end = roster[nurse]['last_day']
         
         work_days = list(range(work_start, work_end + 1))
         
@@ -1084,40 +1555,181 @@ def solve_cpsat(parsed_data):
             objective_terms.append(E_count - D_count)
         # '=' 인 경우: 목표에 추가 안 함 (자연스럽게 균등 분배)
     
+    # soft 모드: 위반 벌점 차감
+    if sm.penalties:
+        objective_terms.append(-sm.penalty())
+    
     if objective_terms:
         model.Maximize(sum(objective_terms))
     else:
         model.Minimize(0)
+
+
+def structure_model(parsed_data):
+    """구조 제약만 담은 ScheduleModel (캐시된 template 이 있으면 역직렬화)
+    
+    Returns:
+        (sm, cache_status, cache, key): cache_status = hit / miss / off
+    """
+    from ortools.sat.python import cp_model
+    
+    soft = parsed_data.get('mode') == 'soft'
+    sm = ScheduleModel(cp_model.CpModel(), list(parsed_data['nurse_wallets'].keys()), parsed_data['num_days'],
+                       soft, parsed_data.get('soft_weights', DEFAULT_SOFT_WEIGHTS))
+    
+    cache = None
+    if os.environ.get('FOUROFF_MODEL_CACHE', '1') != '0':
+        try:
+            cache = ModelCache(MODEL_CACHE_DIR)
+        except OSError as e:
+            print(f"[WARNING] Model cache disabled: {str(e)}", file=sys.stderr)
+    if cache is None:
+        sm.create_variables()
+        build_structure(sm, parsed_data)
+        return sm, 'off', None, None
+    
+    key = structure_key(model_structure(parsed_data))
+    cached = cache.load(key)
+    if cached is not None:
+        proto, meta = cached
+        # CpModel.clone() 과 같은 방식: proto 를 채운 뒤 Python 쪽 변수 목록 재구성
+        sm.model.Proto().ParseFromString(proto)
+        sm.model.rebuild_var_and_constant_map()
+        sm.load_variables()
+        sm.soft_checks = meta['soft_checks']
+        sm.penalties = [tuple(term) for term in meta['penalties']]
+        return sm, 'hit', cache, key
+    
+    sm.create_variables()
+    build_structure(sm, parsed_data)
+    try:
+        cache.store(key, sm.model.Proto().SerializeToString(),
+                    {'soft_checks': sm.soft_checks, 'penalties': sm.penalties})
+    except OSError as e:
+        print(f"[WARNING] Model template not cached: {str(e)}", file=sys.stderr)
+    return sm, 'miss', cache, key
+
+
+# ========================================
+# CP-SAT Solver
+# ========================================
+
+def solve_cpsat(parsed_data, solver_plan=None, deadline=None):
+    """Generate schedule using CP-SAT solver
+    
+    solver_plan: cpu_budget.solver_plan() 결과 (default: 동시 solve 1개 기준)
+    deadline: 결과를 돌려줘야 하는 시각 (epoch seconds) - 모델 생성 후 남은 시간이 solver 시간 제한
+    
+    구조 제약은 같은 구조의 이전 solve 가 저장한 template 을 읽고 (model_cache.py)
+    nurse wallet / 희망 근무 / 목표만 새로 추가, 같은 구조의 마지막 근무표를 hint 로 사용
+    
+    Returns:
+        (result, solver, violations, model_stats): violations 는 soft 모드에서 근무표에 포함된 위반 목록,
+            model_stats 는 template 캐시 결과 / 모델 생성 시간
+    """
+    from ortools.sat.python import cp_model
+    
+    year = parsed_data['year']
+    month = parsed_data['month']
+    num_days = parsed_data['num_days']
+    daily_wallet = parsed_data['daily_wallet']
+    roster = parsed_data['roster']
+    soft = parsed_data.get('mode') == 'soft'
+    soft_weights = parsed_data.get('soft_weights', DEFAULT_SOFT_WEIGHTS)
+    
+    build_started = time.monotonic()
+    sm, cache_status, cache, key = structure_model(parsed_data)
+    add_overlay(sm, parsed_data)
+    
+    hint = cache.load_hint(key) if cache is not None else None
+    if hint:
+        sm.add_hint(hint)
+    
+    model = sm.model
+    x = sm.x
+    nurses = sm.nurses
+    days = sm.days
+    model_stats = {
+        'model_cache': cache_status,
+        'model_build_time': round(time.monotonic() - build_started, 3),
+        'hint': bool(hint)
+    }
     
     # Run solver
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 120.0
-    solver.parameters.num_search_workers = 4
+    max_time = SOFT_MAX_SOLVE_SECONDS if soft else MAX_SOLVE_SECONDS
+    if deadline is not None:
+        max_time = min(max_time, max(deadline - time.time() - OUTPUT_MARGIN_SECONDS, 0.1))
+    solver.parameters.max_time_in_seconds = max_time
+    apply_solver_plan(solver.parameters, solver_plan or make_solver_plan())
     solver.parameters.log_search_progress = False
     solver.parameters.random_seed = random.randint(1, 100000)
     solver.parameters.cp_model_presolve = True
     solver.parameters.cp_model_probing_level = 2
     
-    status = solver.Solve(model)
+    status = solve_until_stopped(solver, model, stall_seconds=SOFT_STALL_SECONDS if soft else None)
     
     if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-        result = {}
+        # compact: past_3days(-3,-2,-1) + 1..num_days 를 한 문자열로
+        rows = {}
         for nurse in nurses:
-            result[nurse] = {}
-            nurse_data = next(n for n in nurses_data if n['name'] == nurse)
-            past_3days = nurse_data['past_3days']
-            
-            result[nurse]['-3'] = past_3days[0]
-            result[nurse]['-2'] = past_3days[1]
-            result[nurse]['-1'] = past_3days[2]
+            row = list(roster[nurse]['past_3days'])
             
             for day in days:
-                for duty in duties:
+                for duty in DUTIES:
                     if solver.Value(x[nurse][day][duty]) == 1:
-                        result[nurse][str(day)] = duty
+                        row.append(duty)
                         break
+            
+            rows[nurse] = ''.join(row)
+        
+        # soft 모드 위반 목록 (compact row 인덱스: 날짜 d -> d + 2, past_3days -3..-1 -> 0..2)
+        violations = []
+        for check in sm.soft_checks:
+            if check['type'] == 'z_rule':
+                cells = [rows[check['nurse']][d + 2 if d > 0 else d + 3] for d in check['window']]
+                z = 16 * WEIGHT[cells[0]] + 4 * WEIGHT[cells[1]] + WEIGHT[cells[2]]
+                amount = int(cells[3] not in Z_RULES.get(z, ()))
+                detail = f"{check['nurse']} Day {check['day']}: {'-'.join(cells[:3])} -> {cells[3]} not allowed"
+            else:
+                value = sum(1 for nurse, day, duty in check['cells'] if rows[nurse][day + 2] == duty)
+                if check['lower'] is not None and value < check['lower']:
+                    amount, detail = check['lower'] - value, f"{check['label']} {value} < {check['lower']}"
+                elif check['upper'] is not None and value > check['upper']:
+                    amount, detail = value - check['upper'], f"{check['label']} {value} > {check['upper']}"
+                else:
+                    amount = 0
+            if amount:
+                violations.append({
+                    'type': check['type'],
+                    'nurse': check['nurse'],
+                    'day': check['day'],
+                    'amount': amount,
+                    'penalty': amount * soft_weights[check['type']],
+                    'detail': detail
+                })
+        
+        result = {
+            'format': COMPACT_FORMAT,
+            'year': year,
+            'month': month,
+            'offset': -3,
+            'nurses': rows
+        }
+        
+        if cache is not None:
+            try:
+                cache.store_hint(key, rows)
+            except OSError:
+                pass
         
-        return result, solver
+        return result, solver, violations, model_stats
+    
+    elif status == cp_model.UNKNOWN and STOP_REQUESTED.is_set():
+        raise SolveCancelled("Solve cancelled before a feasible schedule was found")
+    
+    elif status == cp_model.UNKNOWN and deadline is not None:
+        raise TimeoutError(f"No feasible schedule found within the deadline ({max_time:.1f}s)")
     
     else:
         error_msg = {
@@ -1129,9 +1741,10 @@ def solve_cpsat(parsed_data):
         total_nurses = len(nurses)
         day1_wallet = daily_wallet.get(1, {})
         
+        cal = month_calendar(year, month)
         weekend_wallet = {}
         for d in range(1, num_days + 1):
-            if calendar.weekday(year, month, d) >= 5:
+            if cal.weekend[d]:
                 weekend_wallet = daily_wallet.get(d, {})
                 break
         
@@ -1160,44 +1773,100 @@ def solve_cpsat(parsed_data):
 # Main
 # ========================================
 
+def check_input(input_json):
+    """Validation only (--check-only): parse + validate_input, solver 미실행"""
+    parsed_data = parse_input(input_json)
+    
+    return {
+        'status': 'valid',
+        'num_days': parsed_data['num_days'],
+        'nurse_wallets': parsed_data['nurse_wallets'],
+        'min_N': parsed_data['min_N'],
+        'max_low_grade': parsed_data['max_low_grade'],
+        'mode': parsed_data['mode']
+    }
+
+
 def main():
     """Main execution"""
-    if len(sys.argv) > 1:
-        input_json = sys.argv[1]
+    args = sys.argv[1:]
+    check_only = '--check-only' in args
+    args = [arg for arg in args if arg != '--check-only']
+    
+    if args:
+        input_json = args[0]
     else:
         input_json = sys.stdin.read()
     
+    signal.signal(signal.SIGTERM, lambda signum, frame: STOP_REQUESTED.set())
+    
     try:
+        if check_only:
+            print(json.dumps(check_input(input_json), ensure_ascii=False, separators=(',', ':')))
+            return
+        
         parsed_data = parse_input(input_json)
-        result, solver = solve_cpsat(parsed_data)
+        solver_plan = make_solver_plan(int(os.environ.get('FOUROFF_CONCURRENT_SOLVES', 1)))
+        deadline = float(os.environ['FOUROFF_DEADLINE']) if os.environ.get('FOUROFF_DEADLINE') else None
+        result, solver, violations, model_stats = solve_cpsat(parsed_data, solver_plan, deadline)
         validation = validate_result(result, parsed_data)
         
         output = {
             'status': 'success',
-            'schedule': result,
+            'schedule': format_schedule(result, parsed_data['schedule_format']),
             'nurse_wallets': parsed_data['nurse_wallets'],
             'validation': validation,
             'solver_stats': {
                 'objective_value': solver.ObjectiveValue(),
                 'wall_time': solver.WallTime(),
-                'num_branches': solver.NumBranches()
+                'num_branches': solver.NumBranches(),
+                'solver_status': solver.StatusName(),
+                'time_limit': round(solver.parameters.max_time_in_seconds, 2),
+                **model_stats,
+                'num_workers': solver_plan['num_workers'],
+                'subsolvers': solver_plan['subsolvers'],
+                'cpu_budget': {
+                    'cpus': solver_plan['cpus'],
+                    'source': solver_plan['cpu_source'],
+                    'concurrent_solves': solver_plan['concurrent_solves']
+                }
             }
         }
+        if parsed_data['mode'] == 'soft':
+            output['mode'] = 'soft'
+            output['penalty'] = sum(violation['penalty'] for violation in violations)
+            output['violations'] = violations
+        if STOP_REQUESTED.is_set():
+            output['cancelled'] = True
         
-        print(json.dumps(output, ensure_ascii=False, indent=2))
+        print(json.dumps(output, ensure_ascii=False, separators=(',', ':')))
     
     except ValueError as e:
         print(json.dumps({
             'status': 'validation_error',
             'message': str(e)
-        }, ensure_ascii=False, indent=2))
+        }, ensure_ascii=False, separators=(',', ':')))
+        sys.exit(1)
+    
+    except SolveCancelled as e:
+        print(json.dumps({
+            'status': 'cancelled',
+            'message': str(e)
+        }, ensure_ascii=False, separators=(',', ':')))
+        sys.exit(1)
+    
+    except TimeoutError as e:
+        print(json.dumps({
+            'status': 'deadline_exceeded',
+            'message': str(e)
+        }, ensure_ascii=False, separators=(',', ':')))
         sys.exit(1)
     
     except RuntimeError as e:
         print(json.dumps({
             'status': 'solver_error',
             'message': str(e)
-        }, ensure_ascii=False, indent=2))
+        }, ensure_ascii=False, separators=(',', ':')))
         sys.exit(1)
     
     except Exception as e:
@@ -1206,7 +1875,7 @@ def main():
             'status': 'error',
             'message': str(e),
             'traceback': traceback.format_exc()
-        }, ensure_ascii=False, indent=2))
+        }, ensure_ascii=False, separators=(',', ':')))
         sys.exit(1)
 
 
@@ -1,6 +1,8 @@
 # gunicorn_config.py
 # Render.com용 Gunicorn 설정
 
+import os
+import tempfile
 import multiprocessing
 
 # 서버 소켓
@@ -8,9 +10,20 @@ bind = "0.0.0.0:10000"
 
 # 워커 설정
 workers = 2  # CPU 코어 수 (Render 무료 플랜: 0.5 vCPU → 2개 권장)
-worker_class = "sync"
+worker_class = "gthread"  # SSE 구독(/rooms/<id>/events)이 worker를 독점하지 않도록 스레드 사용
+threads = 8
 worker_connections = 1000
 
+# 스레드 예산 (worker 당 threads 8개)
+#   SSE 구독 1개 = 스레드 1개를 최대 ROOM_EVENTS_MAX_SECONDS(300초) 동안 점유
+#   ROOM_EVENTS_MAX_SUBSCRIBERS(기본 4) 를 넘는 구독은 503 -> 나머지 4개는 일반 요청 / solve 대기용
+#   동시 구독이 더 필요하면 threads 와 ROOM_EVENTS_MAX_SUBSCRIBERS 를 같이 늘릴 것
+
+# worker 가 2개 이상이면 방 이벤트 / 방 캐시 무효화를 worker 간 파일로 공유
+# (InProcessBroker 는 다른 worker 에서 publish 한 이벤트를 받지 못함)
+if workers > 1:
+    os.environ.setdefault('ROOM_EVENTS_DIR', os.path.join(tempfile.gettempdir(), 'fouroff-room-events'))
+
 # Timeout 설정 (가장 중요!)
 timeout = 150  # 2.5분 - CP-SAT가 충분히 돌 수 있도록
 graceful_timeout = 60
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+jwt_auth.py - Supabase access token 로컬 검증
+JWKS (비대칭 서명 키) 또는 SUPABASE_JWT_SECRET (HS256) 으로 검증하고
+검증된 claims는 token 단위 TTL 캐시 (exp 이후로는 캐시하지 않음)
+"""
+
+import time
+import threading
+
+import httpx
+import jwt
+
+from ttl_cache import TTLCache
+
+
+class TokenVerifier:
+    """Supabase JWT 로컬 검증기 (JWKS 캐시 + claims 캐시)"""
+
+    def __init__(self, supabase_url, jwt_secret=None, audience='authenticated',
+                 jwks_ttl=600, jwks_retry=30, claims_ttl=300, max_tokens=10000):
+        self.jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.jwks_ttl = jwks_ttl
+        self.jwks_retry = jwks_retry
+        self.claims_ttl = claims_ttl
+
+        self._claims = TTLCache(maxsize=max_tokens, ttl=claims_ttl)
+        self._keys = {}
+        self._keys_fetched_at = 0.0
+        self._keys_failed_at = None
+        self._keys_lock = threading.Lock()
+
+    # ========================================
+    # Signing keys
+    # ========================================
+
+    def _refresh_jwks(self, force=False):
+        """JWKS 다시 받기 (jwks_ttl 이내면 생략, 강제 갱신도 10초에 1번까지)
+
+        실패하면 jwks_retry 초 동안 다시 받지 않고 이전 키로 검증 (없는 키는 원격 확인)
+        """
+        with self._keys_lock:
+            now = time.monotonic()
+            age = now - self._keys_fetched_at
+            if (not force and age < self.jwks_ttl) or (force and age < 10):
+                return
+            if self._keys_failed_at is not None and now - self._keys_failed_at < self.jwks_retry:
+                return
+
+            try:
+                response = httpx.get(self.jwks_url, timeout=5.0)
+                response.raise_for_status()
+                jwks = response.json().get('keys', [])
+            except (httpx.HTTPError, ValueError) as e:
+                self._keys_failed_at = time.monotonic()
+                print(f"[WARNING] JWKS fetch failed, retrying in {self.jwks_retry}s: {str(e)}")
+                return
+
+            keys = {}
+            for jwk in jwks:
+                try:
+                    keys[jwk.get('kid')] = jwt.PyJWK(jwk)
+                except jwt.PyJWKError as e:
+                    print(f"[WARNING] Skipping unsupported JWK {jwk.get('kid')}: {str(e)}")
+            self._keys = keys
+            self._keys_fetched_at = time.monotonic()
+            self._keys_failed_at = None
+
+    def _signing_key(self, header):
+        """토큰 header 에 맞는 (검증 키, 허용 알고리즘), 없으면 (None, None)
+
+        허용 알고리즘은 토큰이 아니라 키가 정함 (JWKS 키의 알고리즘, secret 은 HS256 고정)
+        """
+        if header.get('alg') == 'HS256':
+            return (self.jwt_secret, 'HS256') if self.jwt_secret else (None, None)
+
+        kid = header.get('kid')
+        self._refresh_jwks()
+        if kid not in self._keys:
+            # 키 교체 직후일 수 있으므로 1회 강제 갱신
+            self._refresh_jwks(force=True)
+        key = self._keys.get(kid)
+        return (key.key, key.algorithm_name) if key else (None, None)
+
+    # ========================================
+    # Verify
+    # ========================================
+
+    def verify(self, token):
+        """검증된 claims 반환
+
+        Returns:
+            dict: 검증 성공
+            None: 로컬 검증 불가 (검증 키 없음) - 원격 확인 필요
+
+        Raises:
+            jwt.InvalidTokenError: 서명/만료/audience 오류
+        """
+        claims = self._claims.get(token)
+        if claims is not None:
+            return claims
+
+        header = jwt.get_unverified_header(token)
+        key, algorithm = self._signing_key(header)
+        if key is None:
+            return None
+
+        claims = jwt.decode(
+            token, key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={'require': ['exp', 'sub']}
+        )
+
+        self._claims.set(token, claims, ttl=min(self.claims_ttl, claims['exp'] - time.time()))
+        return claims
+
+    def forget(self, token):
+        """캐시된 claims 제거 (원격 확인 결과 무효인 경우 등)"""
+        self._claims.pop(token)
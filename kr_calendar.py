@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+kr_calendar.py - Korean calendar service
+월별 주말/공휴일 bitmap + prefix sum을 (year, month) 단위로 캐시
+"주말/공휴일 일수 (start_day ~ last_day)" 같은 질의를 O(1)로 처리
+"""
+
+import os
+import calendar
+from functools import lru_cache
+
+
+@lru_cache(maxsize=32)
+def kr_holidays(year):
+    """연도별 한국 공휴일 (holidays.KR) - 프로세스 단위 캐시"""
+    import holidays
+    return holidays.KR(years=year)
+
+
+class MonthCalendar:
+    """한 달의 주말/공휴일 bitmap (1-indexed) 과 prefix sum"""
+
+    __slots__ = ('year', 'month', 'num_days', 'weekend', 'holiday', 'off', '_off_prefix')
+
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        self.num_days = calendar.monthrange(year, month)[1]
+
+        holiday_days = {d.day for d in kr_holidays(year) if d.year == year and d.month == month}
+
+        # index 0은 사용하지 않음 (day 1 ~ num_days)
+        self.weekend = (False,) + tuple(
+            calendar.weekday(year, month, day) >= 5 for day in range(1, self.num_days + 1)
+        )
+        self.holiday = (False,) + tuple(
+            day in holiday_days for day in range(1, self.num_days + 1)
+        )
+        self.off = tuple(w or h for w, h in zip(self.weekend, self.holiday))
+
+        prefix = [0]
+        for day in range(1, self.num_days + 1):
+            prefix.append(prefix[-1] + self.off[day])
+        self._off_prefix = tuple(prefix)
+
+    def is_off_day(self, day):
+        """주말 또는 공휴일 여부"""
+        return self.off[day]
+
+    def off_days_between(self, start_day, last_day):
+        """start_day ~ last_day (포함) 의 주말+공휴일 일수"""
+        start_day = max(start_day, 1)
+        last_day = min(last_day, self.num_days)
+        if start_day > last_day:
+            return 0
+        return self._off_prefix[last_day] - self._off_prefix[start_day - 1]
+
+    @property
+    def off_days(self):
+        """한 달 전체 주말+공휴일 일수"""
+        return self._off_prefix[self.num_days]
+
+    @property
+    def work_days(self):
+        """한 달 전체 평일 일수"""
+        return self.num_days - self.off_days
+
+
+@lru_cache(maxsize=256)
+def month_calendar(year, month):
+    """(year, month) 별 MonthCalendar - 프로세스 단위 LRU 캐시"""
+    return MonthCalendar(year, month)
+
+
+PRELOAD_MAX_YEARS = 20
+
+
+def preload(start_year, end_year):
+    """start_year ~ end_year (포함) 전체 월 미리 계산"""
+    for year in range(start_year, end_year + 1):
+        for month in range(1, 13):
+            month_calendar(year, month)
+
+
+def preload_from_env(var='KR_CALENDAR_PRELOAD'):
+    """환경변수 (예: '2025-2027' 또는 '2026') 에 지정된 연도 범위 미리 계산
+
+    형식이 잘못되면 경고만 출력 (preload 는 최적화일 뿐이므로 부팅을 막지 않음)
+    """
+    spec = os.environ.get(var)
+    if not spec:
+        return
+
+    try:
+        start, _, end = spec.partition('-')
+        start_year, end_year = int(start), int(end or start)
+        if not 0 <= end_year - start_year < PRELOAD_MAX_YEARS:
+            raise ValueError(f"range must be 1-{PRELOAD_MAX_YEARS} years")
+    except ValueError as e:
+        print(f"[WARNING] Ignoring {var}={spec!r}: {str(e)}")
+        return
+
+    preload(start_year, end_year)
+    print(f"[INFO] Korean calendar preloaded: {spec}")
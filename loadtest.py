@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+loadtest.py - render_api HTTP 부하 테스트 (gunicorn + SQLite 저장소 + 지연 주입)
+
+worker 설정마다 gunicorn을 새로 띄우고 (STORAGE_BACKEND=sqlite, STORAGE_LATENCY_MS)
+가상 사용자들이 방 목록 / 입장 / 희망 근무 저장 / 희망 근무 polling 을 섞어 호출,
+별도 solver 사용자가 /solve 를 동시에 호출. route별 처리량과 p50/p95/p99 출력
+
+Usage:
+    python3 loadtest.py                                   # sync:2, gthread:2x8
+    python3 loadtest.py --configs sync:2,gthread:4x4 --users 100 --duration 60
+    python3 loadtest.py --latency-ms 80 --solvers 2       # 원격 DB 왕복 80ms 가정
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+
+import httpx
+
+from benchmark import make_input
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+YEAR = 2025
+MONTH = 3
+NURSES_PER_ROOM = 20
+
+# 가상 사용자 요청 비율 (route: weight)
+DEFAULT_MIX = {
+    'list_rooms': 10,
+    'join_room': 10,
+    'submit_preference': 35,
+    'poll_preferences': 45
+}
+
+
+# ========================================
+# Server
+# ========================================
+
+def parse_config(spec):
+    """'sync:2' / 'gthread:2x8' -> (worker_class, workers, threads)"""
+    worker_class, _, size = spec.partition(':')
+    workers, _, threads = size.partition('x')
+    return worker_class, int(workers or 1), int(threads or 1)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(worker_class, workers, threads, latency_ms, db_path, port):
+    """gunicorn_config.py 기반 + worker 설정만 덮어써서 실행"""
+    env = dict(os.environ,
+               STORAGE_BACKEND='sqlite',
+               SQLITE_PATH=db_path,
+               STORAGE_LATENCY_MS=str(latency_ms),
+               SPECULATIVE_SOLVE='0',
+               SUPABASE_URL='',
+               SUPABASE_KEY='')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+         '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers),
+         '--worker-class', worker_class,
+         '--threads', str(threads),
+         '--access-logfile', '/dev/null',
+         'render_api:app'],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + '/', timeout=1.0).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("gunicorn did not become ready within 30s")
+
+
+def seed(base_url, num_rooms):
+    """방 생성 - [(room_id, password, [nurse names])]"""
+    rooms = []
+    with httpx.Client(base_url=base_url, timeout=30.0) as client:
+        for i in range(num_rooms):
+            room = client.post('/rooms', json={'title': f'병동 {i}', 'password': 'pw'}).json()['room']
+            names = [f'nurse{j:03d}' for j in range(NURSES_PER_ROOM)]
+            rooms.append((room['id'], 'pw', names))
+    return rooms
+
+
+# ========================================
+# Virtual users
+# ========================================
+
+class Recorder:
+    """route별 (latency ms, status) 기록"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route, started, status):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples[route].append(elapsed)
+            if status is None or status >= 500 or status in (400, 408, 429):
+                self.errors[route] += 1
+
+
+def timed(recorder, route, send):
+    started = time.perf_counter()
+    try:
+        response = send()
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    recorder.record(route, started, status)
+
+
+def user_loop(base_url, rooms, mix, stop_at, think_ms, recorder, seed_value):
+    rng = random.Random(seed_value)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    etags = {}
+
+    with httpx.Client(base_url=base_url, timeout=180.0) as client:
+        while time.monotonic() < stop_at:
+            room_id, password, names = rng.choice(rooms)
+            route = rng.choices(routes, weights)[0]
+
+            if route == 'list_rooms':
+                timed(recorder, route, lambda: client.get('/rooms', params={'limit': 20}))
+
+            elif route == 'join_room':
+                timed(recorder, route, lambda: client.post(
+                    f'/rooms/{room_id}/join',
+                    json={'password': password, 'nurse_name': rng.choice(names)}))
+
+            elif route == 'submit_preference':
+                schedule = {str(day): rng.choice('DENX') for day in rng.sample(range(1, 29), 3)}
+                timed(recorder, route, lambda: client.post(
+                    f'/rooms/{room_id}/preferences',
+                    json={'nurse_name': rng.choice(names), 'schedule': schedule,
+                          'is_submitted': rng.random() < 0.3, 'year': YEAR, 'month': MONTH}))
+
+            elif route == 'poll_preferences':
+                # 수간호사 화면 polling (ETag 재사용)
+                def poll():
+                    headers = {'If-None-Match': etags[room_id]} if room_id in etags else {}
+                    response = client.get(f'/rooms/{room_id}/preferences',
+                                          params={'year': YEAR, 'month': MONTH}, headers=headers)
+                    if response.headers.get('ETag'):
+                        etags[room_id] = response.headers['ETag']
+                    return response
+                timed(recorder, route, poll)
+
+            if think_ms:
+                time.sleep(rng.expovariate(1000.0 / think_ms))
+
+
+def solver_loop(base_url, stop_at, recorder):
+    """/solve 반복 호출 (20명 입력)"""
+    input_data = make_input(NURSES_PER_ROOM)
+    with httpx.Client(base_url=base_url, timeout=180.0) as client:
+        while time.monotonic() < stop_at:
+            timed(recorder, 'solve', lambda: client.post('/solve', json=input_data))
+
+
+# ========================================
+# Report
+# ========================================
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def report(recorder, duration):
+    rows = {}
+    for route in sorted(recorder.samples):
+        values = sorted(recorder.samples[route])
+        rows[route] = {
+            'count': len(values),
+            'rps': len(values) / duration,
+            'errors': recorder.errors[route],
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99)
+        }
+    return rows
+
+
+def print_report(title, rows):
+    print(f"\n=== {title} ===")
+    print(f"  {'route':<20} {'count':>7} {'rps':>8} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, row in rows.items():
+        print(f"  {route:<20} {row['count']:>7} {row['rps']:>8.1f} {row['errors']:>5} "
+              f"{row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}")
+
+
+def run_config(spec, args, mix):
+    worker_class, workers, threads = parse_config(spec)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        process, base_url = start_server(worker_class, workers, threads, args.latency_ms,
+                                         os.path.join(tmp_dir, 'loadtest.db'), free_port())
+        try:
+            rooms = seed(base_url, args.rooms)
+            recorder = Recorder()
+            stop_at = time.monotonic() + args.duration
+
+            clients = [threading.Thread(target=user_loop,
+                                        args=(base_url, rooms, mix, stop_at, args.think_ms, recorder, i))
+                       for i in range(args.users)]
+            clients += [threading.Thread(target=solver_loop, args=(base_url, stop_at, recorder))
+                        for _ in range(args.solvers)]
+            started = time.monotonic()
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+
+            return report(recorder, time.monotonic() - started)
+        finally:
+            process.terminate()
+            process.wait(timeout=70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='render_api load test')
+    parser.add_argument('--configs', default='sync:2,gthread:2x8',
+                        help='worker 설정 목록: worker_class:workers[xthreads] (comma separated)')
+    parser.add_argument('--users', type=int, default=50, help='가상 사용자 수')
+    parser.add_argument('--solvers', type=int, default=1, help='/solve 동시 호출 수')
+    parser.add_argument('--duration', type=float, default=30.0, help='설정당 측정 시간 (초)')
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='저장소 호출당 주입 지연')
+    parser.add_argument('--think-ms', type=float, default=100.0, help='사용자 요청 간 평균 대기')
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--mix', default=None,
+                        help='요청 비율 JSON (default: %s)' % json.dumps(DEFAULT_MIX))
+    parser.add_argument('--json', dest='json_path', help='결과를 JSON 파일로 저장')
+    args = parser.parse_args()
+
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    results = {}
+    for spec in args.configs.split(','):
+        rows = run_config(spec, args, mix)
+        title = (f"{spec} - {args.users} users + {args.solvers} solvers, "
+                 f"latency {args.latency_ms:g}ms, {args.duration:g}s")
+        print_report(title, rows)
+        results[spec] = rows
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
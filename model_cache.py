@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+model_cache.py - 근무표 구조가 같은 solve 의 CP-SAT 모델 재사용
+
+solve 마다 fouroff_ver_8.py 가 새 프로세스로 실행되므로 디스크에 보관
+    <key>.pb:        구조 제약만 담은 CpModelProto (직렬화)
+    <key>.json:      변수 위치 / soft 모드 위반 항목 등 모델 밖 정보
+    <key>.hint.json: 같은 구조로 마지막에 찾은 근무표 (다음 solve 의 hint)
+
+key = 구조 hash (간호사 / keep type / past_3days / 신규·퇴사 기간 / 달력 / daily wallet / 모드)
+    희망 근무, nurse wallet, DE 선호도는 key 에 포함하지 않음 (solve 마다 모델 위에 추가)
+최근 사용한 max_entries 개만 유지 (mtime 기준)
+"""
+
+import os
+import json
+import hashlib
+
+
+def structure_key(structure):
+    """구조 dict canonical hash"""
+    raw = json.dumps(structure, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ModelCache:
+    """직렬화된 모델 template 보관 (프로세스 간 공유)
+
+    Args:
+        cache_dir: template 파일 디렉토리
+        max_entries: 유지할 template 수 (20명 기준 template 1개 약 4MB)
+    """
+
+    def __init__(self, cache_dir, max_entries=32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def load(self, key):
+        """(proto bytes, meta) - 없으면 None"""
+        try:
+            with open(self._path(key, '.json')) as f:
+                meta = json.load(f)
+            with open(self._path(key, '.pb'), 'rb') as f:
+                proto = f.read()
+            os.utime(self._path(key, '.pb'))
+        except (FileNotFoundError, ValueError):
+            return None
+        return proto, meta
+
+    def store(self, key, proto, meta):
+        # meta 를 먼저 쓰고 .pb 로 완료 표시 (load 는 .pb 가 있어야 사용)
+        self._write(self._path(key, '.json'), json.dumps(meta, ensure_ascii=False).encode())
+        self._write(self._path(key, '.pb'), proto)
+        self._evict()
+
+    def load_hint(self, key):
+        """마지막 근무표 {nurse: compact row} - 없으면 None"""
+        try:
+            with open(self._path(key, '.hint.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store_hint(self, key, rows):
+        self._write(self._path(key, '.hint.json'), json.dumps(rows, ensure_ascii=False).encode())
+
+    def _evict(self):
+        """오래 사용하지 않은 template 정리"""
+        templates = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pb'):
+                continue
+            try:
+                templates.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name[:-len('.pb')]))
+            except FileNotFoundError:
+                continue
+        templates.sort(reverse=True)
+        for _, key in templates[self.max_entries:]:
+            for suffix in ('.pb', '.json', '.hint.json'):
+                try:
+                    os.remove(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
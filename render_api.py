@@ -8,49 +8,655 @@ Version: ver_8_preference_persistence
 
 import os
 import json
-from flask import Flask, request, jsonify
+import socket
+import select
+import hmac
+import uuid
+import base64
+import hashlib
+import tempfile
+import threading
+import time
+import datetime
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import subprocess
+from types import SimpleNamespace
+from contextlib import nullcontext
 from urllib.parse import unquote
+import jwt
+from jwt_auth import TokenVerifier
+from room_cache import RoomCache
+from room_events import create_broker
+from schedule_patch import apply_cells, apply_json_patch
+from room_solve import build_solve_input, room_solver_config, store_solve_result, stored_schedule
+from room_history import RoomHistory
+from speculative_solve import SpeculativeSolver, input_key
+from single_flight import SingleFlight, FlightTimeout, FlightAborted
+from solve_jobs import SolveJobs, new_job_id, valid_job_id
+from storage import create_storage
+from solve_scheduler import SolveScheduler, SolveRejected
+from cpu_budget import default_solve_slots
+from kr_calendar import preload_from_env
+from schedule_format import (
+    COMPACT_FORMAT, VERBOSE_FORMAT, SCHEDULE_FORMATS,
+    format_schedule, pack_schedule_data, unpack_schedule_data
+)
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
+# 앞단 프록시 수 (Render: 1) - X-Forwarded-For 는 이 수만큼만 신뢰해 request.remote_addr 결정
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 # Supabase 초기화
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 KAKAO_REST_API_KEY = os.environ.get('KAKAO_REST_API_KEY')
+SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET')
+AUTH_CLAIMS_TTL = int(os.environ.get('AUTH_CLAIMS_TTL', 300))
+# 방 목록 cursor 서명 키 (없으면 SUPABASE_JWT_SECRET, 둘 다 없으면 서명 없이 형식만 검증)
+ROOM_CURSOR_SECRET = os.environ.get('ROOM_CURSOR_SECRET') or SUPABASE_JWT_SECRET
+ROOM_CACHE_TTL = float(os.environ.get('ROOM_CACHE_TTL', 60))
+# worker 간 방 캐시 무효화 디렉토리 (기본: 임시 디렉토리, 빈 값이면 프로세스 내 캐시만)
+ROOM_CACHE_SHARED_DIR = os.environ.get('ROOM_CACHE_SHARED_DIR',
+                                       os.path.join(tempfile.gettempdir(), 'fouroff-room-cache')) or None
+# 방 단위 solve 의 past_3days / 연속 근무 이력을 계산할 이전 달 수 (0 = 사용 안 함)
+ROOM_HISTORY_MONTHS = int(os.environ.get('ROOM_HISTORY_MONTHS', 3))
+ROOM_EVENTS_DIR = os.environ.get('ROOM_EVENTS_DIR')
+ROOM_EVENTS_HEARTBEAT = float(os.environ.get('ROOM_EVENTS_HEARTBEAT', 15))
+ROOM_EVENTS_MAX_SECONDS = float(os.environ.get('ROOM_EVENTS_MAX_SECONDS', 300))
+# worker 당 동시 SSE 구독 수 - 구독 1개가 gthread 스레드 1개를 점유 (gunicorn threads=8 중 절반)
+ROOM_EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('ROOM_EVENTS_MAX_SUBSCRIBERS', 4))
+SPECULATIVE_SOLVE = os.environ.get('SPECULATIVE_SOLVE', '1') == '1'
+SPECULATIVE_SOLVE_DIR = os.environ.get('SPECULATIVE_SOLVE_DIR')
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'fouroff.db')
+STORAGE_LATENCY_MS = float(os.environ.get('STORAGE_LATENCY_MS', 0))
+SOLVE_SLOTS = int(os.environ.get('SOLVE_SLOTS', default_solve_slots()))
+SOLVE_QUEUE_MAX = int(os.environ.get('SOLVE_QUEUE_MAX', 8))
+SOLVE_QUEUE_WAIT = float(os.environ.get('SOLVE_QUEUE_WAIT', 15))
+SOLVE_STATE_DIR = os.environ.get('SOLVE_STATE_DIR', os.path.join(tempfile.gettempdir(), 'fouroff-solve'))
+SOLVE_FLIGHT_DIR = os.environ.get('SOLVE_FLIGHT_DIR')
+# 요청 deadline (초): 기본값 / 최대값 (gunicorn timeout 150 안쪽)
+SOLVE_DEADLINE_DEFAULT = float(os.environ.get('SOLVE_DEADLINE_DEFAULT', 135))
+SOLVE_DEADLINE_MAX = float(os.environ.get('SOLVE_DEADLINE_MAX', 140))
+# solver 를 시작할 최소 남은 시간 / deadline 이후 subprocess 강제 종료까지 여유 (초)
+SOLVE_MIN_SECONDS = 2.0
+SOLVE_KILL_GRACE = 5.0
+# solver 실행 중 취소 / 연결 끊김 확인 주기 (초)
+SOLVE_POLL_INTERVAL = 0.5
 
 if SUPABASE_URL and SUPABASE_KEY:
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Access token 로컬 검증 (JWKS / JWT secret), 실패 시에만 원격 확인
+    token_verifier = TokenVerifier(SUPABASE_URL, SUPABASE_JWT_SECRET, claims_ttl=AUTH_CLAIMS_TTL)
 else:
     supabase = None
+    token_verifier = None
+
+# rooms / preferences / schedules 저장소 (STORAGE_BACKEND=supabase|sqlite)
+storage = create_storage(STORAGE_BACKEND, supabase, SQLITE_PATH, latency=STORAGE_LATENCY_MS / 1000)
 
 print(f"[INFO] Supabase: {'enabled' if supabase else 'disabled'}")
+print(f"[INFO] Storage: {storage.name if storage else 'disabled'}")
+
+
+# 방 메타데이터 캐시 (존재/비밀번호 확인용, create/update 시 갱신)
+# ROOM_CACHE_SHARED_DIR 로 같은 서버의 다른 worker에도 무효화 전파 (기본 사용)
+room_cache = RoomCache(lambda room_id: storage.get_room(room_id),
+                       ttl=ROOM_CACHE_TTL, shared_dir=ROOM_CACHE_SHARED_DIR)
+
+# 방별 이전 달 근무표 이력 (schedule_version 이 바뀌면 다시 조회, 근무표 저장 시 다음 달로 이동)
+room_history = RoomHistory(lambda room_id, since, until: storage.list_schedules(room_id, since, until),
+                           months=ROOM_HISTORY_MONTHS)
+
+# 방 이벤트 pub/sub (ROOM_EVENTS_DIR 지정 시 같은 서버의 worker 간 공유 - worker 2개 이상이면
+# gunicorn_config.py 가 기본값 지정)
+room_broker = create_broker(ROOM_EVENTS_DIR)
+room_events_lock = threading.Lock()
+
+# 주말/공휴일 캘린더 미리 계산 (KR_CALENDAR_PRELOAD=2025-2027)
+#   이 프로세스 안에서 쓰는 경우 (/solve 사전 검증, /solve/check, bounds 계산) 에만 효과 있음
+#   solve 는 fouroff_ver_8.py 새 프로세스에서 실행되므로 캐시를 공유하지 않음
+preload_from_env()
 
 
 # ========================================
 # Helper Functions
 # ========================================
 
-def get_user_from_token(auth_header):
-    """Authorization 헤더에서 사용자 정보 추출"""
+def get_user_from_token(auth_header, force_remote=False):
+    """Authorization 헤더에서 사용자 정보 추출
+    
+    기본: 캐시된 서명 키로 로컬 검증 (claims TTL 캐시)
+    force_remote=True: Supabase에 직접 확인 (로그아웃/탈퇴 등 revocation 반영이 필요한 경우)
+    
+    Returns:
+        .id, .email 을 가진 사용자 객체 또는 None
+    """
     if not auth_header or not supabase:
         return None
     
+    token = auth_header.replace('Bearer ', '')
+    
+    if not force_remote:
+        try:
+            claims = token_verifier.verify(token)
+            if claims is not None:
+                return SimpleNamespace(id=claims['sub'], email=claims.get('email'))
+        except jwt.InvalidTokenError as e:
+            print(f"[ERROR] Token validation failed: {str(e)}")
+            return None
+        except Exception as e:
+            # JWKS 조회 실패 등 - 원격 확인으로 대체
+            print(f"[WARNING] Local token verification unavailable: {str(e)}")
+    
     try:
-        token = auth_header.replace('Bearer ', '')
-        user = supabase.auth.get_user(token)
+        response = supabase.auth.get_user(token)
+        user = getattr(response, 'user', response)
+        if not user:
+            token_verifier.forget(token)
         return user
     except Exception as e:
+        token_verifier.forget(token)
         print(f"[ERROR] Token validation failed: {str(e)}")
         return None
 
 
+def publish_room_event(room_id, event_type, **fields):
+    """방 구독자에게 이벤트 전달 (실패해도 요청은 성공 처리)"""
+    try:
+        room_broker.publish(room_id, dict(fields, type=event_type, room_id=room_id, at=time.time()))
+    except Exception as e:
+        print(f"[WARNING] Publish {event_type} for room {room_id} failed: {str(e)}")
+
+
+def get_requested_format():
+    """?format=compact|verbose 쿼리 파라미터 (default: verbose)"""
+    schedule_format = request.args.get('format', VERBOSE_FORMAT)
+    if schedule_format not in SCHEDULE_FORMATS:
+        raise ValueError(f"format must be one of {SCHEDULE_FORMATS}, got {schedule_format}")
+    return schedule_format
+
+
+def precheck_solve_input(input_json):
+    """fouroff_ver_8 검증만 in-process 실행 (ortools import 없음)
+    
+    Returns:
+        (output, status_code): 검증 실패 시 solver와 같은 validation_error 응답, 통과 시 (check 결과, 200)
+    """
+    import fouroff_ver_8
+    
+    try:
+        return fouroff_ver_8.check_input(json.dumps(input_json, ensure_ascii=False)), 200
+    except ValueError as e:
+        return {
+            "status": "validation_error",
+            "message": str(e)
+        }, 400
+
+
+def compute_solve_bounds(input_json):
+    """fouroff_ver_8.compute_bounds in-process 실행 (model 생성 / ortools import 없음) - (output, status_code)"""
+    import fouroff_ver_8
+    
+    try:
+        return fouroff_ver_8.compute_bounds(json.dumps(input_json, ensure_ascii=False)), 200
+    except (ValueError, KeyError, TypeError) as e:
+        return {
+            "status": "validation_error",
+            "message": f"{type(e).__name__}: {e}" if isinstance(e, KeyError) else str(e)
+        }, 400
+
+
+def get_solve_deadline(data=None):
+    """요청 deadline (epoch seconds)
+    
+    X-Solve-Deadline 헤더 또는 body time_limit: 응답까지 허용하는 시간 (초)
+    없으면 SOLVE_DEADLINE_DEFAULT, 최대 SOLVE_DEADLINE_MAX
+    """
+    budget = request.headers.get('X-Solve-Deadline')
+    if budget is None and isinstance(data, dict):
+        budget = data.get('time_limit')
+    try:
+        budget = float(budget) if budget is not None else SOLVE_DEADLINE_DEFAULT
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid time limit: {budget}")
+    if budget <= 0:
+        raise ValueError(f"Invalid time limit: {budget}")
+    return time.time() + min(budget, SOLVE_DEADLINE_MAX)
+
+
+def queue_wait_budget(deadline):
+    """deadline 까지 대기열에서 기다릴 수 있는 시간 (solver 최소 시간 제외)"""
+    return max(0.0, min(SOLVE_QUEUE_WAIT, deadline - time.time() - SOLVE_MIN_SECONDS))
+
+
+def client_disconnected(client_socket):
+    """클라이언트 연결이 끊겼는지 (gunicorn.socket 이 없으면 확인 불가 -> False)"""
+    if client_socket is None:
+        return False
+    try:
+        readable, _, _ = select.select([client_socket], [], [], 0)
+        return bool(readable) and client_socket.recv(1, socket.MSG_PEEK) == b''
+    except BlockingIOError:
+        return False
+    except (OSError, ValueError):
+        return True
+
+
+def cancelled_response():
+    # 499: client closed request
+    return {"status": "cancelled", "message": "Schedule generation was cancelled"}, 499
+
+
+def run_solver(input_json, niceness=0, deadline=None, job_key=None, poll=None):
+    """fouroff_ver_8.py subprocess 실행 (입력은 stdin으로 전달) - (output, status_code)
+    
+    niceness > 0 이면 낮은 CPU 우선순위로 실행 (백그라운드 solve)
+    deadline (epoch seconds): solver 는 남은 시간 안에 최선의 결과를 반환,
+        subprocess 강제 종료는 deadline + SOLVE_KILL_GRACE 이후 (안전장치)
+    job_key: solve_jobs 에 solver pid 등록 (취소 시 SIGTERM -> 그때까지의 최선의 해)
+    poll: () -> bool, SOLVE_POLL_INTERVAL 마다 호출 - True (이 요청 취소) 이고
+        같은 입력을 기다리는 다른 요청이 없으면 solver 중단
+    """
+    if job_key and not solve_jobs.wanted(job_key):
+        return cancelled_response()
+    
+    # 동시 실행 중인 solve 수 (자신 포함) - solver가 CPU 몫에 맞춰 worker 수 결정
+    env = dict(os.environ, FOUROFF_CONCURRENT_SOLVES=str(max(1, solve_scheduler.running())))
+    # 구조가 같은 방의 solve 는 CP-SAT 모델 template 재사용 (worker 간 공유)
+    env.setdefault('FOUROFF_MODEL_CACHE_DIR', os.path.join(SOLVE_STATE_DIR, 'models'))
+    timeout = 130
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining < SOLVE_MIN_SECONDS:
+            return {
+                "status": "deadline_exceeded",
+                "message": f"Only {max(remaining, 0):.1f}s left before the deadline"
+            }, 504
+        env['FOUROFF_DEADLINE'] = repr(deadline)
+        timeout = remaining + SOLVE_KILL_GRACE
+    
+    # 우선순위는 nice 명령으로 (preexec_fn 은 스레드가 있는 프로세스에서 안전하지 않음)
+    # nice 는 exec 로 python3 을 실행하므로 pid 는 solver 와 같음 (취소 시 SIGTERM 대상)
+    command = ['python3', 'fouroff_ver_8.py']
+    if niceness:
+        command = ['nice', '-n', str(niceness)] + command
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env
+    )
+    stdin_data = json.dumps(input_json, ensure_ascii=False)
+    started = time.monotonic()
+    
+    try:
+        with solve_jobs.process(job_key, process.pid) if job_key else nullcontext():
+            while True:
+                try:
+                    stdout, stderr = process.communicate(stdin_data, timeout=SOLVE_POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    stdin_data = None
+                    if time.monotonic() - started >= timeout:
+                        raise
+                    if poll and poll() and job_key:
+                        solve_jobs.stop_unwanted(job_key)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        stdout, stderr = process.communicate()
+        print(f"[ERROR] fouroff_ver_8.py timeout after {timeout:.0f}s")
+        if stderr:
+            print(f"[ERROR] Partial stderr: {stderr[:500]}")
+        if stdout:
+            print(f"[ERROR] Partial stdout: {stdout[:500]}")
+        if deadline is not None:
+            return {
+                "status": "deadline_exceeded",
+                "message": "Timeout: Schedule generation did not finish before the deadline"
+            }, 504
+        return {
+            "status": "error",
+            "message": "Timeout: Schedule generation took too long"
+        }, 408
+    
+    result = SimpleNamespace(returncode=process.returncode, stdout=stdout, stderr=stderr)
+    if result.returncode != 0:
+        print(f"[ERROR] fouroff_ver_8.py exited with code {result.returncode}")
+        print(f"[ERROR] stdout: {result.stdout[:1000]}")
+        print(f"[ERROR] stderr: {result.stderr[:500]}")
+        
+        try:
+            output = json.loads(result.stdout)
+            # deadline 안에 해를 못 찾음 -> 504, 취소 시점까지 해가 없음 -> 499
+            status = {'deadline_exceeded': 504, 'cancelled': 499}.get(output.get('status'), 400)
+            return output, status
+        except json.JSONDecodeError:
+            return {
+                "status": "error",
+                "message": result.stderr if result.stderr else result.stdout,
+                "stdout": result.stdout[:1000],
+                "stderr": result.stderr[:500],
+                "returncode": result.returncode
+            }, 400
+    
+    try:
+        output = json.loads(result.stdout)
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] JSON decode failed: {str(e)}")
+        print(f"[ERROR] Raw output: {result.stdout[:500]}")
+        return {
+            "status": "error",
+            "message": f"JSON parsing error: {str(e)}",
+            "raw_output": result.stdout[:500]
+        }, 400
+    
+    print(f"[DEBUG] fouroff_ver_8.py success: {output.get('status')}")
+    return output, 200
+
+
+# 동시 solve 제한 (solver 1개가 CP-SAT worker 4개 사용) + 방 단위 공정 대기열
+# 같은 서버의 gunicorn worker 는 SOLVE_STATE_DIR 의 slot/대기열을 공유
+solve_scheduler = SolveScheduler(SOLVE_STATE_DIR, slots=SOLVE_SLOTS,
+                                 max_queue=SOLVE_QUEUE_MAX, max_wait=SOLVE_QUEUE_WAIT)
+
+
+# 같은 입력의 동시 solve 는 1개만 실행 (SOLVE_FLIGHT_DIR 지정 시 worker 간에도 공유)
+solve_flight = SingleFlight(shared_dir=SOLVE_FLIGHT_DIR)
+
+# 실행 중인 solve 작업 (취소용, 같은 서버의 worker 가 SOLVE_STATE_DIR 공유)
+solve_jobs = SolveJobs(SOLVE_STATE_DIR, ttl=SOLVE_DEADLINE_MAX + 600)
+
+
+def get_solve_job_id():
+    """X-Solve-Job 헤더 (취소할 때 쓸 id 를 클라이언트가 미리 정함), 없으면 새로 생성"""
+    job_id = request.headers.get('X-Solve-Job')
+    if job_id is None:
+        return new_job_id()
+    if not valid_job_id(job_id):
+        raise ValueError(f"Invalid job id: {job_id}")
+    return job_id
+
+
+def run_solve_flight(room_key, input_json, deadline, job_id, return_incumbent=False):
+    """같은 입력의 solve 가 실행 중이면 그 결과를 같이 받고, 아니면 대기열 -> solver 실행
+    
+    job_id 로 취소 가능 (DELETE /solve/jobs/<job_id>), 클라이언트 연결이 끊겨도 취소
+        취소되면 499, return_incumbent 면 취소 시점까지 찾은 최선의 해 (cancelled: true)
+    
+    다른 요청의 solve 에 합류했는데 그 요청의 deadline 초과 (504) / 대기열 거절 (429) 로 끝났고
+    이 요청의 deadline 이 남아 있으면 이 요청의 deadline 으로 다시 실행 (다른 요청의 실패를 넘겨받지 않음)
+    
+    Raises:
+        SolveRejected: 대기열 초과 / 대기 시간 초과 (이 요청이 직접 대기열에 들어간 경우)
+    """
+    key = input_key(input_json)
+    client_socket = request.environ.get('gunicorn.socket')
+    
+    def watch():
+        """이 요청이 취소됐는지 (연결이 끊겼으면 취소 처리)"""
+        if solve_jobs.is_cancelled(job_id):
+            return True
+        if client_disconnected(client_socket):
+            print(f"[INFO] Solve job {job_id} cancelled: client disconnected")
+            solve_jobs.cancel(job_id)
+            return True
+        return False
+    
+    ran = []
+    
+    def solve():
+        ran.append(True)
+        with solve_scheduler.admit(room_key, ticket=request.headers.get('X-Solve-Ticket'),
+                                   max_wait=queue_wait_budget(deadline)):
+            return run_solver(input_json, deadline=deadline, job_key=key, poll=watch)
+    
+    def can_retry():
+        return deadline - time.time() >= SOLVE_MIN_SECONDS
+    
+    with solve_jobs.track(job_id, key, room_key):
+        while True:
+            del ran[:]
+            try:
+                (output, status), shared = solve_flight.do(key, solve,
+                                                           timeout=max(0.0, deadline - time.time()),
+                                                           abort=watch)
+            except FlightTimeout:
+                return {
+                    "status": "deadline_exceeded",
+                    "message": "Identical schedule generation still running at the deadline"
+                }, 504
+            except FlightAborted:
+                return cancelled_response()
+            except SolveRejected:
+                # 다른 요청의 거절 (ticket / position 도 그 요청의 것) 은 직접 다시 시도
+                if ran or not can_retry():
+                    raise
+                print(f"[INFO] Solve for {room_key} retrying after a joined solve was rejected")
+                continue
+            
+            if shared and status == 504 and can_retry():
+                print(f"[INFO] Solve for {room_key} retrying after a joined solve hit its deadline")
+                continue
+            break
+    
+    if shared:
+        print(f"[INFO] Solve for {room_key} joined an identical in-flight solve")
+    if status == 200 and output.get('cancelled') and not return_incumbent:
+        return cancelled_response()
+    return output, status
+
+
+def solve_response(output, status, job_id):
+    response = jsonify(output)
+    response.status_code = status
+    response.headers['X-Solve-Job'] = job_id
+    return response
+
+
+def solve_busy_response(e):
+    """SolveRejected -> 429 + Retry-After (ticket 으로 재요청 시 대기 순서 유지)"""
+    response = jsonify({
+        "status": "busy",
+        "message": "Too many schedule generations in progress, retry later",
+        "reason": e.reason,
+        "queue_position": e.position,
+        "retry_after": e.retry_after,
+        "ticket": e.ticket
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def run_background_solve(slot, input_json):
+    """백그라운드 solve: 일반 요청 뒤에 대기, 낮은 CPU 우선순위 (희망 근무가 바뀌면 취소)"""
+    key = input_key(input_json)
+    with solve_jobs.track(new_job_id(), key, slot[0], background=True):
+        with solve_scheduler.admit(slot[0], background=True, max_wait=600):
+            output, status = run_solver(input_json, niceness=10, job_key=key)
+    # 취소로 중단된 해는 백그라운드 결과로 쓰지 않음
+    if status == 200 and output.get('cancelled'):
+        return cancelled_response()
+    return output, status
+
+
+# 희망 근무 제출 완료 / 마감 시 백그라운드 solve (결과는 /rooms/<id>/solve 에서 사용)
+speculative_solver = SpeculativeSolver(
+    run_background_solve,
+    shared_dir=SPECULATIVE_SOLVE_DIR
+) if SPECULATIVE_SOLVE else None
+
+
+def content_etag(payload):
+    """응답 내용 기반 ETag"""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_response(payload, etag):
+    """ETag 부착 + If-None-Match 일치 시 304 Not Modified"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+# 방 목록 페이지 크기
+ROOM_LIST_DEFAULT_LIMIT = 20
+ROOM_LIST_MAX_LIMIT = 100
+
+
+def room_cursor_signature(payload):
+    if not ROOM_CURSOR_SECRET:
+        return ''
+    return hmac.new(ROOM_CURSOR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def encode_room_cursor(room):
+    """방 목록 keyset cursor (created_at, id) + HMAC 서명"""
+    raw = json.dumps([room['created_at'], room['id']]).encode()
+    payload = base64.urlsafe_b64encode(raw).decode()
+    return f"{payload}.{room_cursor_signature(payload)}"
+
+
+def decode_room_cursor(cursor):
+    """cursor -> (created_at, id)
+    
+    값은 PostgREST 필터 문자열에 들어가므로 서명 확인 후 timestamp / UUID 로 다시 만들어 반환
+    """
+    try:
+        payload, _, signature = cursor.partition('.')
+        if not hmac.compare_digest(signature, room_cursor_signature(payload)):
+            raise ValueError("bad signature")
+        created_at, room_id = json.loads(base64.urlsafe_b64decode(payload.encode()))
+        created_at = datetime.datetime.fromisoformat(str(created_at).replace('Z', '+00:00')).isoformat()
+        room_id = str(uuid.UUID(str(room_id)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, room_id
+
+
+def preference_row(room_id, user_id, nurse_name, schedule, is_submitted, year, month):
+    """preferences 테이블 row"""
+    return {
+        'room_id': room_id,
+        'user_id': user_id,
+        'nurse_name': nurse_name,
+        'schedule': schedule,
+        'is_submitted': is_submitted,
+        'year': year,
+        'month': month
+    }
+
+
+def present_room(room, schedule_format):
+    """schedule_data를 요청된 형식으로 변환한 room 반환 (DB에는 compact 저장)"""
+    if schedule_format == COMPACT_FORMAT or not room.get('schedule_data'):
+        return room
+    room = dict(room)
+    room['schedule_data'] = unpack_schedule_data(room['schedule_data'])
+    return room
+
+
+def submitted_preferences(room_id, year, month):
+    """제출 완료된 희망 근무 목록"""
+    return storage.list_preferences(room_id, year, month, submitted_only=True)
+
+
+def room_schedule_history(room_id, room, year, month, enabled=True):
+    """이전 달 확정 근무표 기준 간호사별 이력 (사용 안 하면 None)
+
+    room 은 room_cache 에서 읽은 값 (다른 worker 의 저장은 공유 marker 로 무효화되므로
+    schedule_version 이 바뀌면 window 를 다시 조회)
+    """
+    if not enabled or ROOM_HISTORY_MONTHS <= 0:
+        return None
+    return room_history.get(room_id, room.get('schedule_version'), int(year), int(month))
+
+
+def sync_stored_schedule(room_id, updated):
+    """PUT/PATCH 로 수정한 근무표를 schedules 테이블에도 저장 (다음 달 이력이 수정 내용 기준이 되도록)
+
+    version 조건부 update 가 성공한 뒤에만 호출
+    """
+    stored = stored_schedule(updated.get('schedule_data'))
+    if not stored:
+        return
+    year, month, compact = stored
+    try:
+        storage.save_schedule(room_id, year, month, compact)
+    except Exception as e:
+        print(f"[ERROR] Save schedule {year}-{month:02d} for room {room_id} failed: {str(e)}")
+        return
+    room_history.advance(room_id, updated.get('schedule_version'), year, month, compact)
+
+
+def preference_deadline(schedule_data):
+    """schedule_data['preference_deadline'] (ISO 8601, timezone 없으면 UTC) -> epoch seconds"""
+    deadline = schedule_data.get('preference_deadline') if isinstance(schedule_data, dict) else None
+    if not deadline:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(str(deadline).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def speculate_room_solve(room_id, year, month):
+    """희망 근무 변경 후 호출: 이전 결과 무효화 + 제출 완료/마감 시 백그라운드 solve 예약"""
+    if not speculative_solver or not year or not month:
+        return
+    slot = (room_id, int(year), int(month))
+    # 이전 희망 근무로 실행 중인 백그라운드 solve 중단
+    solve_jobs.cancel_room(room_id, background=True)
+    speculative_solver.invalidate(slot)
+    
+    def prepare():
+        room = room_cache.get(room_id)
+        if not room:
+            return None
+        schedule_data = unpack_schedule_data(room.get('schedule_data'))
+        rows = submitted_preferences(room_id, year, month)
+        
+        roster = {nurse.get('name') for nurse in room_solver_config(schedule_data).get('nurses', [])}
+        submitted = {row['nurse_name'] for row in rows}
+        deadline = preference_deadline(schedule_data)
+        
+        if roster - submitted and (deadline is None or deadline > time.time()):
+            if deadline:
+                speculative_solver.request_at(slot, deadline, prepare)
+            return None
+        
+        # 이력은 모두 제출했거나 마감된 뒤에만 계산 (제출마다 schedules 조회하지 않도록)
+        try:
+            input_json = build_solve_input(schedule_data, rows, year, month,
+                                           history=room_schedule_history(room_id, room, year, month))
+        except ValueError:
+            return None
+        
+        if precheck_solve_input(input_json)[1] != 200:
+            return None
+        return input_json
+    
+    speculative_solver.request(slot, prepare)
+
+
 # ========================================
 # Routes
 # ========================================
@@ -62,6 +668,7 @@ def health_check():
         "status": "ok",
         "message": "Nurse Schedule API Server with Supabase + Kakao OAuth",
         "supabase": "enabled" if supabase else "disabled",
+        "storage": storage.name if storage else "disabled",
         "version": "ver_8_preference_persistence"
     }), 200
 
@@ -101,9 +708,9 @@ def kakao_callback():
 
 @app.route('/auth/me', methods=['GET'])
 def get_current_user():
-    """현재 사용자 정보"""
+    """현재 사용자 정보 (?fresh=1: Supabase 원격 확인)"""
     auth_header = request.headers.get('Authorization')
-    user = get_user_from_token(auth_header)
+    user = get_user_from_token(auth_header, force_remote=request.args.get('fresh') == '1')
     
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
@@ -127,8 +734,8 @@ def rooms_options():
 @app.route('/rooms', methods=['POST'])
 def create_room():
     """방 생성 (로그인 필수 아님)"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
         data = request.get_json()
@@ -142,16 +749,13 @@ def create_room():
         user = get_user_from_token(auth_header)
         owner_id = user.id if user else 'anonymous'
         
-        response = supabase.table('rooms').insert({
-            'title': title,
-            'password': password,
-            'owner_id': owner_id
-        }).execute()
+        room = storage.create_room(title, password, owner_id)
         
-        if response.data:
+        if room:
+            room_cache.put(room)
             return jsonify({
                 "status": "success",
-                "room": response.data[0]
+                "room": room
             }), 201
         else:
             return jsonify({"error": "Failed to create room"}), 400
@@ -163,16 +767,39 @@ def create_room():
 
 @app.route('/rooms', methods=['GET'])
 def list_rooms():
-    """방 목록 조회 (로그인 필수 아님)"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    """방 목록 조회 (로그인 필수 아님)
+    
+    최신순 keyset 페이지네이션, schedule_data/password 제외
+    
+    Query Parameters:
+        limit: int - 페이지 크기 (default 20, max 100)
+        cursor: str - 이전 응답의 next_cursor
+        q: str - 제목 검색 (부분 일치, 대소문자 무시)
+        owner_id: str - 방장 필터
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
-        response = supabase.table('rooms').select('*').execute()
+        limit = min(max(request.args.get('limit', ROOM_LIST_DEFAULT_LIMIT, type=int), 1), ROOM_LIST_MAX_LIMIT)
+        cursor = request.args.get('cursor')
+        q = request.args.get('q')
+        owner_id = request.args.get('owner_id')
+        
+        after = decode_room_cursor(cursor) if cursor else None
+        
+        # 다음 페이지 존재 여부 확인용으로 1개 더 조회
+        rooms = storage.list_rooms(limit + 1, q=q, owner_id=owner_id, after=after)
+        
+        next_cursor = None
+        if len(rooms) > limit:
+            rooms = rooms[:limit]
+            next_cursor = encode_room_cursor(rooms[-1])
         
         return jsonify({
             "status": "success",
-            "rooms": response.data if response.data else []
+            "rooms": rooms,
+            "next_cursor": next_cursor
         }), 200
     
     except Exception as e:
@@ -182,18 +809,19 @@ def list_rooms():
 
 @app.route('/rooms/<room_id>', methods=['GET'])
 def get_room(room_id):
-    """특정 방 조회"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    """특정 방 조회 (ETag / If-None-Match 지원)"""
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
-        response = supabase.table('rooms').select('*').eq('id', room_id).execute()
+        schedule_format = get_requested_format()
+        room = room_cache.get(room_id)
         
-        if response.data:
-            return jsonify({
+        if room:
+            return conditional_response({
                 "status": "success",
-                "room": response.data[0]
-            }), 200
+                "room": present_room(room, schedule_format)
+            }, content_etag([room, schedule_format]))
         else:
             return jsonify({"error": "Room not found"}), 404
     
@@ -207,31 +835,34 @@ def get_room(room_id):
 
 @app.route('/rooms/<room_id>', methods=['PUT'])
 def update_room(room_id):
-    """방 데이터 업데이트 (근무표 일력 데이터 저장)"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    """방 데이터 업데이트 (근무표 일력 데이터 저장)
+    
+    schedule_data 안의 근무표는 compact 형식으로 저장됨 (?format=compact 시 compact 그대로 응답)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
+        schedule_format = get_requested_format()
         data = request.get_json()
         schedule_data = data.get('schedule_data')
         
         if not schedule_data:
             return jsonify({"error": "Missing schedule_data"}), 400
         
-        room_response = supabase.table('rooms').select('id').eq('id', room_id).execute()
-        
-        if not room_response.data:
+        if not room_cache.get(room_id):
             return jsonify({"error": "Room not found"}), 404
         
-        update_response = supabase.table('rooms').update({
-            'schedule_data': schedule_data
-        }).eq('id', room_id).execute()
+        updated = storage.update_room_schedule(room_id, pack_schedule_data(schedule_data))
         
-        if update_response.data:
+        if updated:
+            room_cache.put(updated)
+            sync_stored_schedule(room_id, updated)
+            publish_room_event(room_id, 'schedule_updated', version=updated.get('schedule_version'))
             return jsonify({
                 "status": "success",
                 "message": "Room data updated successfully",
-                "room": update_response.data[0]
+                "room": present_room(updated, schedule_format)
             }), 200
         else:
             return jsonify({"error": "Failed to update room"}), 400
@@ -241,6 +872,82 @@ def update_room(room_id):
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/rooms/<room_id>', methods=['PATCH'])
+def patch_room(room_id):
+    """근무표 부분 수정 (낙관적 동시성 제어)
+    
+    Request Body:
+        version: 클라이언트가 가진 schedule_version
+        cells: [{"nurse": "김간호", "day": 5, "duty": "D"}, ...] (duty null 이면 비움)
+        또는 patch: JSON Patch 목록 (?format 형식의 schedule_data 기준 경로)
+    
+    Returns:
+        200 {"version": 새 version}
+        409 version 불일치 (현재 version 포함, 클라이언트는 다시 조회 후 재시도)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        schedule_format = get_requested_format()
+        data = request.get_json() or {}
+        version = data.get('version')
+        
+        if not isinstance(version, int):
+            return jsonify({"error": "Missing version"}), 400
+        if ('cells' in data) == ('patch' in data):
+            return jsonify({"error": "Provide exactly one of cells or patch"}), 400
+        
+        room = room_cache.get(room_id)
+        if room and room.get('schedule_version', 0) != version:
+            # 캐시가 오래됐을 수 있으므로 DB에서 다시 확인
+            room_cache.invalidate(room_id)
+            room = room_cache.get(room_id)
+        if not room:
+            return jsonify({"error": "Room not found"}), 404
+        
+        current_version = room.get('schedule_version', 0)
+        if current_version != version:
+            return jsonify({
+                "error": "Version conflict",
+                "version": current_version
+            }), 409
+        
+        try:
+            if 'cells' in data:
+                schedule_data = apply_cells(room.get('schedule_data'), data['cells'])
+            else:
+                document = present_room(room, schedule_format).get('schedule_data')
+                schedule_data = apply_json_patch(document, data['patch'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 422
+        
+        # version 조건부 update (다른 요청이 먼저 저장했으면 None)
+        updated = storage.update_room_schedule(room_id, pack_schedule_data(schedule_data),
+                                               expected_version=version)
+        
+        if not updated:
+            room_cache.invalidate(room_id)
+            latest = room_cache.get(room_id)
+            return jsonify({
+                "error": "Version conflict",
+                "version": latest.get('schedule_version', 0) if latest else None
+            }), 409
+        
+        room_cache.put(updated)
+        sync_stored_schedule(room_id, updated)
+        publish_room_event(room_id, 'schedule_updated', version=updated['schedule_version'])
+        
+        return jsonify({
+            "status": "success",
+            "version": updated['schedule_version']
+        }), 200
+    
+    except Exception as e:
+        print(f"[ERROR] Patch room failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
 # ========================================
 # Join Room Routes
 # ========================================
@@ -248,8 +955,8 @@ def update_room(room_id):
 @app.route('/rooms/<room_id>/join', methods=['POST'])
 def join_room(room_id):
     """방 입장"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
         data = request.get_json()
@@ -260,12 +967,11 @@ def join_room(room_id):
         if not password or not nurse_name:
             return jsonify({"error": "Missing password or nurse_name"}), 400
         
-        room_response = supabase.table('rooms').select('*').eq('id', room_id).execute()
+        room = room_cache.get(room_id)
         
-        if not room_response.data:
+        if not room:
             return jsonify({"error": "Room not found"}), 404
         
-        room = room_response.data[0]
         if room['password'] != password:
             return jsonify({"error": "Incorrect password"}), 401
         
@@ -299,8 +1005,8 @@ def submit_preferences(room_id):
         year: int - 연도
         month: int - 월
     """
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
         data = request.get_json()
@@ -318,52 +1024,28 @@ def submit_preferences(room_id):
         if not year or not month:
             return jsonify({"error": "Missing year or month"}), 400
         
-        # Room verification
-        room_response = supabase.table('rooms').select('id').eq('id', room_id).execute()
-        
-        if not room_response.data:
+        # Room verification (room cache)
+        if not room_cache.get(room_id):
             return jsonify({"error": "Room not found"}), 404
         
         # User ID extraction
         user = get_user_from_token(auth_header)
         user_id = user.id if user else 'anonymous'
         
-        # UPSERT Logic: Check existing preference
-        existing = supabase.table('preferences') \
-            .select('id') \
-            .eq('room_id', room_id) \
-            .eq('nurse_name', nurse_name) \
-            .eq('year', year) \
-            .eq('month', month) \
-            .execute()
-        
-        if existing.data:
-            # UPDATE existing record
-            pref_response = supabase.table('preferences').update({
-                'schedule': schedule,
-                'is_submitted': is_submitted,
-                'user_id': user_id
-            }).eq('id', existing.data[0]['id']).execute()
-            
-            print(f"[INFO] Updated preference for {nurse_name} in room {room_id} ({year}/{month})")
-        else:
-            # INSERT new record
-            pref_response = supabase.table('preferences').insert({
-                'room_id': room_id,
-                'user_id': user_id,
-                'nurse_name': nurse_name,
-                'schedule': schedule,
-                'is_submitted': is_submitted,
-                'year': year,
-                'month': month
-            }).execute()
-            
-            print(f"[INFO] Inserted new preference for {nurse_name} in room {room_id} ({year}/{month})")
+        # UPSERT: (room_id, nurse_name, year, month) unique key 기준 1회 호출
+        saved = storage.upsert_preferences([
+            preference_row(room_id, user_id, nurse_name, schedule, is_submitted, year, month)
+        ])
+        
+        print(f"[INFO] Upserted preference for {nurse_name} in room {room_id} ({year}/{month})")
+        publish_room_event(room_id, 'preferences_updated', year=year, month=month,
+                           nurse_names=[nurse_name], is_submitted=is_submitted)
+        speculate_room_solve(room_id, year, month)
         
-        if pref_response.data:
+        if saved:
             return jsonify({
                 "status": "success",
-                "preference": pref_response.data[0]
+                "preference": saved[0]
             }), 201
         else:
             return jsonify({"error": "Failed to save preferences"}), 400
@@ -373,6 +1055,66 @@ def submit_preferences(room_id):
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/rooms/<room_id>/preferences/bulk', methods=['POST'])
+def submit_preferences_bulk(room_id):
+    """희망 근무 일괄 저장 (방의 한 달치 전체를 1회 UPSERT)
+    
+    Request Body:
+        year: int - 연도
+        month: int - 월
+        preferences: list - [{nurse_name, schedule, is_submitted}, ...]
+                     같은 nurse_name이 여러 번 있으면 마지막 항목 사용
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        data = request.get_json()
+        year = data.get('year')
+        month = data.get('month')
+        preferences = data.get('preferences', [])
+        auth_header = request.headers.get('Authorization')
+        
+        # Validation
+        if not year or not month:
+            return jsonify({"error": "Missing year or month"}), 400
+        
+        if not preferences or any(not pref.get('nurse_name') for pref in preferences):
+            return jsonify({"error": "Missing preferences or nurse_name"}), 400
+        
+        # Room verification (room cache)
+        if not room_cache.get(room_id):
+            return jsonify({"error": "Room not found"}), 404
+        
+        user = get_user_from_token(auth_header)
+        user_id = user.id if user else 'anonymous'
+        
+        # 같은 key가 한 번의 upsert에 두 번 들어가면 Postgres 오류이므로 nurse_name 기준 중복 제거
+        rows = {}
+        for pref in preferences:
+            rows[pref['nurse_name']] = preference_row(
+                room_id, user_id, pref['nurse_name'], pref.get('schedule', {}),
+                pref.get('is_submitted', False), year, month
+            )
+        
+        saved = storage.upsert_preferences(list(rows.values()))
+        
+        print(f"[INFO] Bulk upserted {len(rows)} preferences in room {room_id} ({year}/{month})")
+        publish_room_event(room_id, 'preferences_updated', year=year, month=month,
+                           nurse_names=list(rows.keys()))
+        speculate_room_solve(room_id, year, month)
+        
+        return jsonify({
+            "status": "success",
+            "count": len(saved),
+            "preferences": saved
+        }), 201
+    
+    except Exception as e:
+        print(f"[ERROR] Bulk submit preferences failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
 @app.route('/rooms/<room_id>/preferences/clear', methods=['DELETE'])
 def clear_preferences(room_id):
     """방의 희망 근무 일괄 삭제 (year/month 변경 시 또는 전체 초기화)
@@ -381,28 +1123,22 @@ def clear_preferences(room_id):
         year: int - 삭제할 연도 (지정 시 해당 year/month만 삭제)
         month: int - 삭제할 월 (지정 시 해당 year/month만 삭제)
     """
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
         data = request.get_json() or {}
         year = data.get('year')
         month = data.get('month')
         
-        # Build delete query
-        query = supabase.table('preferences').delete().eq('room_id', room_id)
+        # year/month 둘 다 지정 시 해당 월만 삭제
+        deleted_count = storage.delete_preferences(room_id, year, month)
+        log_msg = f"year={year}, month={month}" if year and month else "all"
         
-        # Filter by year/month if specified
-        if year and month:
-            query = query.eq('year', year).eq('month', month)
-            log_msg = f"year={year}, month={month}"
-        else:
-            log_msg = "all"
-        
-        response = query.execute()
-        
-        deleted_count = len(response.data) if response.data else 0
         print(f"[INFO] Cleared {deleted_count} preferences for room {room_id} ({log_msg})")
+        publish_room_event(room_id, 'preferences_cleared', year=year, month=month,
+                           deleted_count=deleted_count)
+        speculate_room_solve(room_id, year, month)
         
         return jsonify({
             "status": "success",
@@ -417,14 +1153,14 @@ def clear_preferences(room_id):
 
 @app.route('/rooms/<room_id>/preferences/<nurse_name>', methods=['GET'])
 def get_nurse_preference(room_id, nurse_name):
-    """특정 간호사의 희망 근무 조회
+    """특정 간호사의 희망 근무 조회 (ETag / If-None-Match 지원)
     
     Query Parameters:
         year: int (required) - 조회할 연도
         month: int (required) - 조회할 월
     """
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
         year = request.args.get('year', type=int)
@@ -436,26 +1172,22 @@ def get_nurse_preference(room_id, nurse_name):
         # URL decode nurse_name (handles Korean names)
         decoded_nurse_name = unquote(nurse_name)
         
-        response = supabase.table('preferences') \
-            .select('*') \
-            .eq('room_id', room_id) \
-            .eq('nurse_name', decoded_nurse_name) \
-            .eq('year', year) \
-            .eq('month', month) \
-            .execute()
+        preference = storage.get_preference(room_id, decoded_nurse_name, year, month)
         
-        if response.data:
+        if preference:
             print(f"[INFO] Found preference for {decoded_nurse_name} in room {room_id} ({year}/{month})")
-            return jsonify({
+            payload = {
                 "status": "success",
-                "preference": response.data[0]
-            }), 200
+                "preference": preference
+            }
         else:
             print(f"[INFO] No preference found for {decoded_nurse_name} in room {room_id} ({year}/{month})")
-            return jsonify({
+            payload = {
                 "status": "success",
                 "preference": None
-            }), 200
+            }
+        
+        return conditional_response(payload, content_etag(payload))
     
     except Exception as e:
         print(f"[ERROR] Get nurse preference failed: {str(e)}")
@@ -464,31 +1196,139 @@ def get_nurse_preference(room_id, nurse_name):
 
 @app.route('/rooms/<room_id>/preferences', methods=['GET'])
 def get_preferences(room_id):
-    """희망 근무 전체 조회 (수간호사용)"""
-    if not supabase:
-        return jsonify({"error": "Supabase not configured"}), 500
+    """희망 근무 전체 조회 (수간호사용, ETag / If-None-Match 지원)
+    
+    Query Parameters (optional):
+        year: int - 조회할 연도
+        month: int - 조회할 월
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
     
     try:
-        response = supabase.table('preferences').select('*').eq('room_id', room_id).execute()
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
         
-        return jsonify({
+        payload = {
             "status": "success",
-            "preferences": response.data if response.data else []
-        }), 200
+            "preferences": storage.list_preferences(room_id, year, month)
+        }
+        return conditional_response(payload, content_etag(payload))
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/rooms/<room_id>/schedules', methods=['GET'])
+def get_schedule(room_id):
+    """저장된 월별 확정 근무표 조회 (ETag / If-None-Match 지원)
+    
+    Query Parameters:
+        year: int (required)
+        month: int (required)
+    
+    근무표 형식: ?format=compact|verbose (default: verbose)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        schedule_format = get_requested_format()
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        
+        if not year or not month:
+            return jsonify({"error": "Missing year or month query params"}), 400
+        
+        stored = storage.get_schedule(room_id, year, month)
+        if not stored:
+            return jsonify({"error": "Schedule not found"}), 404
+        
+        payload = {
+            "status": "success",
+            "year": year,
+            "month": month,
+            "schedule": format_schedule(stored['schedule'], schedule_format),
+            "updated_at": stored.get('updated_at')
+        }
+        return conditional_response(payload, content_etag(payload))
     
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/rooms/<room_id>/events', methods=['GET'])
+def room_events(room_id):
+    """방 이벤트 구독 (Server-Sent Events)
+    
+    Events:
+        preferences_updated: 희망 근무 저장 (year, month, nurse_names)
+        preferences_cleared: 희망 근무 삭제 (year, month, deleted_count)
+        schedule_updated: 근무표 저장
+    
+    ROOM_EVENTS_MAX_SECONDS 후 연결 종료 (EventSource가 자동 재연결)
+    worker 당 구독이 ROOM_EVENTS_MAX_SUBSCRIBERS 개를 넘으면 503 + Retry-After
+        (구독마다 요청 스레드 1개를 점유하므로 나머지 스레드는 일반 요청용으로 남김)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        if not room_cache.get(room_id):
+            return jsonify({"error": "Room not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    
+    with room_events_lock:
+        if room_broker.subscriber_count() >= ROOM_EVENTS_MAX_SUBSCRIBERS:
+            response = jsonify({"error": "Too many event subscribers", "retry_after": 10})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        subscription = room_broker.subscribe(room_id)
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + ROOM_EVENTS_MAX_SECONDS
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=ROOM_EVENTS_HEARTBEAT)
+                if event is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # stream 이 시작되기 전에 연결이 끊겨도 구독 해제
+    response.call_on_close(subscription.close)
+    return response
+
+
 # ========================================
 # Schedule Generation (Render 통합)
 # ========================================
 
 @app.route('/solve', methods=['POST'])
 def solve_schedule():
-    """Schedule generation (calls fouroff_ver_8.py)"""
+    """Schedule generation (calls fouroff_ver_8.py)
+    
+    근무표 형식: body의 schedule_format 또는 ?format=compact|verbose (default: verbose)
+    응답 deadline: X-Solve-Deadline 헤더 또는 body time_limit (초) - 대기열 + solver 시간 합계
+    취소: X-Solve-Job 헤더로 id 지정 후 DELETE /solve/jobs/<id> (응답 499)
+        body return_incumbent: true 면 취소 시점까지 찾은 최선의 해 반환 ("cancelled": true)
+    """
     try:
         input_json = request.get_json()
+        deadline = get_solve_deadline(input_json)
+        job_id = get_solve_job_id()
+        input_json.pop('time_limit', None)
+        return_incumbent = bool(input_json.pop('return_incumbent', False))
+        if 'format' in request.args:
+            input_json['schedule_format'] = get_requested_format()
         
         print(f"[DEBUG] /solve called with {len(json.dumps(input_json))} bytes")
         
@@ -509,52 +1349,29 @@ def solve_schedule():
         print(f"[DEBUG] nurse_wallet_min: {input_json.get('nurse_wallet_min', {})}")
         print(f"[DEBUG] max_consecutive_work: {input_json.get('max_consecutive_work')}")
         
-        result = subprocess.run(
-            ['python3', 'fouroff_ver_8.py', json.dumps(input_json, ensure_ascii=False)],
-            capture_output=True,
-            text=True,
-            timeout=130
-        )
-        
-        if result.returncode != 0:
-            print(f"[ERROR] fouroff_ver_8.py exited with code {result.returncode}")
-            print(f"[ERROR] stdout: {result.stdout[:1000]}")
-            print(f"[ERROR] stderr: {result.stderr[:500]}")
-            
-            try:
-                error_output = json.loads(result.stdout)
-                return jsonify(error_output), 400
-            except json.JSONDecodeError:
-                return jsonify({
-                    "status": "error",
-                    "message": result.stderr if result.stderr else result.stdout,
-                    "stdout": result.stdout[:1000],
-                    "stderr": result.stderr[:500],
-                    "returncode": result.returncode
-                }), 400
+        # 입력 오류는 subprocess 없이 바로 반환
+        check_output, check_status = precheck_solve_input(input_json)
+        if check_status != 200:
+            print("[INFO] /solve rejected by precheck")
+            return jsonify(check_output), check_status
         
-        output = json.loads(result.stdout)
-        print(f"[DEBUG] fouroff_ver_8.py success: {output.get('status')}")
-        return jsonify(output), 200
-    
-    except subprocess.TimeoutExpired as e:
-        print("[ERROR] fouroff_ver_8.py timeout after 130s")
-        if hasattr(e, 'stderr') and e.stderr:
-            print(f"[ERROR] Partial stderr: {e.stderr[:500]}")
-        if hasattr(e, 'stdout') and e.stdout:
-            print(f"[ERROR] Partial stdout: {e.stdout[:500]}")
-        return jsonify({
-            "status": "error",
-            "message": "Timeout: Schedule generation took too long"
-        }), 408
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] JSON decode failed: {str(e)}")
-        print(f"[ERROR] Raw output: {result.stdout[:500]}")
-        return jsonify({
-            "status": "error",
-            "message": f"JSON parsing error: {str(e)}",
-            "raw_output": result.stdout[:500]
-        }), 400
+        # 같은 입력의 solve 가 실행 중이면 합류, 아니면
+        # 공정 대기: 같은 방(X-Room-Id, 없으면 클라이언트 IP) 요청끼리 순서 유지
+        #   X-Room-Id 는 실제 방일 때만, IP 는 ProxyFix 가 정한 remote_addr (클라이언트가 바꿀 수 없음)
+        room_key = request.headers.get('X-Room-Id')
+        try:
+            known_room = bool(room_key and storage and room_cache.get(room_key))
+        except Exception:
+            known_room = False
+        if not known_room:
+            room_key = request.remote_addr or ''
+        try:
+            output, status = run_solve_flight(room_key, input_json, deadline, job_id, return_incumbent)
+        except SolveRejected as e:
+            print(f"[INFO] /solve rejected: {e.reason} (position {e.position})")
+            return solve_busy_response(e)
+        return solve_response(output, status, job_id)
+    
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -568,6 +1385,226 @@ def solve_schedule():
         }), 400
 
 
+@app.route('/solve/check', methods=['POST'])
+def check_schedule_input():
+    """Schedule input validation only (solver 미실행, fouroff_ver_8.py --check-only 와 동일)"""
+    try:
+        check_output, check_status = precheck_solve_input(request.get_json())
+        return jsonify(check_output), check_status
+    
+    except Exception as e:
+        print(f"[ERROR] Solve check failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/solve/bounds', methods=['POST'])
+def schedule_input_bounds():
+    """설정 가능 범위 (min_N, Low Grade 최대 인원, 간호사별 X, 날짜별 여유) - solver 미실행
+    
+    /solve 와 같은 body, status 'infeasible' 이면 problems 에 범위를 벗어난 항목
+    """
+    try:
+        output, status = compute_solve_bounds(request.get_json())
+        return jsonify(output), status
+    
+    except Exception as e:
+        print(f"[ERROR] Solve bounds failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/rooms/<room_id>/bounds', methods=['GET', 'POST'])
+def room_bounds(room_id):
+    """방에 저장된 근무 설정 + 제출된 희망 근무의 설정 가능 범위 (/solve/bounds 참고)
+    
+    GET: ?year=&month=
+    POST Body: year, month, config (저장된 근무 설정 대신 사용할 항목 - 변경 전 미리 확인),
+        use_history (이전 달 근무표 기준 past_3days, default: true)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        year = data.get('year') or request.args.get('year', type=int)
+        month = data.get('month') or request.args.get('month', type=int)
+        
+        if not year or not month:
+            return jsonify({"error": "Missing year or month"}), 400
+        
+        room = room_cache.get(room_id)
+        if not room:
+            return jsonify({"error": "Room not found"}), 404
+        
+        schedule_data = unpack_schedule_data(room.get('schedule_data'))
+        history = room_schedule_history(room_id, room, year, month, data.get('use_history', True))
+        try:
+            input_json = build_solve_input(schedule_data, submitted_preferences(room_id, year, month),
+                                           year, month, overrides=data.get('config'), history=history)
+        except ValueError as e:
+            return jsonify({"status": "validation_error", "message": str(e)}), 400
+        
+        output, status = compute_solve_bounds(input_json)
+        return jsonify(output), status
+    
+    except Exception as e:
+        print(f"[ERROR] Room bounds failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/rooms/<room_id>/solve', methods=['POST'])
+def solve_room(room_id):
+    """방에 저장된 근무 설정 + 제출된 희망 근무로 근무표 생성
+    
+    Request Body:
+        year: int - 연도
+        month: int - 월
+        config: dict - 저장된 근무 설정 대신 사용할 항목 (optional)
+        store: bool - 결과를 schedule_data['schedule'] 에 저장 (default: False)
+        time_limit: float - 응답 deadline (초, X-Solve-Deadline 헤더와 같음, optional)
+        return_incumbent: bool - 취소 시 그때까지 찾은 최선의 해 반환 (default: False)
+        use_history: bool - 이전 달 확정 근무표로 past_3days / 연속 근무 이력 계산 (default: True)
+    
+    이전 달 근무표가 저장돼 있으면 그 달에 있던 간호사의 past_3days 는 저장된 근무표 기준,
+    응답의 history 에 사용한 달 / 간호사별 이력 (근무 종류별 합계 포함)
+    
+    취소: X-Solve-Job 헤더로 id 지정 후 DELETE /solve/jobs/<id>, 또는 DELETE /rooms/<id>/solve
+    
+    근무표 형식: ?format=compact|verbose (default: verbose)
+    """
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 500
+    
+    try:
+        schedule_format = get_requested_format()
+        data = request.get_json() or {}
+        deadline = get_solve_deadline(data)
+        job_id = get_solve_job_id()
+        year = data.get('year')
+        month = data.get('month')
+        
+        if not year or not month:
+            return jsonify({"error": "Missing year or month"}), 400
+        
+        room = room_cache.get(room_id)
+        if not room:
+            return jsonify({"error": "Room not found"}), 404
+        
+        schedule_data = unpack_schedule_data(room.get('schedule_data'))
+        history = room_schedule_history(room_id, room, year, month, data.get('use_history', True))
+        try:
+            input_json = build_solve_input(schedule_data, submitted_preferences(room_id, year, month),
+                                           year, month, overrides=data.get('config'), history=history)
+        except ValueError as e:
+            return jsonify({"status": "validation_error", "message": str(e)}), 400
+        
+        print(f"[INFO] Room {room_id} solve: {len(input_json['nurses'])} nurses, "
+              f"{len(input_json['preferences'])} preferences ({year}/{month})")
+        
+        # 백그라운드 solve 결과가 같은 입력이면 그대로 사용
+        #   실행 중이면 deadline 안에서만 기다리고, 넘으면 백그라운드 solve 를 중단하고 직접 실행
+        slot = (room_id, int(year), int(month))
+        output = None
+        if speculative_solver:
+            output = speculative_solver.lookup(slot, input_json, timeout=queue_wait_budget(deadline))
+            if output is None and speculative_solver.running(slot, input_json):
+                print(f"[INFO] Room {room_id} speculative solve still running, solving in foreground")
+                solve_jobs.cancel_room(room_id, background=True)
+        
+        if output is None:
+            check_output, check_status = precheck_solve_input(input_json)
+            if check_status != 200:
+                return jsonify(check_output), check_status
+            
+            try:
+                output, status = run_solve_flight(room_id, input_json, deadline, job_id,
+                                                  bool(data.get('return_incumbent')))
+            except SolveRejected as e:
+                print(f"[INFO] Room {room_id} solve rejected: {e.reason} (position {e.position})")
+                return solve_busy_response(e)
+            if status != 200:
+                return solve_response(output, status, job_id)
+            # 취소로 중단된 해는 재사용하지 않음
+            if speculative_solver and not output.get('cancelled'):
+                speculative_solver.store(slot, input_json, output)
+        else:
+            print(f"[INFO] Room {room_id} solve served from speculative result")
+        
+        output = dict(output)
+        compact = output['schedule']
+        output['schedule'] = format_schedule(compact, schedule_format)
+        if history and history['months']:
+            output['history'] = history
+        
+        if data.get('store'):
+            storage.save_schedule(room_id, year, month, compact)
+            updated = storage.update_room_schedule(
+                room_id, pack_schedule_data(store_solve_result(room.get('schedule_data'), compact, year, month))
+            )
+            
+            if updated:
+                room_cache.put(updated)
+                # 다음 달 solve 는 DB 조회 없이 이 근무표로 이력 계산
+                room_history.advance(room_id, updated.get('schedule_version'), int(year), int(month), compact)
+                publish_room_event(room_id, 'schedule_updated', version=updated.get('schedule_version'))
+                output['version'] = updated.get('schedule_version')
+            else:
+                return jsonify({"error": "Failed to store schedule"}), 400
+        
+        return solve_response(output, 200, job_id)
+    
+    except Exception as e:
+        print(f"[ERROR] Room solve failed: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/rooms/<room_id>/solve', methods=['DELETE'])
+def cancel_room_solve(room_id):
+    """방의 실행 중인 solve 모두 취소 (백그라운드 solve 포함)"""
+    cancelled = solve_jobs.cancel_room(room_id)
+    print(f"[INFO] Room {room_id}: {cancelled} solve job(s) cancelled")
+    return jsonify({"status": "cancelled", "jobs": cancelled}), 200
+
+
+@app.route('/solve/jobs/<job_id>', methods=['DELETE'])
+def cancel_solve_job(job_id):
+    """solve 취소 - 같은 입력을 기다리는 다른 요청이 없으면 solver 중단 (worker slot 반환)"""
+    if not valid_job_id(job_id) or not solve_jobs.cancel(job_id):
+        return jsonify({"error": "Solve job not found"}), 404
+    print(f"[INFO] Solve job {job_id} cancelled")
+    return jsonify({"status": "cancelled", "job_id": job_id}), 200
+
+
+# ========================================
+# Metrics
+# ========================================
+
+SOLVE_METRICS = (
+    ('slots', 'gauge', 'Concurrent solve limit'),
+    ('running', 'gauge', 'Solves running now'),
+    ('queue_depth', 'gauge', 'Solve requests waiting in queue'),
+    ('queue_parked', 'gauge', 'Rejected solve tickets keeping their queue position'),
+    ('queue_background', 'gauge', 'Background solves waiting in queue'),
+    ('admitted', 'counter', 'Solve requests admitted'),
+    ('rejected', 'counter', 'Solve requests rejected with 429'),
+    ('wait_seconds', 'counter', 'Total seconds admitted solves waited in queue'),
+    ('solves', 'counter', 'Solves finished'),
+    ('solve_seconds', 'counter', 'Total seconds spent solving')
+)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """solve 대기열 / 실행 지표 (Prometheus text format, 같은 서버의 모든 worker 합계)"""
+    values = solve_scheduler.metrics()
+    lines = []
+    for key, metric_type, description in SOLVE_METRICS:
+        name = f'fouroff_solve_{key}' + ('_total' if metric_type == 'counter' else '')
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(f'{name} {values[key]}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
 # ========================================
 # Error Handlers
 # ========================================
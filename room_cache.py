@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+room_cache.py - Read-through room cache
+rooms 테이블 조회를 TTL 캐시로 대체 (존재 확인, 비밀번호 확인, 방 조회)
+create_room / update_room 에서 명시적으로 갱신/무효화
+
+shared_dir 지정 시 무효화 표시 파일로 같은 서버의 다른 gunicorn worker 캐시도 무효화
+    (worker 가 2개 이상이면 필수 - 없으면 다른 worker 는 TTL 동안 이전 schedule_data / 비밀번호 사용)
+"""
+
+import os
+import hashlib
+
+from ttl_cache import TTLCache
+
+
+class RoomCache:
+    """room_id -> room row (loader로 읽어온 그대로)"""
+
+    def __init__(self, loader, ttl=60.0, maxsize=1024, shared_dir=None):
+        self.loader = loader
+        self.shared_dir = shared_dir
+        self._rooms = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def _marker_path(self, room_id):
+        return os.path.join(self.shared_dir, hashlib.sha1(str(room_id).encode()).hexdigest())
+
+    def _marker_state(self, room_id):
+        """무효화 표시 파일 상태 (mtime_ns, size) - 무효화할 때마다 바뀜 (없으면 None)
+
+        파일 시각은 커널의 거친 clock 이라 time.time() 과 비교하지 않고 상태가 같은지만 확인
+        """
+        if not self.shared_dir:
+            return None
+        try:
+            stat = os.stat(self._marker_path(room_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, room_id):
+        """캐시된 room 반환, 없으면 loader로 조회 (방이 없으면 None)"""
+        entry = self._rooms.get(room_id)
+        if entry is not None:
+            state, room = entry
+            if state == self._marker_state(room_id):
+                return room
+
+        # 조회 전 상태 기준 - 조회 중 다른 worker 가 무효화하면 다음 get 에서 다시 조회
+        state = self._marker_state(room_id)
+        room = self.loader(room_id)
+        if room is not None:
+            self._rooms.set(room_id, (state, room))
+        return room
+
+    def put(self, room):
+        """쓰기 직후 최신 row로 갱신"""
+        self.invalidate(room['id'])
+        self._rooms.set(room['id'], (self._marker_state(room['id']), room))
+
+    def invalidate(self, room_id):
+        self._rooms.pop(room_id)
+        if self.shared_dir:
+            # 1 byte 씩 추가 (같은 clock tick 안의 무효화도 size 로 구분), 커지면 비움
+            with open(self._marker_path(room_id), 'ab') as f:
+                f.write(b'.')
+                if f.tell() > 4096:
+                    f.truncate(0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+room_events.py - Room event pub/sub (SSE 구독용)
+희망 근무 제출/삭제, 근무표 저장 이벤트를 방 단위로 전달
+
+InProcessBroker: 단일 프로세스 (gunicorn worker 1개 또는 개발 서버)
+FileBroker: 같은 서버의 여러 worker 간 공유 (방별 append-only 로그 파일)
+두 broker 모두 publish / subscribe 인터페이스가 같으므로 외부 broker로 교체 가능
+"""
+
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+
+
+class Subscription:
+    """구독 1개: get(timeout)으로 이벤트 수신, 끝나면 close()"""
+
+    def __init__(self, broker, room_id):
+        self.broker = broker
+        self.room_id = room_id
+        self._queue = queue.Queue(maxsize=256)
+
+    def push(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # 느린 구독자는 이벤트를 버림 (클라이언트가 재조회)
+            pass
+
+    def get(self, timeout=None):
+        """이벤트 1개 (timeout 내 없으면 None)"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """프로세스 내 pub/sub"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, room_id):
+        subscription = Subscription(self, room_id)
+        with self._lock:
+            self._subscribers.setdefault(room_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.room_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.room_id]
+
+    def publish(self, room_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(room_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscriber_count(self):
+        """이 프로세스의 구독 수 (모든 방)"""
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class FileBroker(InProcessBroker):
+    """방별 로그 파일 기반 pub/sub (같은 서버의 gunicorn worker 간 공유)
+
+    publish: <spool_dir>/<room hash>.log 에 JSON 한 줄 append
+    subscribe: 프로세스당 1개 스레드가 구독 중인 방의 로그 파일을 tail
+    """
+
+    def __init__(self, spool_dir, poll_interval=0.5, max_log_bytes=1024 * 1024):
+        super().__init__()
+        self.spool_dir = spool_dir
+        self.poll_interval = poll_interval
+        self.max_log_bytes = max_log_bytes
+        self._offsets = {}
+        self._tailer = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _log_path(self, room_id):
+        return os.path.join(self.spool_dir, hashlib.sha1(str(room_id).encode()).hexdigest() + '.log')
+
+    def _log_size(self, room_id):
+        try:
+            return os.path.getsize(self._log_path(room_id))
+        except FileNotFoundError:
+            return 0
+
+    def subscribe(self, room_id):
+        with self._lock:
+            if room_id not in self._offsets:
+                self._offsets[room_id] = self._log_size(room_id)
+            if self._tailer is None:
+                self._tailer = threading.Thread(target=self._tail_loop, daemon=True)
+                self._tailer.start()
+        return super().subscribe(room_id)
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription)
+        with self._lock:
+            if subscription.room_id not in self._subscribers:
+                self._offsets.pop(subscription.room_id, None)
+
+    def publish(self, room_id, event):
+        path = self._log_path(room_id)
+        line = (json.dumps(event, ensure_ascii=False) + '\n').encode()
+        # 로그가 커지면 비움 (구독자는 크기 감소를 감지하고 처음부터 읽음)
+        if self._log_size(room_id) > self.max_log_bytes:
+            open(path, 'wb').close()
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _tail_loop(self):
+        while True:
+            with self._lock:
+                offsets = dict(self._offsets)
+
+            for room_id, offset in offsets.items():
+                size = self._log_size(room_id)
+                if size < offset:
+                    offset = 0
+                if size == offset:
+                    continue
+
+                with open(self._log_path(room_id), 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+                # 마지막 줄이 쓰는 중이면 다음 차례에 읽음
+                complete = chunk[:chunk.rfind(b'\n') + 1]
+                for line in complete.splitlines():
+                    try:
+                        super().publish(room_id, json.loads(line))
+                    except ValueError:
+                        continue
+
+                with self._lock:
+                    if room_id in self._offsets:
+                        self._offsets[room_id] = offset + len(complete)
+
+            time.sleep(self.poll_interval)
+
+
+def create_broker(spool_dir=None):
+    """spool_dir 지정 시 FileBroker, 아니면 InProcessBroker"""
+    if spool_dir:
+        return FileBroker(spool_dir)
+    return InProcessBroker()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+room_history.py - 이전 달 확정 근무표로 간호사별 근무 이력 계산 (방 단위 solve)
+
+schedules 테이블에서 대상 월 직전 months 개월을 한 번에 조회 (이어진 달만 사용)
+    past_3days:        직전 달 마지막 3일 (직접 입력한 past_3days 대신 사용)
+    past_work_streak:  직전 달 말까지 이어진 연속 근무일 수 (여러 달에 걸쳐 계산)
+    counts:            조회한 달들의 근무 종류별 합계 (공정성 참고용)
+
+방별 이력 window 를 캐시 (rooms.schedule_version 이 같을 때만 사용)
+    근무표를 저장하면 advance() 로 다음 달 window 를 DB 조회 없이 만듦
+    다른 worker 가 저장하면 schedule_version 이 바뀌므로 다시 조회
+"""
+
+from ttl_cache import TTLCache
+from schedule_format import DUTY_CHARS, day_to_index, is_compact_schedule
+
+
+def shift_month(year, month, delta):
+    """(year, month) 에서 delta 개월 이동"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def month_rows(schedule):
+    """compact 근무표 -> {nurse: 1일부터의 근무 문자열} (compact 가 아니면 {})"""
+    if not is_compact_schedule(schedule):
+        return {}
+    start = day_to_index(1, schedule.get('offset', 0))
+    return {nurse: row[start:] for nurse, row in schedule['nurses'].items()}
+
+
+def summarize(window):
+    """이력 window [((year, month), rows)] (오래된 달부터) -> 간호사별 이력
+
+    직전 달에 없는 간호사 (신규 등) 는 포함하지 않음
+    """
+    if not window:
+        return {}
+    latest = window[-1][1]
+    nurses = {}
+    for nurse, row in latest.items():
+        if len(row) < 3 or any(duty not in DUTY_CHARS for duty in row[-3:]):
+            continue
+
+        # 연속 근무: 최근 달부터 거꾸로, X 나 이력이 끊기는 곳까지
+        streak = 0
+        for _, rows in reversed(window):
+            cells = rows.get(nurse, '')
+            worked = len(cells) - len(cells.rstrip('DEN'))
+            streak += worked
+            if not cells or worked < len(cells):
+                break
+
+        counts = dict.fromkeys(DUTY_CHARS, 0)
+        for _, rows in window:
+            for duty in rows.get(nurse, ''):
+                if duty in counts:
+                    counts[duty] += 1
+
+        nurses[nurse] = {
+            'past_3days': list(row[-3:]),
+            'past_work_streak': streak,
+            'counts': counts
+        }
+    return nurses
+
+
+class RoomHistory:
+    """방별 이전 달 근무 이력 (프로세스 내 캐시)
+
+    Args:
+        loader: (room_id, since, until) -> [{'year', 'month', 'schedule'}] (storage.list_schedules)
+        months: 조회할 이전 달 수 (past_3days 만 쓰면 1)
+    """
+
+    def __init__(self, loader, months=3, maxsize=256, ttl=3600.0):
+        self.loader = loader
+        self.months = max(1, months)
+        self._windows = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _window(self, room_id, year, month):
+        """대상 월 직전까지 이어진 [((year, month), rows)] (1회 조회)"""
+        until = shift_month(year, month, -1)
+        since = shift_month(year, month, -self.months)
+        stored = {(row['year'], row['month']): row['schedule']
+                  for row in self.loader(room_id, since, until)}
+
+        window = []
+        current = until
+        while current in stored and len(window) < self.months:
+            rows = month_rows(stored[current])
+            if not rows:
+                break
+            window.insert(0, (current, rows))
+            current = shift_month(*current, -1)
+        return window
+
+    def get(self, room_id, version, year, month):
+        """대상 월의 이력
+
+        Returns:
+            {'months': [[year, month], ...], 'nurses': {nurse: {past_3days, past_work_streak, counts}}}
+        """
+        entry = self._windows.get(room_id)
+        if entry is None or entry['version'] != version or entry['target'] != (year, month):
+            entry = {'version': version, 'target': (year, month),
+                     'window': self._window(room_id, year, month)}
+            self._windows.set(room_id, entry)
+        return {
+            'months': [list(key) for key, _ in entry['window']],
+            'nurses': summarize(entry['window'])
+        }
+
+    def advance(self, room_id, version, year, month, schedule):
+        """(year, month) 근무표 저장 후 호출: 캐시된 window 가 그 달 기준이면 다음 달 window 로 이동"""
+        entry = self._windows.get(room_id)
+        rows = month_rows(schedule)
+        if entry is None or entry['target'] != (year, month) or not rows:
+            self._windows.pop(room_id)
+            return
+        window = (entry['window'] + [((year, month), rows)])[-self.months:]
+        self._windows.set(room_id, {'version': version, 'target': shift_month(year, month, 1),
+                                    'window': window})
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+room_solve.py - 방에 저장된 데이터로 solver 입력 구성 (POST /rooms/<id>/solve)
+
+근무 설정: schedule_data['solver_config'] (없으면 schedule_data 최상위의 같은 key)
+    nurses, daily_wallet_config, nurse_wallet_min, max_consecutive_work, new, quit
+희망 근무: preferences 테이블 (room_id, year, month, is_submitted=true)
+이전 달 근무표가 저장돼 있으면 past_3days / past_work_streak 는 그 근무표 기준 (room_history.py)
+"""
+
+from schedule_format import COMPACT_FORMAT, is_compact_schedule
+
+SOLVER_CONFIG_KEYS = (
+    'nurses', 'daily_wallet_config', 'nurse_wallet_min',
+    'max_consecutive_work', 'new', 'quit', 'mode', 'soft_weights'
+)
+
+
+def room_solver_config(schedule_data):
+    """schedule_data 에 저장된 근무 설정 (solver 입력 key만)"""
+    if not isinstance(schedule_data, dict):
+        return {}
+    source = schedule_data.get('solver_config')
+    if not isinstance(source, dict):
+        source = schedule_data
+    return {key: source[key] for key in SOLVER_CONFIG_KEYS if key in source}
+
+
+def apply_history(nurses, history):
+    """이전 달 이력이 있는 간호사의 past_3days / past_work_streak 교체 (새 목록 반환)"""
+    if not history or not history.get('nurses'):
+        return nurses
+    applied = []
+    for nurse in nurses:
+        record = history['nurses'].get(nurse.get('name'))
+        if record:
+            nurse = dict(nurse, past_3days=record['past_3days'],
+                         past_work_streak=record['past_work_streak'])
+        applied.append(nurse)
+    return applied
+
+
+def build_solve_input(schedule_data, preference_rows, year, month, overrides=None, history=None):
+    """/solve 와 같은 형식의 입력 dict
+
+    Args:
+        schedule_data: rooms.schedule_data
+        preference_rows: [{'nurse_name', 'schedule'}, ...]
+        year, month: 대상 연/월
+        overrides: 요청 body의 config (저장된 설정보다 우선)
+        history: RoomHistory.get() 결과 (이전 달 근무표 기준 past_3days, optional)
+
+    Raises:
+        ValueError: 근무 설정이 없는 경우
+    """
+    config = room_solver_config(schedule_data)
+    if overrides:
+        config.update({key: overrides[key] for key in SOLVER_CONFIG_KEYS if key in overrides})
+
+    if not config.get('nurses'):
+        raise ValueError("Room has no solver_config.nurses")
+
+    roster = {nurse.get('name') for nurse in config['nurses']}
+    preferences = []
+    # 이름순 정렬 - 같은 데이터면 같은 입력 (캐시 key 일관성)
+    for row in sorted(preference_rows, key=lambda r: r['nurse_name']):
+        if row['nurse_name'] not in roster or not row.get('schedule'):
+            continue
+        preferences.append({'name': row['nurse_name'], 'schedule': row['schedule']})
+
+    input_data = dict(config)
+    input_data['nurses'] = apply_history(config['nurses'], history)
+    input_data.update({
+        'year': year,
+        'month': month,
+        'preferences': preferences,
+        'schedule_format': COMPACT_FORMAT
+    })
+    return input_data
+
+
+def store_solve_result(schedule_data, schedule, year, month):
+    """solve 결과 근무표를 넣은 새 schedule_data (근무 설정 등 나머지는 유지)"""
+    stored = dict(schedule_data) if isinstance(schedule_data, dict) else {}
+    stored.update({'year': year, 'month': month, 'schedule': schedule})
+    return stored
+
+
+def stored_schedule(schedule_data):
+    """schedule_data 안의 확정 근무표 (year, month, compact) - 연/월을 알 수 없거나 compact 가 아니면 None"""
+    if not isinstance(schedule_data, dict):
+        return None
+    schedule = schedule_data if is_compact_schedule(schedule_data) else schedule_data.get('schedule')
+    if not is_compact_schedule(schedule):
+        return None
+    year = schedule_data.get('year') or schedule.get('year')
+    month = schedule_data.get('month') or schedule.get('month')
+    if not year or not month:
+        return None
+    return int(year), int(month), schedule
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+schedule_format.py - Compact schedule representation
+verbose: {nurse: {"-3": "D", "-2": "E", "-1": "X", "1": "D", ...}}
+compact: {"format": "compact", "year": 2025, "month": 3, "offset": -3,
+          "nurses": {nurse: "DEXD..."}}
+
+compact 문자열의 i번째 글자 = offset부터 시작하는 i번째 날 (0일은 건너뜀)
+빈 칸은 '.' 으로 표시
+"""
+
+COMPACT_FORMAT = 'compact'
+VERBOSE_FORMAT = 'verbose'
+SCHEDULE_FORMATS = (COMPACT_FORMAT, VERBOSE_FORMAT)
+
+DUTY_CHARS = 'DENX'
+EMPTY_CELL = '.'
+
+
+# ========================================
+# Day index helpers
+# ========================================
+
+def index_to_day(index, offset):
+    """compact 문자열 index -> 날짜 (0일 없음: ..., -2, -1, 1, 2, ...)"""
+    day = offset + index
+    if offset < 0 and day >= 0:
+        day += 1
+    return day
+
+
+def day_to_index(day, offset):
+    """날짜 -> compact 문자열 index"""
+    index = day - offset
+    if offset < 0 and day > 0:
+        index -= 1
+    return index
+
+
+def is_compact_schedule(obj):
+    """compact 형식 여부"""
+    return isinstance(obj, dict) and obj.get('format') == COMPACT_FORMAT and 'nurses' in obj
+
+
+def is_verbose_schedule(obj):
+    """verbose 형식 여부 ({nurse: {day_str: duty}})"""
+    if not isinstance(obj, dict) or not obj:
+        return False
+    for cells in obj.values():
+        if not isinstance(cells, dict):
+            return False
+        for day_str, duty in cells.items():
+            if not isinstance(duty, str) or len(duty) != 1 or duty not in DUTY_CHARS:
+                return False
+            try:
+                day = int(day_str)
+            except (TypeError, ValueError):
+                return False
+            if day == 0 or str(day) != day_str:
+                return False
+    return True
+
+
+# ========================================
+# Encode / Decode
+# ========================================
+
+def encode_schedule(schedule, year=None, month=None, offset=None):
+    """verbose -> compact
+
+    Args:
+        schedule: {nurse: {day_str: duty}}
+        year, month: 헤더에 기록할 연/월 (optional)
+        offset: 첫 글자의 날짜 (default: 가장 이른 날짜, 최대 1)
+    """
+    first_day = 1
+    last_day = 0
+    for cells in schedule.values():
+        for day_str in cells:
+            day = int(day_str)
+            first_day = min(first_day, day)
+            last_day = max(last_day, day)
+
+    if offset is None:
+        offset = first_day
+    length = day_to_index(last_day, offset) + 1 if last_day else -offset
+
+    nurses = {}
+    for nurse, cells in schedule.items():
+        row = [EMPTY_CELL] * length
+        for day_str, duty in cells.items():
+            row[day_to_index(int(day_str), offset)] = duty
+        nurses[nurse] = ''.join(row)
+
+    return {
+        'format': COMPACT_FORMAT,
+        'year': year,
+        'month': month,
+        'offset': offset,
+        'nurses': nurses
+    }
+
+
+def decode_schedule(compact):
+    """compact -> verbose"""
+    offset = compact.get('offset', 1)
+    schedule = {}
+    for nurse, row in compact['nurses'].items():
+        schedule[nurse] = {
+            str(index_to_day(i, offset)): duty
+            for i, duty in enumerate(row)
+            if duty != EMPTY_CELL
+        }
+    return schedule
+
+
+def format_schedule(schedule, schedule_format, year=None, month=None):
+    """요청된 형식으로 변환 (compact/verbose 어느 쪽 입력이든 허용)"""
+    if schedule_format not in SCHEDULE_FORMATS:
+        raise ValueError(f"schedule_format must be one of {SCHEDULE_FORMATS}, got {schedule_format}")
+
+    if schedule_format == COMPACT_FORMAT:
+        if is_compact_schedule(schedule):
+            return schedule
+        return encode_schedule(schedule, year, month)
+
+    if is_compact_schedule(schedule):
+        return decode_schedule(schedule)
+    return schedule
+
+
+# ========================================
+# rooms.schedule_data 저장용
+# ========================================
+
+def pack_schedule_data(schedule_data):
+    """schedule_data 안의 verbose 근무표를 compact로 변환 (손실 없는 경우에만)
+
+    schedule_data 자체가 근무표이거나 {'schedule': 근무표, ...} 형태인 경우 변환.
+    그 외 형식은 그대로 반환.
+    """
+    if not isinstance(schedule_data, dict):
+        return schedule_data
+
+    if is_verbose_schedule(schedule_data):
+        return encode_schedule(schedule_data)
+
+    schedule = schedule_data.get('schedule')
+    if is_verbose_schedule(schedule):
+        packed = dict(schedule_data)
+        packed['schedule'] = encode_schedule(
+            schedule, schedule_data.get('year'), schedule_data.get('month')
+        )
+        return packed
+
+    return schedule_data
+
+
+def unpack_schedule_data(schedule_data):
+    """pack_schedule_data의 역변환 (verbose 요청 시 사용)"""
+    if not isinstance(schedule_data, dict):
+        return schedule_data
+
+    if is_compact_schedule(schedule_data):
+        return decode_schedule(schedule_data)
+
+    schedule = schedule_data.get('schedule')
+    if is_compact_schedule(schedule):
+        unpacked = dict(schedule_data)
+        unpacked['schedule'] = decode_schedule(schedule)
+        return unpacked
+
+    return schedule_data
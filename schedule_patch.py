@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+schedule_patch.py - rooms.schedule_data 부분 수정 (PATCH /rooms/<id>)
+
+cells: [{"nurse": "김간호", "day": 5, "duty": "D"}, ...]  (duty null 이면 칸 비움)
+    schedule_data 안의 근무표 (자체 또는 'schedule' 키) 를 칸 단위로 수정
+    compact 근무표는 문자열 해당 글자만 교체
+
+patch: JSON Patch (RFC 6902) - add / remove / replace / move / copy / test
+    요청 형식(?format) 으로 표현된 schedule_data 기준 경로
+"""
+
+import copy
+
+from schedule_format import (
+    DUTY_CHARS, EMPTY_CELL,
+    is_compact_schedule, is_verbose_schedule,
+    day_to_index, decode_schedule, encode_schedule
+)
+
+
+# ========================================
+# Cell edits
+# ========================================
+
+def _schedule_slot(schedule_data):
+    """(근무표, 교체 함수) - 근무표가 schedule_data 자체인지 'schedule' 키인지 구분"""
+    if is_compact_schedule(schedule_data) or is_verbose_schedule(schedule_data):
+        return schedule_data, lambda schedule: schedule
+
+    if isinstance(schedule_data, dict):
+        def replace(schedule):
+            updated = dict(schedule_data)
+            updated['schedule'] = schedule
+            return updated
+        return schedule_data.get('schedule') or {}, replace
+
+    raise ValueError("schedule_data has no schedule to edit")
+
+
+def _parse_cell(cell):
+    try:
+        nurse = cell['nurse']
+        day = int(cell['day'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid cell: {cell}")
+
+    duty = cell.get('duty') or None
+    if day == 0:
+        raise ValueError(f"Invalid cell day 0 for {nurse}")
+    if duty is not None and (len(duty) != 1 or duty not in DUTY_CHARS):
+        raise ValueError(f"Invalid duty {duty} for {nurse} day {day}")
+    return nurse, day, duty
+
+
+def _apply_compact(compact, edits):
+    offset = compact.get('offset', 1)
+    if any(day_to_index(day, offset) < 0 for _, day, _ in edits):
+        # offset 이전 날짜 수정: verbose 로 풀어서 다시 인코딩
+        schedule = decode_schedule(compact)
+        _apply_verbose(schedule, edits)
+        return encode_schedule(schedule, compact.get('year'), compact.get('month'))
+
+    rows = {nurse: list(row) for nurse, row in compact['nurses'].items()}
+    for nurse, day, duty in edits:
+        row = rows.setdefault(nurse, [])
+        index = day_to_index(day, offset)
+        if index >= len(row):
+            row.extend(EMPTY_CELL * (index + 1 - len(row)))
+        row[index] = duty or EMPTY_CELL
+
+    patched = dict(compact)
+    patched['nurses'] = {nurse: ''.join(row) for nurse, row in rows.items()}
+    return patched
+
+
+def _apply_verbose(schedule, edits):
+    for nurse, day, duty in edits:
+        cells = schedule.setdefault(nurse, {})
+        if duty is None:
+            cells.pop(str(day), None)
+        else:
+            cells[str(day)] = duty
+    return schedule
+
+
+def apply_cells(schedule_data, cells):
+    """칸 단위 수정 적용한 새 schedule_data 반환 (원본은 변경하지 않음)"""
+    if not isinstance(cells, list) or not cells:
+        raise ValueError("cells must be a non-empty list")
+
+    edits = [_parse_cell(cell) for cell in cells]
+    schedule, replace = _schedule_slot(schedule_data)
+
+    if is_compact_schedule(schedule):
+        return replace(_apply_compact(schedule, edits))
+    return replace(_apply_verbose(copy.deepcopy(schedule), edits))
+
+
+# ========================================
+# JSON Patch (RFC 6902)
+# ========================================
+
+def _split_pointer(path):
+    """JSON Pointer (RFC 6901) -> token 목록"""
+    if path == '':
+        return []
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError(f"Invalid JSON pointer: {path}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def _resolve(doc, tokens):
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise ValueError(f"Path not found: /{'/'.join(tokens)}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_list_index(doc, token)]
+        else:
+            raise ValueError(f"Path not found: /{'/'.join(tokens)}")
+    return doc
+
+
+def _list_index(items, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(items)
+    if not token.isdigit():
+        raise ValueError(f"Invalid list index: {token}")
+    index = int(token)
+    if index > len(items) or (index == len(items) and not allow_end):
+        raise ValueError(f"List index out of range: {token}")
+    return index
+
+
+def _add(doc, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, key, allow_end=True), value)
+    else:
+        raise ValueError(f"Cannot add to /{'/'.join(tokens)}")
+    return doc
+
+
+def _remove(doc, tokens):
+    if not tokens:
+        raise ValueError("Cannot remove the whole document")
+    parent = _resolve(doc, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise ValueError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, key))
+    raise ValueError(f"Cannot remove /{'/'.join(tokens)}")
+
+
+def _replace(doc, tokens, value):
+    if not tokens:
+        return value
+    _resolve(doc, tokens)
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        parent[_list_index(parent, tokens[-1])] = value
+    else:
+        parent[tokens[-1]] = value
+    return doc
+
+
+def _value(operation):
+    if 'value' not in operation:
+        raise ValueError(f"Missing value in patch operation: {operation}")
+    return copy.deepcopy(operation['value'])
+
+
+def apply_json_patch(doc, operations):
+    """JSON Patch 적용한 새 문서 반환 (실패 시 ValueError, 원본은 변경하지 않음)"""
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("patch must be a non-empty list")
+
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError(f"Invalid patch operation: {operation}")
+        op = operation.get('op')
+        tokens = _split_pointer(operation.get('path'))
+
+        if op == 'add':
+            doc = _add(doc, tokens, _value(operation))
+        elif op == 'remove':
+            _remove(doc, tokens)
+        elif op == 'replace':
+            doc = _replace(doc, tokens, _value(operation))
+        elif op in ('move', 'copy'):
+            from_tokens = _split_pointer(operation.get('from'))
+            value = _remove(doc, from_tokens) if op == 'move' else copy.deepcopy(_resolve(doc, from_tokens))
+            doc = _add(doc, tokens, value)
+        elif op == 'test':
+            if _resolve(doc, tokens) != operation.get('value'):
+                raise ValueError(f"Test failed at {operation.get('path')}")
+        else:
+            raise ValueError(f"Unsupported patch op: {op}")
+    return doc
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+single_flight.py - 같은 입력의 동시 solve 를 1개로 합치기
+
+key (solver 입력 canonical hash) 당 실행 중인 작업 1개
+    나중에 온 같은 key 요청은 새로 실행하지 않고 실행 중인 작업의 결과를 같이 받음
+    (더블클릭, 두 사람이 같은 방을 동시에 생성하는 경우)
+
+프로세스 내: 스레드 간 공유 (기본)
+shared_dir 지정 시: 같은 서버의 gunicorn worker 간에도 공유
+    shared_dir/<key>.lock 파일 flock 을 잡은 프로세스가 실행, 결과는 <key>.json 으로 전달
+    다른 프로세스는 lock 이 풀릴 때까지 기다린 뒤 결과 파일을 읽음
+"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+
+
+class FlightTimeout(Exception):
+    """실행 중인 작업을 기다리다 timeout"""
+
+
+class FlightAborted(Exception):
+    """실행 중인 작업을 기다리다 abort() 가 True (요청 취소)"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """key 별 실행 중인 작업 공유
+
+    Args:
+        shared_dir: worker 간 공유 디렉토리 (optional)
+        result_ttl: 결과 파일 보관 시간 (초, 기다리던 다른 worker 가 읽을 시간)
+    """
+
+    def __init__(self, shared_dir=None, result_ttl=60.0, poll_interval=0.2):
+        self.shared_dir = shared_dir
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def do(self, key, fn, timeout=None, abort=None):
+        """같은 key 가 실행 중이면 그 결과를, 아니면 fn() 실행 결과를 반환
+
+        Args:
+            fn: () -> JSON 직렬화 가능한 결과 (worker 간 공유 시)
+            timeout: 다른 요청의 작업을 기다리는 최대 시간 (초)
+            abort: () -> bool, 기다리는 동안 poll_interval 마다 확인 (True 면 FlightAborted)
+
+        Returns:
+            (result, shared): shared = 다른 요청이 실행한 결과를 받음
+
+        Raises:
+            FlightTimeout: timeout 안에 실행 중인 작업이 끝나지 않음
+            FlightAborted: 기다리는 중 abort() 가 True
+            fn 의 예외: 같은 프로세스에서 기다리던 요청에도 그대로 전달
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._wait(key, call.done, timeout, abort)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            if self.shared_dir:
+                call.result, shared = self._do_shared(key, fn, timeout, abort)
+            else:
+                call.result, shared = fn(), False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, shared
+
+    def _wait(self, key, done, timeout, abort):
+        started = time.monotonic()
+        while not done.wait(self.poll_interval):
+            if abort is not None and abort():
+                raise FlightAborted(key)
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise FlightTimeout(key)
+
+    # ========================================
+    # Shared (between worker processes)
+    # ========================================
+
+    def _lock_path(self, key):
+        return os.path.join(self.shared_dir, key + '.lock')
+
+    def _result_path(self, key):
+        return os.path.join(self.shared_dir, key + '.json')
+
+    def _acquire(self, key, timeout, abort):
+        """key lock 파일 fd (잠금) 와 다른 프로세스를 기다렸는지 여부"""
+        path = self._lock_path(key)
+        started = time.monotonic()
+        waited = False
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                waited = True
+                if abort is not None and abort():
+                    raise FlightAborted(key)
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    raise FlightTimeout(key)
+                time.sleep(self.poll_interval)
+                continue
+
+            # 실행하던 프로세스가 끝나면서 지운 lock 파일이면 다시 시도
+            try:
+                same_file = os.fstat(fd).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                same_file = False
+            if same_file:
+                return fd, waited
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _release(self, key, fd):
+        try:
+            os.remove(self._lock_path(key))
+        except FileNotFoundError:
+            pass
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _load(self, key, since):
+        """since (epoch seconds) 이후 저장된 결과 (없으면 None)"""
+        path = self._result_path(key)
+        try:
+            if os.path.getmtime(path) < since:
+                return None
+            with open(path) as f:
+                return json.load(f)['result']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _save(self, key, result):
+        path = self._result_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'result': result}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        # 오래된 결과 파일 정리
+        now = time.time()
+        for name in os.listdir(self.shared_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.shared_dir, name)) + self.result_ttl < now:
+                    os.remove(os.path.join(self.shared_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def _do_shared(self, key, fn, timeout, abort):
+        started = time.time()
+        fd, waited = self._acquire(key, timeout, abort)
+        try:
+            if waited:
+                result = self._load(key, started)
+                if result is not None:
+                    return result, True
+
+            # 실행한 프로세스가 실패(예외)했으면 결과 파일이 없으므로 직접 실행
+            result = fn()
+            self._save(key, result)
+            return result, False
+        finally:
+            self._release(key, fd)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+solve_jobs.py - 실행 중인 solve 작업 목록 + 취소
+
+같은 서버의 gunicorn worker 가 state_dir/jobs 를 공유 (취소 요청은 어느 worker 로 와도 됨)
+    <job_id>.json: 요청 1개 {key, room, background, cancelled}
+    <key>.proc:    solver 입력 key 를 실행 중인 fouroff_ver_8.py 의 pid
+
+같은 입력의 요청은 solver 1개를 공유 (single_flight) 하므로
+취소된 요청 외에 같은 key 를 기다리는 요청이 없을 때만 solver 에 SIGTERM
+    solver 는 탐색을 멈추고 그때까지 찾은 최선의 해를 출력
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import signal
+from contextlib import contextmanager
+
+JOB_ID_PATTERN = re.compile(r'^[0-9A-Za-z-]{8,64}$')
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def valid_job_id(job_id):
+    return bool(job_id) and bool(JOB_ID_PATTERN.match(job_id))
+
+
+class SolveJobs:
+    """solve 작업 등록 / 취소 (프로세스 간 공유)
+
+    Args:
+        state_dir: jobs 디렉토리를 만들 위치 (SolveScheduler 와 같은 디렉토리)
+        ttl: 이 시간보다 오래된 작업 파일은 무시 (worker 비정상 종료 대비, 초)
+    """
+
+    def __init__(self, state_dir, ttl=600.0):
+        self.job_dir = os.path.join(state_dir, 'jobs')
+        self.ttl = ttl
+        os.makedirs(self.job_dir, exist_ok=True)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.job_dir, job_id + '.json')
+
+    def _proc_path(self, key):
+        return os.path.join(self.job_dir, key + '.proc')
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _jobs(self):
+        """[(job_id, job)] (오래된 작업 파일 정리)"""
+        now = time.time()
+        jobs = []
+        for name in os.listdir(self.job_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.job_dir, name)
+            try:
+                if os.path.getmtime(path) + self.ttl < now:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            job = self._read(path)
+            if job is not None:
+                jobs.append((name[:-len('.json')], job))
+        return jobs
+
+    # ========================================
+    # Registration
+    # ========================================
+
+    @contextmanager
+    def track(self, job_id, key, room, background=False):
+        """with 블록 동안 작업 등록 (취소 대상)"""
+        self._write(self._job_path(job_id),
+                    {'key': key, 'room': str(room), 'background': background, 'cancelled': False})
+        try:
+            yield
+        finally:
+            try:
+                os.remove(self._job_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def process(self, key, pid):
+        """with 블록 동안 key 를 실행 중인 solver pid 등록"""
+        self._write(self._proc_path(key), {'pid': pid})
+        try:
+            yield
+        finally:
+            proc = self._read(self._proc_path(key))
+            if proc and proc['pid'] == pid:
+                try:
+                    os.remove(self._proc_path(key))
+                except FileNotFoundError:
+                    pass
+
+    def is_cancelled(self, job_id):
+        job = self._read(self._job_path(job_id))
+        return bool(job and job['cancelled'])
+
+    def wanted(self, key):
+        """취소되지 않은 요청이 key 를 기다리는지"""
+        return any(job['key'] == key and not job['cancelled'] for _, job in self._jobs())
+
+    # ========================================
+    # Cancellation
+    # ========================================
+
+    def cancel(self, job_id):
+        """작업 취소 - 등록된 작업이 없으면 False"""
+        job = self._read(self._job_path(job_id))
+        if job is None:
+            return False
+        if not job['cancelled']:
+            job['cancelled'] = True
+            self._write(self._job_path(job_id), job)
+        self.stop_unwanted(job['key'])
+        return True
+
+    def cancel_room(self, room, background=None):
+        """방의 작업 모두 취소 (background: True/False 로 백그라운드 여부 한정) - 취소한 수"""
+        cancelled = 0
+        for job_id, job in self._jobs():
+            if job['room'] != str(room) or job['cancelled']:
+                continue
+            if background is not None and job['background'] != background:
+                continue
+            if self.cancel(job_id):
+                cancelled += 1
+        return cancelled
+
+    def stop_unwanted(self, key):
+        """key 를 기다리는 요청이 없으면 solver 에 SIGTERM - 보냈으면 True"""
+        if self.wanted(key):
+            return False
+        proc = self._read(self._proc_path(key))
+        if not proc:
+            return False
+        try:
+            os.kill(proc['pid'], signal.SIGTERM)
+        except ProcessLookupError:
+            return False
+        return True
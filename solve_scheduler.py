@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+solve_scheduler.py - 동시 solve 수 제한 + 방 단위 공정 대기열
+
+slot: state_dir/slots/slot-N.lock 파일 flock (같은 서버의 gunicorn worker 간 공유)
+대기열: state_dir/queue/ 의 ticket 파일 (생성 시각-우선순위-id)
+    순서: 일반 요청 먼저, 그 안에서 방별 round-robin (방마다 가장 오래된 ticket 1개씩 차례로)
+    대기 중인 요청은 ticket mtime 을 계속 갱신 (갱신이 멈춘 ticket 은 보류 상태)
+대기열이 가득 차거나 max_wait 를 넘기면 SolveRejected (429 + Retry-After)
+    응답의 ticket 으로 다시 요청하면 처음 대기 순서를 유지 (ticket_ttl 동안)
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import fcntl
+import threading
+from contextlib import contextmanager
+
+TICKET_PATTERN = re.compile(r'^(\d{20})-([fb])-([0-9a-f]{32})$')
+STATS_NAME = re.compile(r'^stats-(\d+)\.json$')
+STATS_FLUSH_INTERVAL = 1.0
+
+
+def is_background(ticket_name):
+    return TICKET_PATTERN.match(ticket_name).group(2) == 'b'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SolveRejected(Exception):
+    """대기열 초과 / 대기 시간 초과"""
+
+    def __init__(self, reason, position, retry_after, ticket=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.position = position
+        self.retry_after = retry_after
+        self.ticket = ticket
+
+
+class SolveScheduler:
+    """동시 solve 제한 (프로세스 간 공유)
+
+    Args:
+        state_dir: slot/대기열/통계 파일 디렉토리 (같은 서버의 worker가 공유)
+        slots: 동시 solve 수
+        max_queue: 최대 대기 요청 수 (초과 시 즉시 거절)
+        max_wait: 요청당 최대 대기 시간 (초)
+        ticket_ttl: 거절된 ticket 의 대기 순서 유지 시간 (초)
+    """
+
+    def __init__(self, state_dir, slots=1, max_queue=8, max_wait=20.0, ticket_ttl=60.0,
+                 poll_interval=0.2):
+        self.state_dir = state_dir
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.ticket_ttl = ticket_ttl
+        self.poll_interval = poll_interval
+
+        self.slot_dir = os.path.join(state_dir, 'slots')
+        self.queue_dir = os.path.join(state_dir, 'queue')
+        os.makedirs(self.slot_dir, exist_ok=True)
+        os.makedirs(self.queue_dir, exist_ok=True)
+
+        self._stats = {'admitted': 0, 'rejected': 0, 'wait_seconds': 0.0,
+                       'solves': 0, 'solve_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+        self._stats_dirty = False
+        self._stats_written = 0.0
+
+    # ========================================
+    # Slots
+    # ========================================
+
+    def _slot_path(self, index):
+        return os.path.join(self.slot_dir, f'slot-{index}.lock')
+
+    def _try_slot(self):
+        """비어 있는 slot 의 잠긴 fd (없으면 None)"""
+        for index in range(self.slots):
+            fd = os.open(self._slot_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def running(self):
+        """사용 중인 slot 수"""
+        busy = 0
+        for index in range(self.slots):
+            fd = os.open(self._slot_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except BlockingIOError:
+                busy += 1
+            finally:
+                os.close(fd)
+        return busy
+
+    # ========================================
+    # Queue
+    # ========================================
+
+    def _tickets(self):
+        """대기열 순서대로 [(name, room_key, active)] (만료 ticket 정리)"""
+        now = time.time()
+        stale_after = max(3 * self.poll_interval, 1.0)
+        by_room = {}
+        for name in os.listdir(self.queue_dir):
+            match = TICKET_PATTERN.match(name)
+            if not match:
+                continue
+            path = os.path.join(self.queue_dir, name)
+            try:
+                age = now - os.path.getmtime(path)
+                with open(path) as f:
+                    room_key = json.load(f)['room']
+            except (OSError, ValueError, KeyError):
+                continue
+            if age > self.ticket_ttl:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            background = match.group(2) == 'b'
+            by_room.setdefault((background, room_key), []).append((name, room_key, age <= stale_after))
+
+        ordered = []
+        for (background, _), tickets in by_room.items():
+            tickets.sort()
+            for rank, ticket in enumerate(tickets):
+                ordered.append(((background, rank, ticket[0]), ticket))
+        ordered.sort()
+        return [ticket for _, ticket in ordered]
+
+    def _find_ticket(self, ticket_id):
+        if not ticket_id or not re.fullmatch(r'[0-9a-f]{32}', ticket_id):
+            return None
+        for name in os.listdir(self.queue_dir):
+            if name.endswith('-' + ticket_id):
+                return name
+        return None
+
+    def _enqueue(self, room_key, ticket_id, background):
+        """ticket 파일 이름 (기존 ticket 이 있으면 재사용)"""
+        name = self._find_ticket(ticket_id)
+        if name:
+            return name
+
+        if not background:
+            # 보류 ticket (거절 후 재요청 대기) 은 slot 을 기다리지 않으므로 제외
+            waiting = [t for t in self._tickets() if not is_background(t[0]) and t[2]]
+            if len(waiting) >= self.max_queue:
+                raise SolveRejected('queue_full', len(waiting) + 1,
+                                    self.retry_after(len(waiting) + 1))
+
+        name = f"{time.time_ns():020d}-{'b' if background else 'f'}-{uuid.uuid4().hex}"
+        with open(os.path.join(self.queue_dir, name), 'w') as f:
+            json.dump({'room': room_key, 'pid': os.getpid()}, f)
+        return name
+
+    def _remove_ticket(self, name):
+        try:
+            os.remove(os.path.join(self.queue_dir, name))
+        except FileNotFoundError:
+            pass
+
+    def retry_after(self, position):
+        """대기 순서 position 의 예상 대기 시간 (초, 평균 solve 시간 기준)"""
+        stats = self._aggregate_stats()
+        average = stats['solve_seconds'] / stats['solves'] if stats['solves'] else 15.0
+        return max(1, math.ceil(average * position / self.slots))
+
+    @contextmanager
+    def admit(self, room_key, ticket=None, background=False, max_wait=None):
+        """slot 을 얻을 때까지 대기 후 실행 (with 블록 동안 slot 점유)
+
+        Raises:
+            SolveRejected: 대기열 초과 또는 max_wait 초과 (ticket 은 ticket_ttl 동안 유지)
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        try:
+            name = self._enqueue(str(room_key), ticket, background)
+        except SolveRejected:
+            self._count(rejected=1)
+            raise
+        path = os.path.join(self.queue_dir, name)
+        started = time.monotonic()
+        fd = None
+
+        try:
+            while True:
+                os.utime(path)
+                tickets = self._tickets()
+                names = [t[0] for t in tickets]
+                position = names.index(name) if name in names else len(names)
+                active_ahead = sum(1 for t in tickets[:position] if t[2])
+
+                if active_ahead < self.slots:
+                    fd = self._try_slot()
+                    if fd is not None:
+                        break
+
+                if time.monotonic() - started >= max_wait:
+                    self._count(rejected=1)
+                    raise SolveRejected('timeout', position + 1, self.retry_after(position + 1),
+                                        name.rsplit('-', 1)[1])
+                time.sleep(self.poll_interval)
+        except SolveRejected:
+            # 재요청 시 같은 순서로 대기하도록 ticket 유지 (갱신 중단 -> 보류 상태)
+            raise
+        except BaseException:
+            self._remove_ticket(name)
+            raise
+
+        self._remove_ticket(name)
+        waited = time.monotonic() - started
+        self._count(admitted=1, wait_seconds=waited)
+
+        solve_started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._count(solves=1, solve_seconds=time.monotonic() - solve_started)
+
+    # ========================================
+    # Metrics
+    # ========================================
+
+    def _stats_path(self, pid):
+        return os.path.join(self.state_dir, f'stats-{pid}.json')
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+            self._stats_dirty = True
+        self._flush_stats()
+
+    def _flush_stats(self, force=False):
+        """바뀐 통계만 stats-<pid>.json 에 기록 (force 가 아니면 STATS_FLUSH_INTERVAL 에 1번)"""
+        with self._stats_lock:
+            now = time.monotonic()
+            if not self._stats_dirty or (not force and now - self._stats_written < STATS_FLUSH_INTERVAL):
+                return
+            snapshot = dict(self._stats)
+            self._stats_dirty = False
+            self._stats_written = now
+        tmp_path = f'{self._stats_path(os.getpid())}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._stats_path(os.getpid()))
+
+    def _aggregate_stats(self):
+        self._flush_stats(force=True)
+        total = {'admitted': 0, 'rejected': 0, 'wait_seconds': 0.0, 'solves': 0, 'solve_seconds': 0.0}
+        for name in os.listdir(self.state_dir):
+            match = STATS_NAME.match(name)
+            if not match:
+                continue
+            if not pid_alive(int(match.group(1))):
+                # 종료된 worker (max_requests 재시작 등) 의 통계 파일 정리
+                try:
+                    os.remove(os.path.join(self.state_dir, name))
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name)) as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key in total:
+                total[key] += stats.get(key, 0)
+        return total
+
+    def metrics(self):
+        """대기열 / 실행 / 누적 통계 (모든 worker 합계)"""
+        tickets = self._tickets()
+        stats = self._aggregate_stats()
+        return {
+            'slots': self.slots,
+            'running': self.running(),
+            'queue_depth': sum(1 for t in tickets if not is_background(t[0]) and t[2]),
+            'queue_parked': sum(1 for t in tickets if not is_background(t[0]) and not t[2]),
+            'queue_background': sum(1 for t in tickets if is_background(t[0])),
+            **stats
+        }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+speculative_solve.py - 희망 근무 제출 완료 / 마감 시 미리 돌려두는 백그라운드 solve
+
+slot = (room_id, year, month) 당 결과 1개 {key, output}
+key = solver 입력의 canonical hash - 희망 근무가 바뀌면 key가 달라지므로 예전 결과는 쓰이지 않음
+실행은 프로세스당 스레드 1개 (solver subprocess는 낮은 우선순위로 실행)
+
+shared_dir 지정 시 결과를 파일로도 저장해 같은 서버의 다른 worker도 사용
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ttl_cache import TTLCache
+
+
+def input_key(input_json):
+    """solver 입력 canonical hash"""
+    raw = json.dumps(input_json, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class SpeculativeSolver:
+    """slot별 백그라운드 solve 결과 보관
+
+    Args:
+        runner: (slot, input_json) -> (output, status_code)
+        ttl: 결과 보관 시간 (초)
+        shared_dir: worker 간 결과 공유 디렉토리 (optional)
+    """
+
+    def __init__(self, runner, ttl=6 * 3600, maxsize=256, shared_dir=None):
+        self.runner = runner
+        self.ttl = ttl
+        self.shared_dir = shared_dir
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speculative-solve')
+        self._pending = {}
+        self._running = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    # ========================================
+    # Results
+    # ========================================
+
+    def _result_path(self, slot):
+        name = hashlib.sha1(json.dumps(slot).encode()).hexdigest()
+        return os.path.join(self.shared_dir, name + '.json')
+
+    def _load(self, slot):
+        entry = self._results.get(slot)
+        if entry is not None or not self.shared_dir:
+            return entry
+        try:
+            path = self._result_path(slot)
+            if os.path.getmtime(path) + self.ttl < time.time():
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store(self, slot, input_json, output):
+        """결과 저장 (foreground solve 결과도 같은 방식으로 재사용)"""
+        entry = {'key': input_key(input_json), 'output': output}
+        self._results.set(slot, entry)
+        if self.shared_dir:
+            path = self._result_path(slot)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def lookup(self, slot, input_json, timeout=None):
+        """같은 입력의 결과가 있으면 output, 없으면 None
+
+        같은 입력으로 실행 중인 solve가 있으면 끝날 때까지 기다림 (최대 timeout 초, 넘으면 None)
+        """
+        key = input_key(input_json)
+        with self._lock:
+            running = self._running.get(slot)
+        if running and running[0] == key and not running[1].wait(timeout):
+            return None
+
+        entry = self._load(slot)
+        if entry and entry['key'] == key:
+            return entry['output']
+        return None
+
+    def running(self, slot, input_json):
+        """같은 입력의 백그라운드 solve 가 실행 중인지"""
+        with self._lock:
+            running = self._running.get(slot)
+        return bool(running) and running[0] == input_key(input_json)
+
+    def invalidate(self, slot):
+        """희망 근무 변경 시 결과 / 대기 중인 작업 / 마감 타이머 제거"""
+        self._results.pop(slot)
+        with self._lock:
+            future = self._pending.pop(slot, None)
+            timer = self._timers.pop(slot, None)
+        if future:
+            future.cancel()
+        if timer:
+            timer.cancel()
+        if self.shared_dir:
+            try:
+                os.remove(self._result_path(slot))
+            except FileNotFoundError:
+                pass
+
+    # ========================================
+    # Background execution
+    # ========================================
+
+    def request(self, slot, prepare):
+        """백그라운드 solve 예약
+
+        Args:
+            prepare: () -> input_json 또는 None (아직 실행할 때가 아님)
+                     백그라운드 스레드에서 호출됨 (DB 조회 등)
+        """
+        with self._lock:
+            previous = self._pending.get(slot)
+            if previous and not previous.done():
+                previous.cancel()
+            self._pending[slot] = self._executor.submit(self._run, slot, prepare)
+
+    def request_at(self, slot, when, prepare):
+        """when (epoch seconds) 에 request (slot당 타이머 1개)"""
+        timer = threading.Timer(max(when - time.time(), 0), self.request, (slot, prepare))
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.pop(slot, None)
+            self._timers[slot] = timer
+        if previous:
+            previous.cancel()
+        timer.start()
+
+    def _run(self, slot, prepare):
+        try:
+            input_json = prepare()
+        except Exception as e:
+            print(f"[WARNING] Speculative solve for {slot} not prepared: {str(e)}")
+            return
+        if input_json is None:
+            return
+
+        key = input_key(input_json)
+        entry = self._load(slot)
+        if entry and entry['key'] == key:
+            return
+
+        done = threading.Event()
+        with self._lock:
+            self._running[slot] = (key, done)
+        try:
+            output, status = self.runner(slot, input_json)
+            # 취소로 중단된 해 (cancelled) 는 최선의 해가 아니므로 저장하지 않음
+            if status == 200 and not output.get('cancelled'):
+                self.store(slot, input_json, output)
+                print(f"[INFO] Speculative solve ready for {slot}")
+            else:
+                reason = 'cancelled' if status == 200 else output.get('status')
+                print(f"[INFO] Speculative solve for {slot} not stored: {reason}")
+        except Exception as e:
+            print(f"[WARNING] Speculative solve for {slot} failed: {str(e)}")
+        finally:
+            with self._lock:
+                if self._running.get(slot, (None,))[0] == key:
+                    del self._running[slot]
+            done.set()
@@ -0,0 +1,24 @@
+-- preferences upsert key: (room_id, nurse_name, year, month)
+-- submit_preferences / submit_preferences_bulk 의 on_conflict 대상
+
+-- 1. 기존 중복 행 정리 (가장 나중에 저장된 행만 남김)
+--    저장 순서는 updated_at (없으면 created_at), 같으면 id 로 결정
+--    (ctid 는 물리적 위치라 저장 순서가 아님)
+delete from preferences
+where id in (
+  select id
+  from (
+    select id,
+           row_number() over (
+             partition by room_id, nurse_name, year, month
+             order by coalesce(updated_at, created_at) desc nulls last, id desc
+           ) as rn
+    from preferences
+  ) ranked
+  where rn > 1
+);
+
+-- 2. unique 제약 추가 (upsert on_conflict 에 필요)
+alter table preferences
+  add constraint preferences_room_nurse_month_key
+  unique (room_id, nurse_name, year, month);
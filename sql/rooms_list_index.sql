@@ -0,0 +1,7 @@
+-- list_rooms keyset 페이지네이션: order by created_at desc, id desc
+create index if not exists rooms_created_at_id_idx
+  on rooms (created_at desc, id desc);
+
+-- owner_id 필터
+create index if not exists rooms_owner_id_idx
+  on rooms (owner_id);
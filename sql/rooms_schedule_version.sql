@@ -0,0 +1,17 @@
+-- rooms.schedule_version: PATCH /rooms/<id> 낙관적 동시성 제어용
+-- schedule_data 가 바뀔 때마다 1 증가 (PUT / PATCH 공통)
+alter table rooms
+  add column if not exists schedule_version integer not null default 0;
+
+create or replace function rooms_bump_schedule_version()
+returns trigger as $$
+begin
+  new.schedule_version := old.schedule_version + 1;
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists rooms_schedule_version_trigger on rooms;
+create trigger rooms_schedule_version_trigger
+  before update of schedule_data on rooms
+  for each row execute function rooms_bump_schedule_version();
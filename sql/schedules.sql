@@ -0,0 +1,17 @@
+-- schedules: 방/월 당 확정 근무표 1개 (compact 형식)
+-- POST /rooms/<id>/solve (store=true) 에서 저장, 다음 달 past_3days 계산 등에 사용
+-- 이전 달 이력 조회 (list_schedules: room_id + year 범위) 는 schedules_room_month_key 인덱스 사용
+create table if not exists schedules (
+  id uuid primary key default gen_random_uuid(),
+  room_id uuid not null references rooms (id) on delete cascade,
+  year integer not null,
+  month integer not null,
+  schedule jsonb not null,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
+  constraint schedules_room_month_key unique (room_id, year, month)
+);
+
+-- preferences 월별 조회 (get_preferences, /rooms/<id>/solve)
+create index if not exists preferences_room_month_idx
+  on preferences (room_id, year, month);
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+storage.py - rooms / preferences / schedules 저장소
+
+SupabaseStorage: Supabase (PostgREST) - 기본
+SQLiteStorage: 내장 SQLite (WAL) - 온프레미스 / 부하 테스트 / CI
+LatencyStorage: 호출마다 지연 추가 (부하 테스트에서 원격 DB 왕복 흉내)
+
+두 구현 모두 같은 메서드와 같은 row 형식(dict, JSON 컬럼은 decode된 값)을 반환
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+from abc import ABC, abstractmethod
+
+# 방 목록: schedule_data, password 제외
+ROOM_LIST_COLUMNS = ('id', 'title', 'owner_id', 'created_at')
+
+# preferences upsert key (sql/preferences_unique_key.sql 의 unique 제약)
+PREFERENCE_KEY = ('room_id', 'nurse_name', 'year', 'month')
+
+# schedules upsert key (sql/schedules.sql)
+SCHEDULE_KEY = ('room_id', 'year', 'month')
+
+
+class Storage(ABC):
+    """저장소 인터페이스 (구현하지 않은 메서드가 있으면 생성 시 TypeError)"""
+
+    name = None
+
+    # ========================================
+    # Rooms
+    # ========================================
+
+    @abstractmethod
+    def get_room(self, room_id):
+        """방 1개 (없으면 None)"""
+
+    @abstractmethod
+    def create_room(self, title, password, owner_id):
+        """새 방 row"""
+
+    @abstractmethod
+    def list_rooms(self, limit, q=None, owner_id=None, after=None):
+        """최신순 방 목록 (ROOM_LIST_COLUMNS)
+
+        Args:
+            q: 제목 부분 일치 (대소문자 무시)
+            after: (created_at, id) - 이 방 다음부터 (keyset)
+        """
+
+    @abstractmethod
+    def update_room_schedule(self, room_id, schedule_data, expected_version=None):
+        """schedule_data 저장 + schedule_version 1 증가
+
+        expected_version 지정 시 현재 version이 같을 때만 저장
+
+        Returns:
+            갱신된 방 row, 방이 없거나 version 불일치면 None
+        """
+
+    # ========================================
+    # Preferences
+    # ========================================
+
+    @abstractmethod
+    def upsert_preferences(self, rows):
+        """PREFERENCE_KEY 기준 upsert (rows 안에 같은 key 중복 없음) - 저장된 row 목록"""
+
+    @abstractmethod
+    def get_preference(self, room_id, nurse_name, year, month):
+        """간호사 1명의 월별 희망 근무 (없으면 None)"""
+
+    @abstractmethod
+    def list_preferences(self, room_id, year=None, month=None, submitted_only=False):
+        """방의 희망 근무 목록 (year / month 지정 시 해당 값만, submitted_only 면 제출 완료만)"""
+
+    @abstractmethod
+    def delete_preferences(self, room_id, year=None, month=None):
+        """year, month 둘 다 지정 시 해당 월만, 아니면 방 전체 - 삭제된 개수"""
+
+    # ========================================
+    # Schedules (확정 근무표, 방/월 당 1개)
+    # ========================================
+
+    @abstractmethod
+    def save_schedule(self, room_id, year, month, schedule):
+        """SCHEDULE_KEY 기준 upsert - 저장된 row"""
+
+    @abstractmethod
+    def get_schedule(self, room_id, year, month):
+        """방/월 확정 근무표 row (없으면 None)"""
+
+    @abstractmethod
+    def list_schedules(self, room_id, since, until):
+        """(year, month) since ~ until 범위의 근무표 (오래된 달부터, 1회 조회)"""
+
+
+def _in_month_range(row, since, until):
+    return since <= (row['year'], row['month']) <= until
+
+
+# ========================================
+# Supabase
+# ========================================
+
+class SupabaseStorage(Storage):
+    """Supabase (PostgREST) 저장소"""
+
+    name = 'supabase'
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_room(self, room_id):
+        response = self.client.table('rooms').select('*').eq('id', room_id).execute()
+        return response.data[0] if response.data else None
+
+    def create_room(self, title, password, owner_id):
+        response = self.client.table('rooms').insert({
+            'title': title,
+            'password': password,
+            'owner_id': owner_id
+        }).execute()
+        return response.data[0] if response.data else None
+
+    def list_rooms(self, limit, q=None, owner_id=None, after=None):
+        query = self.client.table('rooms').select(','.join(ROOM_LIST_COLUMNS))
+
+        if q:
+            escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.ilike('title', f'%{escaped}%')
+
+        if owner_id:
+            query = query.eq('owner_id', owner_id)
+
+        if after:
+            created_at, last_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{last_id}")'
+            )
+
+        response = query.order('created_at', desc=True).order('id', desc=True).limit(limit).execute()
+        return response.data or []
+
+    def update_room_schedule(self, room_id, schedule_data, expected_version=None):
+        # schedule_version 증가는 DB trigger (sql/rooms_schedule_version.sql)
+        values = {'schedule_data': schedule_data}
+        query = self.client.table('rooms')
+        if expected_version is not None:
+            values['schedule_version'] = expected_version + 1
+            query = query.update(values).eq('id', room_id).eq('schedule_version', expected_version)
+        else:
+            query = query.update(values).eq('id', room_id)
+        response = query.execute()
+        return response.data[0] if response.data else None
+
+    def upsert_preferences(self, rows):
+        response = self.client.table('preferences').upsert(
+            rows, on_conflict=','.join(PREFERENCE_KEY)
+        ).execute()
+        return response.data or []
+
+    def get_preference(self, room_id, nurse_name, year, month):
+        response = self.client.table('preferences') \
+            .select('*') \
+            .eq('room_id', room_id) \
+            .eq('nurse_name', nurse_name) \
+            .eq('year', year) \
+            .eq('month', month) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def list_preferences(self, room_id, year=None, month=None, submitted_only=False):
+        query = self.client.table('preferences').select('*').eq('room_id', room_id)
+        if year:
+            query = query.eq('year', year)
+        if month:
+            query = query.eq('month', month)
+        if submitted_only:
+            query = query.eq('is_submitted', True)
+        return query.execute().data or []
+
+    def delete_preferences(self, room_id, year=None, month=None):
+        query = self.client.table('preferences').delete().eq('room_id', room_id)
+        if year and month:
+            query = query.eq('year', year).eq('month', month)
+        response = query.execute()
+        return len(response.data) if response.data else 0
+
+    def save_schedule(self, room_id, year, month, schedule):
+        response = self.client.table('schedules').upsert({
+            'room_id': room_id,
+            'year': year,
+            'month': month,
+            'schedule': schedule
+        }, on_conflict=','.join(SCHEDULE_KEY)).execute()
+        return response.data[0] if response.data else None
+
+    def get_schedule(self, room_id, year, month):
+        response = self.client.table('schedules') \
+            .select('*') \
+            .eq('room_id', room_id) \
+            .eq('year', year) \
+            .eq('month', month) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def list_schedules(self, room_id, since, until):
+        # (room_id, year, month) unique 인덱스 범위 조회, 월 경계는 여기서 거름
+        response = self.client.table('schedules') \
+            .select('year,month,schedule,updated_at') \
+            .eq('room_id', room_id) \
+            .gte('year', since[0]) \
+            .lte('year', until[0]) \
+            .order('year') \
+            .order('month') \
+            .execute()
+        return [row for row in response.data or [] if _in_month_range(row, since, until)]
+
+
+# ========================================
+# SQLite
+# ========================================
+
+SQLITE_SCHEMA = """
+create table if not exists rooms (
+    id text primary key,
+    title text not null,
+    password text not null,
+    owner_id text,
+    schedule_data text,
+    schedule_version integer not null default 0,
+    created_at text not null,
+    updated_at text not null
+);
+create index if not exists rooms_created_at_id_idx on rooms (created_at desc, id desc);
+create index if not exists rooms_owner_id_idx on rooms (owner_id);
+
+create table if not exists preferences (
+    id text primary key,
+    room_id text not null,
+    user_id text,
+    nurse_name text not null,
+    schedule text,
+    is_submitted integer not null default 0,
+    year integer not null,
+    month integer not null,
+    created_at text not null,
+    updated_at text not null,
+    unique (room_id, nurse_name, year, month)
+);
+create index if not exists preferences_room_month_idx on preferences (room_id, year, month);
+
+create table if not exists schedules (
+    id text primary key,
+    room_id text not null,
+    year integer not null,
+    month integer not null,
+    schedule text,
+    created_at text not null,
+    updated_at text not null,
+    unique (room_id, year, month)
+);
+"""
+
+# JSON으로 저장하는 컬럼
+JSON_COLUMNS = ('schedule_data', 'schedule')
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class SQLiteStorage(Storage):
+    """내장 SQLite 저장소 (WAL, 스레드별 연결)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('pragma journal_mode=wal')
+            conn.execute('pragma synchronous=normal')
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        rows = self._connection().execute(sql, params).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _query_one(self, sql, params=()):
+        rows = self._query(sql, params)
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _decode(row):
+        row = dict(row)
+        for column in JSON_COLUMNS:
+            if row.get(column) is not None:
+                row[column] = json.loads(row[column])
+        if 'is_submitted' in row:
+            row['is_submitted'] = bool(row['is_submitted'])
+        return row
+
+    # ========================================
+    # Rooms
+    # ========================================
+
+    def get_room(self, room_id):
+        return self._query_one('select * from rooms where id = ?', (room_id,))
+
+    def create_room(self, title, password, owner_id):
+        now = _now()
+        return self._query_one(
+            'insert into rooms (id, title, password, owner_id, created_at, updated_at) '
+            'values (?, ?, ?, ?, ?, ?) returning *',
+            (str(uuid.uuid4()), title, password, owner_id, now, now)
+        )
+
+    def list_rooms(self, limit, q=None, owner_id=None, after=None):
+        where = []
+        params = []
+        if q:
+            escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where.append("lower(title) like lower(?) escape '\\'")
+            params.append(f'%{escaped}%')
+        if owner_id:
+            where.append('owner_id = ?')
+            params.append(owner_id)
+        if after:
+            where.append('(created_at < ? or (created_at = ? and id < ?))')
+            params.extend([after[0], after[0], after[1]])
+
+        sql = f"select {', '.join(ROOM_LIST_COLUMNS)} from rooms"
+        if where:
+            sql += ' where ' + ' and '.join(where)
+        sql += ' order by created_at desc, id desc limit ?'
+        return self._query(sql, params + [limit])
+
+    def update_room_schedule(self, room_id, schedule_data, expected_version=None):
+        sql = ('update rooms set schedule_data = ?, schedule_version = schedule_version + 1, '
+               'updated_at = ? where id = ?')
+        params = [json.dumps(schedule_data, ensure_ascii=False), _now(), room_id]
+        if expected_version is not None:
+            sql += ' and schedule_version = ?'
+            params.append(expected_version)
+        return self._query_one(sql + ' returning *', params)
+
+    # ========================================
+    # Preferences
+    # ========================================
+
+    def upsert_preferences(self, rows):
+        now = _now()
+        conn = self._connection()
+        saved = []
+        conn.execute('begin immediate')
+        try:
+            for row in rows:
+                result = conn.execute(
+                    'insert into preferences '
+                    '(id, room_id, user_id, nurse_name, schedule, is_submitted, year, month, created_at, updated_at) '
+                    'values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'on conflict (room_id, nurse_name, year, month) do update set '
+                    'user_id = excluded.user_id, schedule = excluded.schedule, '
+                    'is_submitted = excluded.is_submitted, updated_at = excluded.updated_at '
+                    'returning *',
+                    (str(uuid.uuid4()), row['room_id'], row.get('user_id'), row['nurse_name'],
+                     json.dumps(row.get('schedule'), ensure_ascii=False), int(bool(row.get('is_submitted'))),
+                     row['year'], row['month'], now, now)
+                ).fetchone()
+                saved.append(self._decode(result))
+            conn.execute('commit')
+        except Exception:
+            conn.execute('rollback')
+            raise
+        return saved
+
+    def get_preference(self, room_id, nurse_name, year, month):
+        return self._query_one(
+            'select * from preferences where room_id = ? and nurse_name = ? and year = ? and month = ?',
+            (room_id, nurse_name, year, month)
+        )
+
+    def list_preferences(self, room_id, year=None, month=None, submitted_only=False):
+        sql = 'select * from preferences where room_id = ?'
+        params = [room_id]
+        if year:
+            sql += ' and year = ?'
+            params.append(year)
+        if month:
+            sql += ' and month = ?'
+            params.append(month)
+        if submitted_only:
+            sql += ' and is_submitted = 1'
+        return self._query(sql, params)
+
+    def delete_preferences(self, room_id, year=None, month=None):
+        sql = 'delete from preferences where room_id = ?'
+        params = [room_id]
+        if year and month:
+            sql += ' and year = ? and month = ?'
+            params.extend([year, month])
+        return self._connection().execute(sql, params).rowcount
+
+    # ========================================
+    # Schedules
+    # ========================================
+
+    def save_schedule(self, room_id, year, month, schedule):
+        now = _now()
+        return self._query_one(
+            'insert into schedules (id, room_id, year, month, schedule, created_at, updated_at) '
+            'values (?, ?, ?, ?, ?, ?, ?) '
+            'on conflict (room_id, year, month) do update set '
+            'schedule = excluded.schedule, updated_at = excluded.updated_at '
+            'returning *',
+            (str(uuid.uuid4()), room_id, year, month, json.dumps(schedule, ensure_ascii=False), now, now)
+        )
+
+    def get_schedule(self, room_id, year, month):
+        return self._query_one(
+            'select * from schedules where room_id = ? and year = ? and month = ?',
+            (room_id, year, month)
+        )
+
+    def list_schedules(self, room_id, since, until):
+        rows = self._query(
+            'select year, month, schedule, updated_at from schedules '
+            'where room_id = ? and year between ? and ? order by year, month',
+            (room_id, since[0], until[0])
+        )
+        return [row for row in rows if _in_month_range(row, since, until)]
+
+
+class LatencyStorage:
+    """다른 저장소의 모든 메서드 호출 전에 latency 초 대기"""
+
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+        self.name = f"{inner.name}+{round(latency * 1000)}ms"
+
+    def __getattr__(self, attr):
+        method = getattr(self.inner, attr)
+        if not callable(method):
+            return method
+
+        def delayed(*args, **kwargs):
+            time.sleep(self.latency)
+            return method(*args, **kwargs)
+        return delayed
+
+
+def create_storage(backend=None, supabase_client=None, sqlite_path=None, latency=0.0):
+    """STORAGE_BACKEND 값에 맞는 저장소 (설정이 없으면 None)
+
+    backend: 'supabase' | 'sqlite' (default: supabase client가 있으면 supabase)
+    latency: 호출당 추가 지연 (초, 부하 테스트용)
+    """
+    backend = backend or ('supabase' if supabase_client else None)
+    if backend == 'sqlite':
+        storage = SQLiteStorage(sqlite_path or 'fouroff.db')
+    elif backend == 'supabase':
+        if supabase_client is None:
+            raise ValueError("STORAGE_BACKEND=supabase requires SUPABASE_URL and SUPABASE_KEY")
+        storage = SupabaseStorage(supabase_client)
+    elif backend:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    else:
+        return None
+
+    if latency > 0:
+        return LatencyStorage(storage, latency)
+    return storage